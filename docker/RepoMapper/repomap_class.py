@@ -14,7 +14,7 @@ from dataclasses import dataclass
 import diskcache
 import networkx as nx
 from grep_ast import TreeContext
-from utils import count_tokens, read_text, Tag
+from utils import count_tokens, estimate_tokens, read_text, Tag
 from scm import get_scm_fname
 from importance import filter_important_files
 
@@ -535,6 +535,11 @@ class RepoMap:
             if not tree_output:
                 return None, 0
             
+            # Skip the exact count when the cheap estimate is already far over budget
+            estimate = estimate_tokens(tree_output)
+            if estimate > 2 * max_map_tokens:
+                return tree_output, estimate
+            
             tokens = self.token_count(tree_output)
             return tree_output, tokens
         
@@ -2,11 +2,14 @@
 Utility functions for RepoMap.
 """
 
+import mmap
 import os
 import sys
+import threading
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, List
-from collections import namedtuple
+from typing import Optional, List, Tuple
+from collections import OrderedDict, namedtuple
 
 try:
     import tiktoken
@@ -18,23 +21,68 @@ except ImportError:
 Tag = namedtuple("Tag", "rel_fname fname line name kind".split())
 
 
+# Exact token counts keyed by (hash, length, model); strings themselves are not retained
+TOKEN_COUNT_CACHE_SIZE = 4096
+_token_count_cache: "OrderedDict[Tuple[int, int, str], int]" = OrderedDict()
+_token_count_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model_name: str):
+    """Resolve the tiktoken encoding once per model name."""
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        # Fallback for unknown models
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 chars per token for English and code), for "will this fit?" checks."""
+    return (len(text) + 3) // 4
+
+
 def count_tokens(text: str, model_name: str = "gpt-4") -> int:
     """Count tokens in text using tiktoken."""
     if not text:
         return 0
-    
-    try:
-        encoding = tiktoken.encoding_for_model(model_name)
-    except KeyError:
-        # Fallback for unknown models
-        encoding = tiktoken.get_encoding("cl100k_base")
-    
-    return len(encoding.encode(text))
+
+    key = (hash(text), len(text), model_name)
+    with _token_count_lock:
+        cached = _token_count_cache.get(key)
+        if cached is not None:
+            _token_count_cache.move_to_end(key)
+            return cached
+
+    count = len(_get_encoding(model_name).encode_ordinary(text))
+
+    with _token_count_lock:
+        _token_count_cache[key] = count
+        if len(_token_count_cache) > TOKEN_COUNT_CACHE_SIZE:
+            _token_count_cache.popitem(last=False)
+    return count
+
+
+# Files at or above this size are decoded straight from a memory map
+MMAP_THRESHOLD_BYTES = 64 * 1024
+
+
+def _read_text_mmap(filename: str, encoding: str) -> str:
+    """Decode a large file from an mmap without an intermediate bytes copy."""
+    with open(filename, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            text = str(mm, encoding, "ignore")
+    # Match Path.read_text's universal newline handling
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
 
 
 def read_text(filename: str, encoding: str = "utf-8", silent: bool = False) -> Optional[str]:
     """Read text from file with error handling."""
     try:
+        if os.path.getsize(filename) >= MMAP_THRESHOLD_BYTES:
+            return _read_text_mmap(filename, encoding)
         return Path(filename).read_text(encoding=encoding, errors='ignore')
     except FileNotFoundError:
         if not silent:
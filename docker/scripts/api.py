@@ -3,9 +3,10 @@ import os
 import uuid
 import asyncio
 import logging
+from contextlib import asynccontextmanager
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 
 # 获取项目根目录并添加到 sys.path（必须在导入 src 模块之前）
 PROJECT_ROOT = Path(__file__).parent.parent.resolve()
@@ -17,17 +18,21 @@ load_dotenv("../../.env")
 
 from fastapi import FastAPI, HTTPException, Request, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
 import json
 import time
+import orjson
 from pydantic import BaseModel, Field, model_validator
 
+from src.storage.redis_cache import chat_answer_cache, repo_vector_path_cache
 from src.storage.supabase_client import (
     SupabaseClient,
+    get_client,
     SupabaseStorageError,
     WIKI_GENERATION_CACHE_MAX_AGE_DAYS,
 )
 from src.utils.github_repo_metadata import (
+    GITHUB_METADATA_ROW_COLUMNS,
     coerce_stargazers_int,
     github_metadata_needs_refresh,
     parse_owner_repo_from_url,
@@ -43,8 +48,14 @@ from src.utils.repo_utils import get_repo_disk_directory_name
 logger = setup_logger("api")
 
 # 导入业务逻辑和管理模块
-from src.core.wiki_pipeline import execute_generation_task, VECTOR_STORE_ROOT, REPO_STORE_ROOT
-from src.core.chat import answer_question, answer_question_stream
+from src.core.wiki_pipeline import (
+    execute_generation_task,
+    shutdown_executors,
+    sweep_stale_task_dirs,
+    VECTOR_STORE_ROOT,
+    REPO_STORE_ROOT,
+)
+from src.core.chat import answer_question_async, answer_question_stream
 from src.ingestion.embedding_utils import (
     OPENROUTER_API_BASE,
     OPENROUTER_EMBEDDING_MODEL,
@@ -70,6 +81,23 @@ def _normalize_vector_store_path(raw_path: Optional[str], repo_url: str) -> str:
     return path_str
 
 
+def _lookup_vector_store_path(supabase_client: SupabaseClient, repo_url: str) -> Optional[str]:
+    """
+    查找仓库的向量库路径：先读 Redis 热缓存，未命中再查 repositories 表并回填。
+    """
+    cache_key = supabase_client._normalize_repo_url(repo_url)
+    cached = repo_vector_path_cache.get(cache_key)
+    if cached:
+        return cached
+
+    repo_info = supabase_client.get_repo_information(repo_url)
+    if not repo_info or not repo_info.get("vector_store_path"):
+        return None
+    vector_store_path = _normalize_vector_store_path(repo_info["vector_store_path"], repo_url)
+    repo_vector_path_cache.set(cache_key, vector_store_path)
+    return vector_store_path
+
+
 def _resolve_path_under_root(root: Path, input_path: str) -> Optional[Path]:
     root_resolved = root.expanduser().resolve()
     raw = Path(input_path).expanduser()
@@ -85,9 +113,41 @@ def _resolve_path_under_root(root: Path, input_path: str) -> Optional[Path]:
         return None
     return target
 
+
+async def _sweep_tasks():
+    """
+    周期性删除超过保留期、且不属于本进程运行中任务的任务工作目录。
+    任务记录本身保存在 Supabase（供历史页展示），Redis 镜像依赖 EXPIRE 自动过期。
+    """
+    while True:
+        await asyncio.sleep(TASK_SWEEP_INTERVAL_SEC)
+        try:
+            removed = await asyncio.to_thread(
+                sweep_stale_task_dirs, list(running_tasks), TASK_WORKDIR_MAX_AGE_SEC
+            )
+            if removed:
+                logger.info(f"任务清理: 工作目录删除 {removed} 个")
+        except Exception as e:
+            logger.warning(f"任务清理失败: {e}")
+
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    """应用生命周期：启动时开启周期清理任务，退出时停止清理并释放 Wiki 生成流水线的进程池与线程池"""
+    sweeper = asyncio.create_task(_sweep_tasks())
+    try:
+        yield
+    finally:
+        sweeper.cancel()
+        shutdown_executors()
+
+
 app = FastAPI(
     title="Project Wiki Generation API",
     description="Async API: turn a repository URL into wiki structure and generated content.",
+    # 所有 JSON 响应统一走 orjson 序列化
+    default_response_class=ORJSONResponse,
+    lifespan=_lifespan,
 )
 
 # 配置 CORS，允许前端跨域请求
@@ -166,10 +226,40 @@ def _to_jsonable_builtin(value: Any) -> Any:
 # 单次请求内同步刷新条数上限（其余交给 BackgroundTasks），避免仅依赖后台导致实例收起前未写入
 GITHUB_METADATA_SYNC_REFRESH_CAP = 8
 
+# 后台任务清理周期与任务工作目录保留时长
+TASK_SWEEP_INTERVAL_SEC = 300
+TASK_WORKDIR_MAX_AGE_SEC = 86400
+
+# /tasks 单页最多返回的任务数
+TASKS_PAGE_MAX = 500
+
+# /chat/messages 单页最多返回的消息数
+CHAT_MESSAGES_PAGE_MAX = 1000
+
 # ============ Global State ============
 # 存储正在运行的异步任务，以便可以被强制终止
 running_tasks: Dict[str, asyncio.Task] = {}
 
+# 同时执行的 Wiki 生成任务上限；其余任务排队等待，避免突发请求压垮进程池与 LLM 配额
+MAX_CONCURRENT_GENERATIONS = max(1, int(os.getenv("MAX_CONCURRENT_GENERATIONS", "4")))
+_generation_slots = asyncio.Semaphore(MAX_CONCURRENT_GENERATIONS)
+
+
+async def _run_generation_bounded(task_id: str, url_link: str):
+    """获取执行槽位后再运行生成任务；排队期间任务记录保持 pending，可被正常取消。"""
+    global _available_repos_cache
+    try:
+        async with _generation_slots:
+            await execute_generation_task(task_id, url_link)
+    finally:
+        # 生成结束后 repositories 表可能新增/更新了仓库，使 /chat/repos 缓存失效
+        _available_repos_cache = None
+
+
+# /chat/repos 结果的短期缓存：(写入时间, 仓库列表)
+AVAILABLE_REPOS_TTL_SEC = 30.0
+_available_repos_cache: Optional[Tuple[float, List[dict]]] = None
+
 
 def _generate_chat_preview_sync(question: str) -> str:
     """
@@ -248,7 +338,7 @@ async def generate_wiki(request: Request):
         if not url_link or not user_id:
             raise HTTPException(status_code=400, detail="Missing url_link or user_id")
 
-        supabase_client = SupabaseClient()
+        supabase_client = get_client()
         cached_result = supabase_client.build_cached_task_result(
             url_link, max_cache_age_days=WIKI_GENERATION_CACHE_MAX_AGE_DAYS
         )
@@ -279,8 +369,8 @@ async def generate_wiki(request: Request):
 
         logger.info(f"创建任务成功: {task_id}")
 
-        # 启动后台任务
-        task = asyncio.create_task(execute_generation_task(task_id, url_link))
+        # 启动后台任务（受并发上限约束，超出时在队列中保持 pending）
+        task = asyncio.create_task(_run_generation_bounded(task_id, url_link))
         running_tasks[task_id] = task
         
         # 任务完成后自动从字典中移除
@@ -305,7 +395,7 @@ async def get_task_information_api(task_id: str):
     """
     logger.debug(f"查询任务信息: {task_id}")
 
-    supabase_client = SupabaseClient()
+    supabase_client = get_client()
 
     try:
         task_information = supabase_client.get_task(task_id)
@@ -316,7 +406,8 @@ async def get_task_information_api(task_id: str):
     if not task_information:
         raise HTTPException(status_code=404, detail=f"Task not found: {task_id}")
 
-    return {"task": task_information}
+    # 直接返回 Response：跳过 FastAPI 对返回值的 jsonable_encoder 递归遍历（result 可能很大，且每 1-2 秒被轮询一次）
+    return ORJSONResponse({"task": task_information})
 
 
 @app.post("/tasks")
@@ -329,10 +420,36 @@ async def list_tasks_api(request: Request):
     if not user_id:
         raise HTTPException(status_code=400, detail="Missing user_id")
 
+    # 可选分页：limit 为每页条数，cursor 为上一页返回的 next_cursor（偏移量）
+    limit = data.get("limit")
+    offset = 0
+    try:
+        if limit is not None:
+            limit = max(1, min(int(limit), TASKS_PAGE_MAX))
+            offset = max(0, int(data.get("cursor") or 0))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid limit or cursor")
+
     logger.debug(f"列出所有任务: {user_id}")
-    supabase_client = SupabaseClient()
-    all_tasks = supabase_client.get_all_tasks(user_id)
-    return {"tasks": all_tasks}
+    supabase_client = get_client()
+    all_tasks = supabase_client.get_all_tasks(user_id, limit=limit, offset=offset)
+    if all_tasks is None:
+        return {"tasks": None}
+
+    next_cursor = None
+    if limit is not None and len(all_tasks) == limit:
+        next_cursor = str(offset + limit)
+
+    def _iter_tasks_json():
+        # 逐条序列化输出 JSON，行数据原样透传，不再经过响应模型校验
+        yield b'{"tasks":['
+        for i, task in enumerate(all_tasks):
+            if i:
+                yield b","
+            yield orjson.dumps(task)
+        yield b'],"next_cursor":' + orjson.dumps(next_cursor) + b"}"
+
+    return StreamingResponse(_iter_tasks_json(), media_type="application/json")
 
 
 @app.post("/dashboard/repos")
@@ -346,7 +463,7 @@ async def list_dashboard_repositories_api(request: Request):
     if not user_id:
         raise HTTPException(status_code=400, detail="Missing user_id")
 
-    supabase_client = SupabaseClient()
+    supabase_client = get_client()
     try:
         repos = supabase_client.get_user_dashboard_repositories(user_id)
     except Exception as e:
@@ -367,7 +484,7 @@ async def repos_github_metadata_api(request: Request, background_tasks: Backgrou
     if not isinstance(repo_urls, list):
         raise HTTPException(status_code=400, detail="repo_urls must be a list")
 
-    supabase_client = SupabaseClient()
+    supabase_client = get_client()
     if not supabase_client.client:
         raise HTTPException(status_code=503, detail="Database not configured")
 
@@ -383,7 +500,9 @@ async def repos_github_metadata_api(request: Request, background_tasks: Backgrou
         seen_norm.add(key)
         ordered_keys.append(key)
 
-    rows_map: Dict[str, Any] = supabase_client.get_repositories_for_urls(ordered_keys)
+    rows_map: Dict[str, Any] = supabase_client.get_repositories_for_urls(
+        ordered_keys, columns=GITHUB_METADATA_ROW_COLUMNS
+    )
 
     to_refresh: List[str] = []
     for key in ordered_keys:
@@ -395,9 +514,11 @@ async def repos_github_metadata_api(request: Request, background_tasks: Backgrou
     async_part = to_refresh[GITHUB_METADATA_SYNC_REFRESH_CAP:]
     if sync_part:
         refresh_github_metadata_batch(supabase_client, sync_part)
-        rows_map.update(supabase_client.get_repositories_for_urls(sync_part))
+        rows_map.update(supabase_client.get_repositories_for_urls(
+            sync_part, columns=GITHUB_METADATA_ROW_COLUMNS
+        ))
     if async_part:
-        background_tasks.add_task(refresh_github_metadata_batch, SupabaseClient(), async_part)
+        background_tasks.add_task(refresh_github_metadata_batch, get_client(), async_part)
 
     metadata: Dict[str, Any] = {}
     for key in ordered_keys:
@@ -430,7 +551,7 @@ async def cancel_task_api(task_id: str):
     强制终止处于 processing 状态的任务
     """
     logger.info(f"请求强制终止任务: {task_id}")
-    supabase_client = SupabaseClient()
+    supabase_client = get_client()
 
     def _persist_cancelled_status() -> bool:
         return supabase_client.update_task_status(
@@ -483,7 +604,7 @@ async def delete_task_api(task_id: str, user_id: str):
     if not task_id or not user_id:
         raise HTTPException(status_code=400, detail="Missing task_id or user_id")
     logger.info(f"删除任务: {task_id}")
-    supabase_client = SupabaseClient()
+    supabase_client = get_client()
     success = supabase_client.delete_task(task_id, user_id)
     if not success:
         try:
@@ -603,7 +724,7 @@ async def get_profile_api(user_id: str):
     """
     if not user_id:
         raise HTTPException(status_code=400, detail="Missing user_id")
-    supabase_client = SupabaseClient()
+    supabase_client = get_client()
     profile = supabase_client.get_profile(user_id)
     if not profile:
         return {"profile": {"id": user_id, "theme": "dark"}}
@@ -622,7 +743,7 @@ async def update_profile_api(request: Request):
     theme = data.get("theme")
     if theme is None:
         raise HTTPException(status_code=400, detail="Nothing to update")
-    supabase_client = SupabaseClient()
+    supabase_client = get_client()
     ok = supabase_client.upsert_profile_preferences(user_id, theme=theme)
     if not ok:
         raise HTTPException(status_code=500, detail="Failed to update profile")
@@ -666,9 +787,10 @@ async def chat_with_repo_api(request: Request):
         if not question or not repo_url or not user_id:
             raise HTTPException(status_code=400, detail="Missing question, repo_url or user_id")
 
-        supabase_client = SupabaseClient()
+        supabase_client = get_client()
         
         # 1. 如果没有 chat_id，创建一个新的会话
+        new_session = not chat_id
         if not chat_id:
             # Use fast sync title generation (no LLM call)
             preview_text = _generate_chat_preview_sync(question)
@@ -679,20 +801,16 @@ async def chat_with_repo_api(request: Request):
             chat_id = chat_session["id"]
         
         # 2. 保存用户问题到数据库
-        if supabase_client.add_chat_message(chat_id, "user", question) is None:
+        if supabase_client.add_chat_message(chat_id, "user", question, touch_history=not new_session) is None:
             raise HTTPException(status_code=500, detail="Failed to save user message")
 
-        # 3. 从 Supabase 获取向量库路径
-        repo_info = supabase_client.get_repo_information(repo_url)
-        if not repo_info or not repo_info.get("vector_store_path"):
+        # 3. 获取向量库路径（Redis 热缓存 → Supabase）
+        vector_store_path = _lookup_vector_store_path(supabase_client, repo_url)
+        if not vector_store_path:
             raise HTTPException(
                 status_code=404,
                 detail="No vector index for this repository. Generate documentation via /generate first.",
             )
-        
-        vector_store_path = _normalize_vector_store_path(
-            repo_info["vector_store_path"], repo_url
-        )
 
         # 4. Build enhanced question (page context)
         enhanced_question = question
@@ -700,15 +818,23 @@ async def chat_with_repo_api(request: Request):
             enhanced_question = f"[Current page context: {current_page_context}]\n\nUser question: {question}"
         
         # 5. Run RAG Q&A (answers are always in English)
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(
-            None,
-            lambda: answer_question(
+        # 无对话历史时答案只取决于仓库与问题，可复用短期缓存
+        result = None
+        if not conversation_history:
+            result = chat_answer_cache.get(vector_store_path, question, current_page_context)
+        if result is None:
+            result = await answer_question_async(
                 db_path=vector_store_path,
                 question=enhanced_question,
                 conversation_history=conversation_history,
             )
-        )
+            if not conversation_history and result.get("answer"):
+                chat_answer_cache.set(
+                    vector_store_path,
+                    question,
+                    current_page_context,
+                    {"answer": result.get("answer"), "sources": list(result.get("sources", []))},
+                )
         
         answer = str(result.get("answer", ""))
         sources = list(result.get("sources", []))
@@ -770,9 +896,10 @@ async def chat_stream_api(request: Request):
         if not question or not repo_url or not user_id:
             raise HTTPException(status_code=400, detail="Missing question, repo_url or user_id")
 
-        supabase_client = SupabaseClient()
+        supabase_client = get_client()
         
         # 创建会话
+        new_session = not chat_id
         if not chat_id:
             preview_text = _generate_chat_preview_sync(question)
             chat_session = supabase_client.create_chat_history(user_id, repo_url, title=preview_text, preview_text=preview_text)
@@ -780,20 +907,16 @@ async def chat_stream_api(request: Request):
                 raise HTTPException(status_code=500, detail="Failed to create chat session")
             chat_id = chat_session["id"]
         
-        if supabase_client.add_chat_message(chat_id, "user", question) is None:
+        if supabase_client.add_chat_message(chat_id, "user", question, touch_history=not new_session) is None:
             raise HTTPException(status_code=500, detail="Failed to save user message")
 
-        repo_info = supabase_client.get_repo_information(repo_url)
-        if not repo_info or not repo_info.get("vector_store_path"):
+        vector_store_path = _lookup_vector_store_path(supabase_client, repo_url)
+        if not vector_store_path:
             raise HTTPException(
                 status_code=404,
                 detail="No vector index for this repository. Generate documentation via /generate first.",
             )
         
-        vector_store_path = _normalize_vector_store_path(
-            repo_info["vector_store_path"], repo_url
-        )
-        
         enhanced_question = question
         if current_page_context:
             enhanced_question = f"[Current page context: {current_page_context}]\n\nUser question: {question}"
@@ -867,14 +990,20 @@ async def list_available_repos_api():
     """
     列出所有可用于聊天的仓库
     """
+    global _available_repos_cache
+    cached = _available_repos_cache
+    if cached is not None and time.monotonic() - cached[0] < AVAILABLE_REPOS_TTL_SEC:
+        return {"repos": cached[1]}
+
     logger.info("列出所有可用于聊天的仓库")
-    supabase_client = SupabaseClient()
+    supabase_client = get_client()
     try:
         available_repos = supabase_client.get_all_available_repos()
     except SupabaseStorageError as e:
         logger.error("列出可用仓库时 Supabase 失败: %s", e)
         raise HTTPException(status_code=503, detail=f"Failed to list repositories: {e}")
 
+    _available_repos_cache = (time.monotonic(), available_repos)
     return {"repos": available_repos}
 
 
@@ -887,22 +1016,33 @@ async def list_chat_history_api(user_id: str):
         raise HTTPException(status_code=400, detail="Missing user_id")
     
     logger.info(f"获取用户聊天记录: {user_id}")
-    supabase_client = SupabaseClient()
+    supabase_client = get_client()
     history = supabase_client.get_user_chat_history(user_id)
     return {"history": history}
 
 
 @app.get("/chat/messages/{chat_id}")
-async def get_chat_messages_api(chat_id: str):
+async def get_chat_messages_api(
+    chat_id: str,
+    since: Optional[str] = None,
+    limit: Optional[int] = None,
+    include_metadata: bool = True,
+):
     """
-    获取特定会话的消息记录
+    获取特定会话的消息记录。
+    since 为上一页最后一条消息的 created_at（键集分页，只返回更新的消息）；不传则返回全部。
     """
     if not chat_id:
         raise HTTPException(status_code=400, detail="Missing chat_id")
     
+    if limit is not None:
+        limit = max(1, min(limit, CHAT_MESSAGES_PAGE_MAX))
+
     logger.info(f"获取会话消息: {chat_id}")
-    supabase_client = SupabaseClient()
-    messages = supabase_client.get_chat_messages(chat_id)
+    supabase_client = get_client()
+    messages = supabase_client.get_chat_messages(
+        chat_id, since=since, limit=limit, include_metadata=include_metadata
+    )
     return {"messages": messages}
 
 
@@ -914,7 +1054,7 @@ async def delete_chat_history_api(chat_id: str, user_id: str):
     """
     if not chat_id or not user_id:
         raise HTTPException(status_code=400, detail="Missing chat_id or user_id")
-    supabase_client = SupabaseClient()
+    supabase_client = get_client()
     ok = supabase_client.delete_chat_history(chat_id, user_id)
     if not ok:
         raise HTTPException(status_code=404, detail="Chat not found or unauthorized")
@@ -964,7 +1104,9 @@ async def agent_chat_api(request: Request):
         if not question or not repo_url or not user_id:
             raise HTTPException(status_code=400, detail="Missing question, repo_url or user_id")
 
-        supabase_client = SupabaseClient()
+        supabase_client = get_client()
+        
+        new_session = not chat_id
         
         if not chat_id:
             # Use fast sync title generation (no LLM call)
@@ -975,7 +1117,7 @@ async def agent_chat_api(request: Request):
                 raise HTTPException(status_code=500, detail="Failed to create chat session")
             chat_id = chat_session["id"]
         
-        if supabase_client.add_chat_message(chat_id, "user", question) is None:
+        if supabase_client.add_chat_message(chat_id, "user", question, touch_history=not new_session) is None:
             raise HTTPException(status_code=500, detail="Failed to save user message")
 
         repo_info = supabase_client.get_repo_information(repo_url)
@@ -1076,7 +1218,9 @@ async def agent_chat_stream_api(request: Request):
         if not question or not repo_url or not user_id:
             raise HTTPException(status_code=400, detail="Missing question, repo_url or user_id")
 
-        supabase_client = SupabaseClient()
+        supabase_client = get_client()
+
+        new_session = not chat_id
 
         if not chat_id:
             # Use fast sync title generation (no LLM call)
@@ -1087,7 +1231,7 @@ async def agent_chat_stream_api(request: Request):
                 raise HTTPException(status_code=500, detail="Failed to create chat session")
             chat_id = chat_session["id"]
 
-        if supabase_client.add_chat_message(chat_id, "user", question) is None:
+        if supabase_client.add_chat_message(chat_id, "user", question, touch_history=not new_session) is None:
             raise HTTPException(status_code=500, detail="Failed to save user message")
         
         repo_info = supabase_client.get_repo_information(repo_url)
@@ -1166,5 +1310,19 @@ async def agent_chat_stream_api(request: Request):
 
 
 if __name__ == "__main__":
+    import importlib.util
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+
+    # uvloop / httptools 来自 uvicorn[standard]；缺失时回退到标准 asyncio 与 h11
+    loop_impl = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+    http_impl = "httptools" if importlib.util.find_spec("httptools") else "h11"
+    # 取消任务依赖进程内的 running_tasks，多 worker 部署需显式开启
+    workers = max(1, int(os.getenv("API_WORKERS", "1")))
+    uvicorn.run(
+        "scripts.api:app" if workers > 1 else app,
+        host="0.0.0.0",
+        port=8000,
+        loop=loop_impl,
+        http=http_impl,
+        workers=workers,
+    )
@@ -2,7 +2,7 @@ import os
 import sys
 import shutil
 from pathlib import Path
-from git import Repo, GitCommandError
+from git import Repo, GitCommandError, InvalidGitRepositoryError
 
 # 保证 `python docker/scripts/setup_repository.py` 等方式下可导入 src.*
 _SCRIPT_DIR = Path(__file__).resolve().parent
@@ -18,10 +18,32 @@ _DEFAULT_REPO_STORE = _REPO_ROOT / "data" / "repos"
 REPO_STORE_ROOT = Path(os.getenv("REPO_STORE_PATH", str(_DEFAULT_REPO_STORE))).expanduser()
 
 
+# 只需要 HEAD 的工作区用于生成文档与索引，不拉取历史
+CLONE_OPTIONS = ["--depth=1", "--single-branch"]
+
+
 def _is_remote_repo(repo_url_or_path: str) -> bool:
     return repo_url_or_path.startswith(("http://", "https://", "git@"))
 
 
+def _refresh_existing_clone(repo_dir: Path, repo_url: str) -> bool:
+    """
+    目录已是同一远程的克隆时，浅拉取最新提交并硬重置、清理未跟踪文件，
+    复用已有对象而不是删除重克隆。失败返回 False，由调用方回退到全新克隆。
+    """
+    try:
+        repo = Repo(str(repo_dir))
+        if not repo.remotes or repo.remotes.origin.url != repo_url:
+            return False
+        repo.git.fetch("origin", "--depth=1")
+        repo.git.reset("--hard", "FETCH_HEAD")
+        repo.git.clean("-fdx")
+        return True
+    except (GitCommandError, InvalidGitRepositoryError, AttributeError, ValueError) as e:
+        print(f"Reusing existing clone failed, re-cloning: {e}")
+        return False
+
+
 def setup_repository(repo_url_or_path: str) -> str:
     """
     将远程地址克隆到本地，并返回本地路径。
@@ -41,12 +63,15 @@ def setup_repository(repo_url_or_path: str) -> str:
         repo_dir_name = get_repo_disk_directory_name(repo_url_or_path)
         repo_dir = (REPO_STORE_ROOT / repo_dir_name).resolve()
 
-        # 保持目录可重复使用：每次拉取前清理旧目录，避免脏状态
         if repo_dir.exists():
+            if _refresh_existing_clone(repo_dir, repo_url_or_path):
+                print(f"Repository refreshed in place: {repo_dir}")
+                return str(repo_dir)
+            # 无法复用时清理旧目录，避免脏状态
             shutil.rmtree(repo_dir)
 
         print(f"Cloning repository {repo_url_or_path} to persistent directory: {repo_dir}")
-        Repo.clone_from(repo_url_or_path, str(repo_dir))
+        Repo.clone_from(repo_url_or_path, str(repo_dir), multi_options=CLONE_OPTIONS)
         print(f"Repository cloned successfully to: {repo_dir}")
         return str(repo_dir)
     except GitCommandError as e:
@@ -54,4 +79,4 @@ def setup_repository(repo_url_or_path: str) -> str:
         raise ValueError(f"Failed to clone repository: {e}, Please check if the repository is valid and accessible.")
     except Exception as e:
         print(f"Unexpected error: {e}")
-        raise 
+        raise
@@ -1,5 +1,7 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional, Iterator, Generator
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Iterator, Generator, Union
 
 class BaseAIClient(ABC):
     """
@@ -28,6 +30,20 @@ class BaseAIClient(ABC):
         """
         pass
     
+    async def achat(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        **kwargs
+    ) -> str:
+        """
+        异步聊天接口。
+
+        默认实现：在线程中执行阻塞式 chat；支持原生异步 SDK 的子类应覆盖此方法。
+        """
+        return await asyncio.to_thread(self.chat, messages, temperature, max_tokens, **kwargs)
+
     def stream_chat(
         self,
         messages: List[Dict[str, str]],
@@ -51,6 +67,41 @@ class BaseAIClient(ABC):
         result = self.chat(messages, temperature, max_tokens, **kwargs)
         yield result
     
+    def chat_many(
+        self,
+        batch: List[List[Dict[str, str]]],
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        max_concurrency: int = 8,
+        **kwargs
+    ) -> List[Union[str, Exception]]:
+        """
+        批量聊天接口，并发执行多组消息，结果顺序与 batch 一致。
+
+        单个请求失败不会中断整批，对应位置返回异常对象，由调用方决定如何处理。
+
+        Args:
+            batch: 多组消息列表
+            temperature: 生成温度
+            max_tokens: 最大生成 token 数
+            max_concurrency: 同时在途的请求数
+            **kwargs: 其他透传给底层的参数
+
+        Returns:
+            List[Union[str, Exception]]: 每组消息的生成文本或异常
+        """
+        # 默认实现：线程池并发调用阻塞式接口
+        def _call(messages: List[Dict[str, str]]) -> Union[str, Exception]:
+            try:
+                return self.chat(messages, temperature, max_tokens, **kwargs)
+            except Exception as e:
+                return e
+
+        if not batch:
+            return []
+        with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(batch)))) as executor:
+            return list(executor.map(_call, batch))
+
     def supports_streaming(self) -> bool:
         """
         检查客户端是否支持真正的流式输出。
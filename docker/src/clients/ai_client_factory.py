@@ -1,3 +1,4 @@
+import threading
 from typing import Optional, Dict, Type, Tuple
 from src.clients.ai_client_base import BaseAIClient
 from src.clients.openrouter_client import OpenRouterClient
@@ -11,10 +12,16 @@ class AIClientFactory:
         "openrouter": OpenRouterClient
     }
 
+    # 已创建的客户端实例，按 (服务商, 构造参数) 复用，共享底层 HTTP 连接池
+    _instances: Dict[Tuple, BaseAIClient] = {}
+    _lock = threading.Lock()
+
     @staticmethod
     def get_client(provider: str, **kwargs) -> BaseAIClient:
         """
         获取指定服务商的客户端实例。
+
+        相同服务商与构造参数返回同一个实例，避免每次调用都重建 HTTP 客户端和 TLS 连接。
         
         Args:
             provider: 服务商名称 ('openrouter')
@@ -23,11 +30,26 @@ class AIClientFactory:
         Returns:
             BaseAIClient: 客户端实例
         """
-        client_class = AIClientFactory._clients.get(provider.lower())
+        provider_key = provider.lower()
+        client_class = AIClientFactory._clients.get(provider_key)
         if not client_class:
             raise ValueError(f"不支持的服务商: {provider}。可选值: {list(AIClientFactory._clients.keys())}")
-        
-        return client_class(**kwargs)
+
+        try:
+            cache_key: Optional[Tuple] = (provider_key, tuple(sorted(kwargs.items())))
+            hash(cache_key)
+        except TypeError:
+            # 参数不可哈希时不做复用
+            cache_key = None
+        if cache_key is None:
+            return client_class(**kwargs)
+
+        with AIClientFactory._lock:
+            client = AIClientFactory._instances.get(cache_key)
+            if client is None:
+                client = client_class(**kwargs)
+                AIClientFactory._instances[cache_key] = client
+            return client
 
 def get_ai_client(provider: str = "openrouter", **kwargs) -> BaseAIClient:
     """
@@ -1,12 +1,35 @@
+import asyncio
+import importlib.util
 import os
 import logging
-from typing import List, Dict, Any, Optional, Generator
-from openai import OpenAI
+import threading
+import weakref
+from typing import List, Dict, Any, Optional, Generator, Union
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
 from src.clients.ai_client_base import BaseAIClient
-from dotenv import load_dotenv
+from src.utils.env import load_env
+
+# 只在导入时读取一次 .env，避免每次构造客户端都向上遍历目录查找文件
+load_env()
 
 logger = logging.getLogger("app.clients.openrouter")
 
+# 安装了 h2 时启用 HTTP/2，多个并发请求复用同一条连接
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# 429/5xx/连接错误由 SDK 自动重试（指数退避 + 抖动，遵循 Retry-After）
+MAX_RETRIES = 5
+REQUEST_TIMEOUT = httpx.Timeout(120.0, connect=10.0)
+# 连接池：并发调用时复用 keep-alive 连接，减少 TLS 握手；
+# 空闲连接保留 5 分钟（httpx 默认 5 秒），覆盖章节之间的间隔
+POOL_LIMITS = httpx.Limits(
+    max_connections=128,
+    max_keepalive_connections=64,
+    keepalive_expiry=300.0,
+)
+
 
 class OpenRouterClient(BaseAIClient):
     """
@@ -24,21 +47,52 @@ class OpenRouterClient(BaseAIClient):
         model: Optional[str] = None,
         base_url: Optional[str] = None
     ):
-        load_dotenv()
         self.api_key = api_key or os.getenv("OPENROUTER_API_KEY")
         if not self.api_key:
             raise ValueError("未检测到 OPENROUTER_API_KEY，请设置环境变量。")
         
         self.base_url = base_url or self.DEFAULT_BASE_URL
         self.model = model or self.DEFAULT_MODEL
+        self.default_headers = {
+            "HTTP-Referer": "https://github.com/FAN-Tianrui-FYP",
+            "X-Title": "FYP Wiki Generator"
+        }
         self.client = OpenAI(
             api_key=self.api_key, 
             base_url=self.base_url,
-            default_headers={
-                "HTTP-Referer": "https://github.com/FAN-Tianrui-FYP",
-                "X-Title": "FYP Wiki Generator"
-            }
+            default_headers=self.default_headers,
+            max_retries=MAX_RETRIES,
+            timeout=REQUEST_TIMEOUT,
+            http_client=httpx.Client(
+                http2=_HTTP2_AVAILABLE, limits=POOL_LIMITS, timeout=REQUEST_TIMEOUT
+            ),
+        )
+        # 异步客户端与事件循环绑定，每个循环懒加载一个；实例在进程内共享（见 ai_client_factory），
+        # 多个线程各自运行的事件循环互不覆盖。以循环为弱引用键，循环被回收时其客户端随之释放
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = (
+            weakref.WeakKeyDictionary()
         )
+        self._async_clients_lock = threading.Lock()
+
+    def _new_async_client(self) -> AsyncOpenAI:
+        return AsyncOpenAI(
+            api_key=self.api_key,
+            base_url=self.base_url,
+            default_headers=self.default_headers,
+            max_retries=MAX_RETRIES,
+            timeout=REQUEST_TIMEOUT,
+            http_client=httpx.AsyncClient(
+                http2=_HTTP2_AVAILABLE, limits=POOL_LIMITS, timeout=REQUEST_TIMEOUT
+            ),
+        )
+
+    def _get_async_client(self) -> AsyncOpenAI:
+        loop = asyncio.get_running_loop()
+        with self._async_clients_lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = self._async_clients[loop] = self._new_async_client()
+        return client
 
     def chat(
         self,
@@ -61,6 +115,75 @@ class OpenRouterClient(BaseAIClient):
         except Exception as e:
             raise RuntimeError(f"OpenRouter API 调用失败: {e}")
     
+    async def achat(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        *,
+        client: Optional[AsyncOpenAI] = None,
+        **kwargs
+    ) -> str:
+        """异步聊天接口，等待响应期间不占用线程"""
+        try:
+            response = await (client or self._get_async_client()).chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=False,
+                **kwargs
+            )
+            return response.choices[0].message.content.strip()
+        except Exception as e:
+            raise RuntimeError(f"OpenRouter API 调用失败: {e}")
+
+    async def achat_many(
+        self,
+        batch: List[List[Dict[str, str]]],
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        max_concurrency: int = 8,
+        *,
+        client: Optional[AsyncOpenAI] = None,
+        **kwargs
+    ) -> List[Union[str, Exception]]:
+        """异步批量聊天：共享同一个 HTTP 连接池并发发送，失败项以异常对象返回"""
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def _call(messages: List[Dict[str, str]]) -> str:
+            async with semaphore:
+                return await self.achat(messages, temperature, max_tokens, client=client, **kwargs)
+
+        return list(await asyncio.gather(*(_call(m) for m in batch), return_exceptions=True))
+
+    def chat_many(
+        self,
+        batch: List[List[Dict[str, str]]],
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        max_concurrency: int = 8,
+        **kwargs
+    ) -> List[Union[str, Exception]]:
+        """
+        同步批量聊天接口，供离线批处理使用（不可在运行中的事件循环内调用，
+        协程场景请直接 await achat_many）。
+        """
+        if not batch:
+            return []
+
+        async def _run() -> List[Union[str, Exception]]:
+            # 本次事件循环专用的客户端，结束时关闭连接
+            client = self._new_async_client()
+            try:
+                return await self.achat_many(
+                    batch, temperature, max_tokens, max_concurrency, client=client, **kwargs
+                )
+            finally:
+                await client.close()
+
+        return asyncio.run(_run())
+
     def stream_chat(
         self,
         messages: List[Dict[str, str]],
@@ -1,8 +1,15 @@
 import os
 import json
 import logging
+import threading
 from pathlib import Path
-from typing import Union, Dict, Any
+from types import MappingProxyType
+from typing import Union, Dict, Any, Mapping, Tuple
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # 未安装时回退到标准库 json
+    orjson = None
 
 # 使用通用日志记录器
 logger = logging.getLogger("app.config")
@@ -31,16 +38,56 @@ def load_config(config_path: Union[str, Path] = CONFIG_PATH) -> Dict[str, Any]:
             
     logger.info(f"Loading configuration from: {config_path}")
     try:
-        with open(config_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        raw = config_path.read_bytes()
+        return orjson.loads(raw) if orjson is not None else json.loads(raw)
     except Exception as e:
         logger.error(f"Error reading config file: {e}")
         return {}
 
-# 预加载全局配置供其他模块直接使用
-CONFIG = load_config()
 
-def get_wiki_content_concurrency(config: Dict[str, Any] | None = None) -> int:
+def _freeze(value: Any) -> Any:
+    """递归转为只读结构：dict -> MappingProxyType，list -> tuple"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+# 预加载全局配置供其他模块直接使用；只读，可在线程间直接共享
+CONFIG: Mapping[str, Any] = _freeze(load_config())
+
+
+# 路径 -> ((mtime_ns, size), 只读配置)；文件未变化时直接复用解析结果
+_config_cache: Dict[str, Tuple[Tuple[int, int], Mapping[str, Any]]] = {}
+_config_cache_lock = threading.Lock()
+
+
+def get_config(config_path: Union[str, Path] = CONFIG_PATH) -> Mapping[str, Any]:
+    """
+    返回指定配置文件的只读视图，按 (mtime, size) 缓存，文件被修改后自动重新加载。
+    每个任务会多次读取同一份配置，这里避免重复的磁盘读取与解析。
+    """
+    key = str(config_path)
+    try:
+        st = os.stat(key)
+        stamp = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        # 文件不存在时交给 load_config 处理备选路径与错误日志，不缓存
+        return _freeze(load_config(config_path))
+
+    with _config_cache_lock:
+        cached = _config_cache.get(key)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+
+    config = _freeze(load_config(config_path))
+    with _config_cache_lock:
+        _config_cache[key] = (stamp, config)
+    return config
+
+
+def get_wiki_content_concurrency(config: Mapping[str, Any] | None = None) -> int:
     """获取 wiki 正文生成并发数，默认 3"""
     cfg = config or CONFIG
     return cfg.get("wiki_generation", {}).get("content_concurrency", 3)
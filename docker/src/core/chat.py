@@ -1,19 +1,27 @@
+import asyncio
+import functools
+import hashlib
 import json
 import os
 import logging
+import sys
 import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
-from typing import Dict, Generator, Iterable, List, Mapping, Optional, Tuple
+from typing import Callable, Dict, Generator, Iterable, List, Mapping, Optional, Tuple
 
+import numpy as np
 from langchain_core.documents import Document
 from src.clients.ai_client_factory import get_ai_client, get_model_config
 from src.config import CONFIG
 from src.prompts import get_rag_chat_prompt, HYDE_PROMPT, RAG_CHAT_PROMPT, RAG_CHAT_WITH_HISTORY_PROMPT
-from src.ingestion.kb_loader import load_knowledge_base
+from src.ingestion.kb_loader import load_knowledge_base, search_with_exact_rerank
 from src.core.retrieval import (
     RankedCandidate,
     SparseBM25Index,
+    clear_tokenize_cache,
     compute_doc_key,
     create_community_retriever,
     mmr_select,
@@ -45,21 +53,38 @@ RAG_PROMPT = get_rag_chat_prompt()
 # HyDE 配置
 HYDE_ENABLED = True  # 是否启用 HyDE
 
+# 批量问答时同时在途的问题数（受 LLM 账号 RPS 限制）
+ANSWER_BATCH_CONCURRENCY = 8
+
 # 缓存配置
 CACHE_TTL_SECONDS = 3600  # 1 小时缓存过期
 CACHE_MAX_ENTRIES = 10    # 最多缓存 10 个仓库的向量库
+EMBED_CACHE_MAX_ENTRIES = 1024  # 查询向量缓存条数上限
+
+# 语义答案缓存配置（随机投影 LSH + 余弦阈值）
+SEMANTIC_CACHE_ENABLED = True
+SEMANTIC_CACHE_THRESHOLD = 0.95
+SEMANTIC_CACHE_BITS = 16
+SEMANTIC_CACHE_MAX_ENTRIES = 512
+SEMANTIC_CACHE_TTL_SECONDS = 600  # 答案缓存过期时间，兜底其他进程重建索引等未通知到的情况
+
+# 跨类别稠密检索的共享线程池大小（多个并发请求共用，每个请求最多占用类别数个线程）
+DENSE_SEARCH_POOL_WORKERS = 8
 
 
 @dataclass
 class CategoryRetrievalUnit:
     dense_store: "FAISS"
     sparse_index: SparseBM25Index | None
+    # 加载时的索引文件指纹（见 _index_fingerprint），语义答案缓存按它区分索引版本
+    fingerprint: Tuple[int, ...] = ()
 
 
 @dataclass
 class CachedStoreEntry:
     """缓存的向量库条目"""
     stores: Dict[str, CategoryRetrievalUnit]
+    fingerprint: Tuple[int, ...] = ()
     created_at: float = field(default_factory=time.time)
     last_accessed: float = field(default_factory=time.time)
     
@@ -83,8 +108,13 @@ class VectorStoreCache:
         self._lock = threading.RLock()
         self._max_entries = max_entries
     
-    def get(self, root_path: str) -> Optional[Dict[str, CategoryRetrievalUnit]]:
-        """获取缓存的向量库，如果不存在或已过期则返回 None"""
+    def get(
+        self, root_path: str, fingerprint: Optional[Tuple[int, ...]] = None
+    ) -> Optional[Dict[str, CategoryRetrievalUnit]]:
+        """
+        获取缓存的向量库，如果不存在或已过期则返回 None。
+        传入 fingerprint 时，若与缓存时记录的索引文件指纹不一致（磁盘上已重建）同样视为失效。
+        """
         with self._lock:
             entry = self._cache.get(root_path)
             if entry is None:
@@ -94,12 +124,22 @@ class VectorStoreCache:
                 logger.info(f"[VectorStoreCache] Cache expired for {root_path}")
                 del self._cache[root_path]
                 return None
+
+            if fingerprint is not None and entry.fingerprint and entry.fingerprint != fingerprint:
+                logger.info(f"[VectorStoreCache] Index files changed on disk for {root_path}")
+                del self._cache[root_path]
+                return None
             
             entry.touch()
             logger.debug(f"[VectorStoreCache] Cache hit for {root_path}")
             return entry.stores
     
-    def put(self, root_path: str, stores: Dict[str, CategoryRetrievalUnit]) -> None:
+    def put(
+        self,
+        root_path: str,
+        stores: Dict[str, CategoryRetrievalUnit],
+        fingerprint: Tuple[int, ...] = (),
+    ) -> None:
         """存入向量库缓存"""
         with self._lock:
             # LRU 清理：如果超过最大条目数，移除最久未访问的
@@ -108,7 +148,7 @@ class VectorStoreCache:
                 logger.info(f"[VectorStoreCache] Evicting LRU entry: {oldest_key}")
                 del self._cache[oldest_key]
             
-            self._cache[root_path] = CachedStoreEntry(stores=stores)
+            self._cache[root_path] = CachedStoreEntry(stores=stores, fingerprint=fingerprint)
             logger.info(f"[VectorStoreCache] Cached stores for {root_path}, total entries: {len(self._cache)}")
     
     def invalidate(self, root_path: str) -> None:
@@ -134,8 +174,203 @@ class VectorStoreCache:
             }
 
 
+class QueryEmbeddingCache:
+    """
+    进程级查询向量缓存
+
+    以问题文本的 SHA1 为 key，命中时跳过一次嵌入 API 往返。
+    使用 OrderedDict 实现 LRU 淘汰。
+    """
+
+    def __init__(self, max_entries: int = EMBED_CACHE_MAX_ENTRIES):
+        self._cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._max_entries = max_entries
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def get_or_embed(self, store: "FAISS", text: str) -> List[float]:
+        """返回缓存的查询向量；未命中时使用 store 的嵌入模型计算并写入缓存"""
+        key = self._key(text)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+
+        embedding = store._embed_query(text)
+
+        with self._lock:
+            self._cache[key] = embedding
+            self._cache.move_to_end(key)
+            while len(self._cache) > self._max_entries:
+                self._cache.popitem(last=False)
+        return embedding
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+
+@dataclass
+class _SemanticCacheEntry:
+    scope: str
+    fingerprint: Tuple[int, ...]
+    bucket: int
+    vector: np.ndarray
+    result: Dict[str, object]
+    created_at: float = field(default_factory=time.time)
+
+
+class SemanticAnswerCache:
+    """
+    语义答案缓存
+
+    用固定的随机投影矩阵 R[d, bits] 对归一化后的查询向量做 sign(q @ R)，
+    得到 bits 位的 LSH 桶号；查找时只在同一 (scope, 桶) 内做精确余弦比较，
+    相似度不低于阈值则直接返回缓存的 {answer, sources}，跳过检索与 LLM 调用。
+    scope 一般为向量库根目录，保证不同仓库之间互不串用；fingerprint 为检索所用索引的
+    文件指纹，索引在其他进程中重建后旧答案不会再命中。条目超过 ttl 秒后同样失效。
+    """
+
+    def __init__(
+        self,
+        *,
+        n_bits: int = SEMANTIC_CACHE_BITS,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+        ttl: float = SEMANTIC_CACHE_TTL_SECONDS,
+        seed: int = 0,
+    ):
+        self._n_bits = n_bits
+        self._threshold = threshold
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._seed = seed
+        self._projections: Dict[int, np.ndarray] = {}
+        self._bit_weights = 1 << np.arange(n_bits, dtype=np.int64)
+        self._entries: "OrderedDict[int, _SemanticCacheEntry]" = OrderedDict()
+        self._buckets: Dict[Tuple[str, Tuple[int, ...], int], List[int]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def _projection(self, dim: int) -> np.ndarray:
+        projection = self._projections.get(dim)
+        if projection is None:
+            rng = np.random.default_rng(self._seed)
+            projection = rng.standard_normal((dim, self._n_bits))
+            self._projections[dim] = projection
+        return projection
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        if norm == 0.0:
+            return None
+        return vector / norm
+
+    def _bucket(self, vector: np.ndarray) -> int:
+        bits = (vector @ self._projection(vector.shape[0])) > 0
+        return int(bits.astype(np.int64) @ self._bit_weights)
+
+    def lookup(
+        self, scope: str, embedding: List[float], fingerprint: Tuple[int, ...] = ()
+    ) -> Optional[Dict[str, object]]:
+        """命中时返回缓存结果的副本，否则返回 None"""
+        vector = self._normalize(embedding)
+        if vector is None:
+            return None
+        with self._lock:
+            key = (scope, fingerprint, self._bucket(vector))
+            ids = self._buckets.get(key)
+            if not ids:
+                return None
+            deadline = time.time() - self._ttl
+            expired = [entry_id for entry_id in ids if self._entries[entry_id].created_at < deadline]
+            for entry_id in expired:
+                self._drop_from_bucket(entry_id, self._entries.pop(entry_id))
+            ids = self._buckets.get(key)
+            if not ids:
+                return None
+            matrix = np.stack([self._entries[entry_id].vector for entry_id in ids])
+            sims = matrix @ vector
+            best = int(np.argmax(sims))
+            if float(sims[best]) < self._threshold:
+                return None
+            entry_id = ids[best]
+            self._entries.move_to_end(entry_id)
+            result = self._entries[entry_id].result
+            return {"answer": result["answer"], "sources": list(result["sources"])}
+
+    def put(
+        self,
+        scope: str,
+        embedding: List[float],
+        result: Dict[str, object],
+        fingerprint: Tuple[int, ...] = (),
+    ) -> None:
+        vector = self._normalize(embedding)
+        if vector is None:
+            return
+        with self._lock:
+            bucket = self._bucket(vector)
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = _SemanticCacheEntry(
+                scope=scope,
+                fingerprint=fingerprint,
+                bucket=bucket,
+                vector=vector,
+                result={"answer": result["answer"], "sources": list(result["sources"])},
+            )
+            self._buckets.setdefault((scope, fingerprint, bucket), []).append(entry_id)
+            while len(self._entries) > self._max_entries:
+                oldest_id, oldest = self._entries.popitem(last=False)
+                self._drop_from_bucket(oldest_id, oldest)
+
+    def _drop_from_bucket(self, entry_id: int, entry: _SemanticCacheEntry) -> None:
+        key = (entry.scope, entry.fingerprint, entry.bucket)
+        ids = self._buckets.get(key)
+        if not ids:
+            return
+        ids.remove(entry_id)
+        if not ids:
+            del self._buckets[key]
+
+    def invalidate(self, scope: str) -> None:
+        with self._lock:
+            stale = [entry_id for entry_id, entry in self._entries.items() if entry.scope == scope]
+            for entry_id in stale:
+                self._drop_from_bucket(entry_id, self._entries.pop(entry_id))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+
 # 全局缓存实例
 _vector_store_cache = VectorStoreCache()
+_query_embedding_cache = QueryEmbeddingCache()
+_semantic_answer_cache = SemanticAnswerCache()
+
+_dense_search_pool: Optional[ThreadPoolExecutor] = None
+_dense_search_pool_lock = threading.Lock()
+
+
+def _get_dense_search_pool() -> ThreadPoolExecutor:
+    """进程内共享的稠密检索线程池，懒加载；避免每次查询都创建并销毁线程。"""
+    global _dense_search_pool
+    if _dense_search_pool is None:
+        with _dense_search_pool_lock:
+            if _dense_search_pool is None:
+                _dense_search_pool = ThreadPoolExecutor(
+                    max_workers=DENSE_SEARCH_POOL_WORKERS, thread_name_prefix="dense-search"
+                )
+    return _dense_search_pool
 
 
 def _ensure_api_key() -> None:
@@ -219,27 +454,52 @@ def _resolve_vector_store_root(base_path: str) -> str:
     return candidate
 
 
+@functools.lru_cache(maxsize=64)
 def _resolve_category_path(root_path: str, category: str) -> str:
     """
     解析并返回指定类别向量库的目录路径。
     支持标准目录结构和直接指定类别目录的情况。
     如果找不到对应的向量库文件则抛出异常。
+
+    解析结果按 (root_path, category) 缓存（找不到时不缓存），
+    重建索引后由 invalidate_vector_store_cache 清空。
     """
     candidate = os.path.join(root_path, category)
-    index_file = os.path.join(candidate, "index.faiss")
-    if os.path.exists(index_file):
+    try:
+        os.stat(os.path.join(candidate, "index.faiss"))
         return candidate
+    except OSError:
+        # 与 os.path.exists 一致：路径是普通文件（NotADirectoryError）或无权限等同样视为不存在
+        pass
 
     # 兼容直接指定到具体类别目录的情况
-    root_index = os.path.join(root_path, "index.faiss")
-    if os.path.exists(root_index) and os.path.basename(root_path).lower() == category:
-        return root_path
+    if os.path.basename(root_path).lower() == category:
+        try:
+            os.stat(os.path.join(root_path, "index.faiss"))
+            return root_path
+        except OSError:
+            pass
 
     raise FileNotFoundError(
         f"No '{category}' vector store under {root_path}/{category} (missing index.faiss)."
     )
 
 
+def _index_fingerprint(root_path: str, categories: Iterable[str]) -> Tuple[int, ...]:
+    """
+    由各类别 index.faiss 的 mtime 组成的指纹，用于在磁盘索引重建后让进程级缓存失效。
+    缺失的类别记为 0。
+    """
+    stamps: List[int] = []
+    for category in categories:
+        try:
+            category_path = _resolve_category_path(root_path, category)
+            stamps.append(os.stat(os.path.join(category_path, "index.faiss")).st_mtime_ns)
+        except OSError:
+            stamps.append(0)
+    return tuple(stamps)
+
+
 def _extract_store_documents(store: "FAISS") -> List[Document]:
     """
     从 FAISS 向量库中提取所有缓存的 Document 对象。
@@ -274,15 +534,19 @@ def _load_vector_stores(
     
     性能优化：使用进程级缓存避免重复加载。
     """
-    # 尝试从缓存获取
+    categories = list(categories)
+    fingerprint = _index_fingerprint(root_path, categories)
+
+    # 尝试从缓存获取（索引文件 mtime 变化时视为未命中）
     if use_cache:
-        cached = _vector_store_cache.get(root_path)
+        cached = _vector_store_cache.get(root_path, fingerprint)
         if cached is not None:
             logger.info(f"[RAG] Using cached vector stores for {root_path}")
             return cached
     
-    # 缓存未命中，执行加载
+    # 缓存未命中，执行加载；该仓库基于旧索引缓存的语义答案一并清理
     logger.info(f"[RAG] Loading vector stores from {root_path} (cache miss)")
+    _semantic_answer_cache.invalidate(root_path)
     load_start = time.time()
     
     stores: Dict[str, CategoryRetrievalUnit] = {}
@@ -296,6 +560,7 @@ def _load_vector_stores(
             stores[category] = CategoryRetrievalUnit(
                 dense_store=dense_store,
                 sparse_index=sparse_index,
+                fingerprint=fingerprint,
             )
         except FileNotFoundError as e:
             logger.warning(f"Category '{category}' not found: {e}")
@@ -306,7 +571,7 @@ def _load_vector_stores(
     
     # 存入缓存
     if use_cache and stores:
-        _vector_store_cache.put(root_path, stores)
+        _vector_store_cache.put(root_path, stores, fingerprint)
     
     return stores
 
@@ -318,10 +583,15 @@ def invalidate_vector_store_cache(root_path: Optional[str] = None) -> None:
     Args:
         root_path: 指定要失效的路径，None 表示清空所有缓存
     """
+    _resolve_category_path.cache_clear()
+    clear_tokenize_cache()
     if root_path:
         _vector_store_cache.invalidate(root_path)
+        _semantic_answer_cache.invalidate(root_path)
     else:
         _vector_store_cache.clear()
+        _query_embedding_cache.clear()
+        _semantic_answer_cache.clear()
 
 
 def get_vector_store_cache_stats() -> Dict[str, any]:
@@ -339,19 +609,39 @@ def _format_documents(docs: List[Document]) -> str:
         return ""
 
     formatted_chunks: List[str] = []
+    append = formatted_chunks.append
     for idx, doc in enumerate(docs, start=1):
-        source = doc.metadata.get("source") or doc.metadata.get("file_path") or ""
-        category = doc.metadata.get("kb_category", "")
-        header_parts = [f"[chunk {idx}]"]
+        meta_get = doc.metadata.get
+        source = meta_get("source") or meta_get("file_path") or ""
+        category = meta_get("kb_category", "")
+        header = f"[chunk {idx}]"
         if category:
-            header_parts.append(f"type: {category}")
+            header += f" | type: {category}"
         if source:
-            header_parts.append(f"source: {source}")
-        header = " | ".join(header_parts)
-        formatted_chunks.append(f"{header}\n{doc.page_content.strip()}")
+            header += f" | source: {source}"
+        content = doc.page_content
+        # 大多数切片首尾本就没有空白，避免无谓的 strip 拷贝
+        if content and (content[0].isspace() or content[-1].isspace()):
+            content = content.strip()
+        append(f"{header}\n{content}")
     return "\n\n".join(formatted_chunks)
 
 
+def _extract_sources(docs: List[Document]) -> List[str]:
+    """按出现顺序提取去重后的来源标识（category:source）"""
+    sources: List[str] = []
+    seen_sources = set()  # 去重
+    for doc in docs:
+        meta_get = doc.metadata.get
+        source = meta_get("source") or meta_get("file_path")
+        category = meta_get("kb_category")
+        source_key = f"{category}:{source}" if category and source else (source or category)
+        if source_key and source_key not in seen_sources:
+            seen_sources.add(source_key)
+            sources.append(source_key)
+    return sources
+
+
 def _load_graphrag_communities(
     root_path: str,
 ) -> Optional[Tuple[Dict[int, List[str]], Dict[int, str]]]:
@@ -399,6 +689,54 @@ def _collect_all_store_documents(
     return combined
 
 
+def _dense_search_by_vector(
+    unit: CategoryRetrievalUnit, embedding: List[float], k: int
+) -> List[Tuple[Document, float]]:
+    """
+    用预先计算好的查询向量执行 FAISS 检索，并换算为与
+    similarity_search_with_relevance_scores 一致的相关性分数。
+    """
+    store = unit.dense_store
+    # 量化索引先过采样再用 FP32 向量精确重排，未量化时走原生检索
+    hits = search_with_exact_rerank(store, embedding, k)
+    if hits is None:
+        hits = store.similarity_search_with_score_by_vector(embedding, k=k)
+    relevance_fn = store._select_relevance_score_fn()
+    return [(doc, relevance_fn(score)) for doc, score in hits]
+
+
+def _search_dense_all(
+    stores: Mapping[str, CategoryRetrievalUnit],
+    question: str,
+    dense_k_plan: Mapping[str, int],
+) -> Dict[str, List[Tuple[Document, float]]]:
+    """
+    跨类别稠密检索：所有类别共用同一嵌入模型（见 load_knowledge_base），
+    查询只嵌入一次，随后各类别的 FAISS 检索借助共享线程池并发执行（FAISS 检索会释放 GIL）。
+    返回类别到 (文档, 相关性分数) 列表的映射。
+    """
+    if not stores:
+        return {}
+
+    first_unit = next(iter(stores.values()))
+    embedding = _query_embedding_cache.get_or_embed(first_unit.dense_store, question)
+
+    # 第一个类别在当前线程执行，其余类别交给共享线程池并发检索
+    first_category, *rest = stores
+    futures = {
+        category: _get_dense_search_pool().submit(
+            _dense_search_by_vector, stores[category], embedding, dense_k_plan[category]
+        )
+        for category in rest
+    }
+    results = {
+        first_category: _dense_search_by_vector(first_unit, embedding, dense_k_plan[first_category])
+    }
+    for category, future in futures.items():
+        results[category] = future.result()
+    return {category: results[category] for category in stores}
+
+
 def _gather_dense_faiss_hits(
     stores: Mapping[str, CategoryRetrievalUnit],
     question: str,
@@ -409,12 +747,14 @@ def _gather_dense_faiss_hits(
     仅稠密向量检索命中（跨类别合并），供 CommunityFirstRetriever.hybrid_retrieve 与社区稀疏分融合。
     """
     best_by_key: Dict[str, Tuple[Document, float]] = {}
-    for category, unit in stores.items():
-        planned_base = max(int(category_top_k.get(category, 0)), 1)
-        dense_k = _plan_method_k(planned_base, DENSE_K_MULTIPLIER)
-        dense_hits = unit.dense_store.similarity_search_with_relevance_scores(
-            question, k=dense_k
+    dense_k_plan = {
+        category: _plan_method_k(
+            max(int(category_top_k.get(category, 0)), 1), DENSE_K_MULTIPLIER
         )
+        for category in stores
+    }
+    hits_by_category = _search_dense_all(stores, question, dense_k_plan)
+    for category, dense_hits in hits_by_category.items():
         for doc, score in dense_hits:
             enriched = _attach_category(doc, category)
             key = f"{category}|{compute_doc_key(enriched)}"
@@ -495,19 +835,16 @@ def _collect_candidates_for_category(
     unit: CategoryRetrievalUnit,
     question: str,
     *,
-    dense_k: int,
+    dense_hits: List[Tuple[Document, float]],
     sparse_k: int,
 ) -> List[RankedCandidate]:
     """
     为指定类别收集混合检索候选文档。
-    同时执行密集向量检索和稀疏 BM25 检索，合并结果并计算混合分数。
+    合并已完成的密集向量检索结果与稀疏 BM25 检索结果，并计算混合分数。
     返回去重后的候选文档列表，每个候选包含密集分数、稀疏分数和最终混合分数。
     """
     candidates: Dict[str, RankedCandidate] = {}
 
-    dense_hits = unit.dense_store.similarity_search_with_relevance_scores(
-        question, k=dense_k
-    )
     dense_scores = normalize_scores([score for _, score in dense_hits])
     for idx, (doc, _) in enumerate(dense_hits):
         norm_score = dense_scores[idx] if idx < len(dense_scores) else 0.0
@@ -562,15 +899,22 @@ def _gather_hybrid_candidates(
     """
     final_candidates: List[RankedCandidate] = []
 
+    planned_bases = {
+        category: max(int(category_top_k.get(category, 0)), 1) for category in stores
+    }
+    dense_k_plan = {
+        category: _plan_method_k(base, DENSE_K_MULTIPLIER)
+        for category, base in planned_bases.items()
+    }
+    hits_by_category = _search_dense_all(stores, question, dense_k_plan)
+
     for category, unit in stores.items():
-        planned_base = max(int(category_top_k.get(category, 0)), 1)
-        dense_k = _plan_method_k(planned_base, DENSE_K_MULTIPLIER)
-        sparse_k = _plan_method_k(planned_base, SPARSE_K_MULTIPLIER)
+        sparse_k = _plan_method_k(planned_bases[category], SPARSE_K_MULTIPLIER)
         category_candidates = _collect_candidates_for_category(
             category,
             unit,
             question,
-            dense_k=dense_k,
+            dense_hits=hits_by_category.get(category, []),
             sparse_k=sparse_k,
         )
         final_candidates.extend(category_candidates)
@@ -593,6 +937,7 @@ def answer_question(
     category_top_k: Mapping[str, int] | None = None,
     conversation_history: Optional[List[Dict[str, str]]] = None,
     use_hyde: bool = True,
+    stream_callback: Optional[Callable[[str], None]] = None,
 ) -> Dict[str, object]:
     """
     基于本地多类别 FAISS 向量库执行检索增强问答（RAG）。
@@ -606,6 +951,7 @@ def answer_question(
         category_top_k: 各类别检索的 top-k 配置
         conversation_history: 对话历史列表 [{"role": "user/assistant", "content": "..."}]
         use_hyde: 是否使用 HyDE 技术增强检索
+        stream_callback: 可选，答案生成时逐段回调增量文本
         
     Returns:
         包含答案文本和参考来源的字典
@@ -627,8 +973,96 @@ def answer_question(
         conversation_history=conversation_history,
         use_hyde=use_hyde and HYDE_ENABLED,
         graphrag=graphrag,
+        cache_scope=root_path,
+        stream_callback=stream_callback,
+    )
+
+
+async def answer_question_async(
+    db_path: str,
+    question: str,
+    *,
+    category_top_k: Mapping[str, int] | None = None,
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    use_hyde: bool = True,
+) -> Dict[str, object]:
+    """
+    answer_question 的协程版本。
+
+    向量库与 GraphRAG 社区并发加载；检索和 LLM 调用在线程池中执行，
+    等待网络 I/O 期间事件循环可以继续处理其他请求。
+    """
+    if not question or not question.strip():
+        raise ValueError("Question must not be empty.")
+
+    _ensure_api_key()
+
+    root_path = _resolve_vector_store_root(db_path)
+    top_k_plan = dict(category_top_k or CATEGORY_TOP_K)
+    stores, graphrag = await asyncio.gather(
+        asyncio.to_thread(_load_vector_stores, root_path, list(top_k_plan.keys())),
+        asyncio.to_thread(_load_graphrag_communities, root_path),
+    )
+
+    return await asyncio.to_thread(
+        _answer_with_stores,
+        stores,
+        question,
+        category_top_k=top_k_plan,
+        conversation_history=conversation_history,
+        use_hyde=use_hyde and HYDE_ENABLED,
+        graphrag=graphrag,
+        cache_scope=root_path,
+    )
+
+
+async def answer_questions(
+    db_path: str,
+    questions: List[str],
+    *,
+    category_top_k: Mapping[str, int] | None = None,
+    use_hyde: bool = True,
+    max_concurrency: int = ANSWER_BATCH_CONCURRENCY,
+) -> List[Dict[str, object]]:
+    """
+    并发回答同一仓库的多个单轮问题，结果顺序与 questions 一致。
+    向量库只加载一次，最多 max_concurrency 个问题同时在途。
+    """
+    if any(not q or not q.strip() for q in questions):
+        raise ValueError("Question must not be empty.")
+    if not questions:
+        return []
+
+    _ensure_api_key()
+
+    root_path = _resolve_vector_store_root(db_path)
+    top_k_plan = dict(category_top_k or CATEGORY_TOP_K)
+    stores, graphrag = await asyncio.gather(
+        asyncio.to_thread(_load_vector_stores, root_path, list(top_k_plan.keys())),
+        asyncio.to_thread(_load_graphrag_communities, root_path),
     )
 
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def _answer_one(question: str) -> Dict[str, object]:
+        async with semaphore:
+            return await asyncio.to_thread(
+                _answer_with_stores,
+                stores,
+                question,
+                category_top_k=top_k_plan,
+                use_hyde=use_hyde and HYDE_ENABLED,
+                graphrag=graphrag,
+                cache_scope=root_path,
+            )
+
+    return list(await asyncio.gather(*(_answer_one(q) for q in questions)))
+
+
+def _write_stdout(delta: str) -> None:
+    sys.stdout.write(delta)
+    sys.stdout.flush()
+
 
 def interactive_chat(
     db_path: str, *, category_top_k: Mapping[str, int] | None = None
@@ -660,19 +1094,20 @@ def interactive_chat(
             print("Goodbye.")
             break
 
+        print("\nAnswer:")
         try:
             result = _answer_with_stores(
                 stores,
                 question,
                 category_top_k=top_k_plan,
                 graphrag=graphrag,
+                stream_callback=_write_stdout,
             )
         except Exception as exc:
-            print(f"Error: {exc}")
+            print(f"\nError: {exc}")
             continue
 
-        print("\nAnswer:")
-        print(result["answer"])
+        print()
         if result["sources"]:
             print("\nSources:")
             for src in result["sources"]:
@@ -688,6 +1123,8 @@ def _answer_with_stores(
     conversation_history: Optional[List[Dict[str, str]]] = None,
     use_hyde: bool = True,
     graphrag: Optional[Tuple[Dict[int, List[str]], Dict[int, str]]] = None,
+    cache_scope: Optional[str] = None,
+    stream_callback: Optional[Callable[[str], None]] = None,
 ) -> Dict[str, object]:
     """
     使用已加载的向量库回答问题。
@@ -702,12 +1139,31 @@ def _answer_with_stores(
         category_top_k: 各类别检索的 top-k 配置
         conversation_history: 对话历史列表
         use_hyde: 是否使用 HyDE 技术
+        cache_scope: 语义答案缓存的作用域（通常为向量库根目录），None 表示不使用缓存
+        stream_callback: 可选，传入时以流式接口生成答案并逐段回调增量文本
         
     Returns:
         包含答案和来源的字典
     """
     _ensure_api_key()
 
+    # 语义缓存：多轮对话的答案依赖历史，只缓存无历史的单轮问答
+    question_embedding: Optional[List[float]] = None
+    use_semantic_cache = (
+        SEMANTIC_CACHE_ENABLED and cache_scope is not None and bool(stores) and not conversation_history
+    )
+    if use_semantic_cache:
+        first_unit = next(iter(stores.values()))
+        question_embedding = _query_embedding_cache.get_or_embed(first_unit.dense_store, question)
+        cached_result = _semantic_answer_cache.lookup(
+            cache_scope, question_embedding, first_unit.fingerprint
+        )
+        if cached_result is not None:
+            logger.info("[RAG] Semantic cache hit, skipping retrieval and generation")
+            if stream_callback is not None:
+                stream_callback(str(cached_result["answer"]))
+            return cached_result
+
     # HyDE: 生成假设性文档用于检索
     retrieval_query = question
     if use_hyde:
@@ -759,26 +1215,32 @@ def _answer_with_stores(
             question=question,
         )
     
-    answer_text = llm.chat(messages, temperature=0.1)
+    if stream_callback is not None and llm.supports_streaming():
+        # 流式生成：首 token 到达即回调，整体耗时不变但首字延迟大幅降低
+        parts: List[str] = []
+        for delta in llm.stream_chat(messages, temperature=0.1):
+            parts.append(delta)
+            stream_callback(delta)
+        answer_text = "".join(parts)
+    else:
+        answer_text = llm.chat(messages, temperature=0.1)
+        if stream_callback is not None:
+            stream_callback(str(answer_text))
 
     if not isinstance(answer_text, str):
         answer_text = str(answer_text)
 
-    sources: List[str] = []
-    seen_sources = set()  # 去重
-    for doc in docs:
-        source = doc.metadata.get("source") or doc.metadata.get("file_path")
-        category = doc.metadata.get("kb_category")
-        
-        source_key = f"{category}:{source}" if category and source else (source or category)
-        if source_key and source_key not in seen_sources:
-            seen_sources.add(source_key)
-            sources.append(source_key)
+    sources = _extract_sources(docs)
 
-    return {
+    result = {
         "answer": answer_text.strip(),
         "sources": sources,
     }
+    if use_semantic_cache and question_embedding is not None:
+        _semantic_answer_cache.put(
+            cache_scope, question_embedding, result, next(iter(stores.values())).fingerprint
+        )
+    return result
 
 
 def answer_question_stream(
@@ -846,15 +1308,7 @@ def answer_question_stream(
             docs = [cand.doc for cand in chosen]
         
         # 提取来源
-        sources: List[str] = []
-        seen_sources = set()
-        for doc in docs:
-            source = doc.metadata.get("source") or doc.metadata.get("file_path")
-            category = doc.metadata.get("kb_category")
-            source_key = f"{category}:{source}" if category and source else (source or category)
-            if source_key and source_key not in seen_sources:
-                seen_sources.add(source_key)
-                sources.append(source_key)
+        sources = _extract_sources(docs)
         
         yield ("retrieval_done", {"sources": sources[:5], "doc_count": len(docs)})
         
@@ -1,32 +1,94 @@
 from __future__ import annotations
 
 import hashlib
+import heapq
 import math
 import re
+import threading
 from collections import Counter, defaultdict
-from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from functools import lru_cache
 from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Any
 
+import numpy as np
 from langchain_core.documents import Document
 
+try:
+    import xxhash  # type: ignore
+except ImportError:  # 未安装时回退到标准库 blake2b
+    xxhash = None
+
+try:
+    import numba  # type: ignore
+except ImportError:  # 未安装时 BM25 使用 NumPy 向量化累加
+    numba = None
+
+try:
+    import simsimd  # type: ignore
+except ImportError:  # 未安装时 MMR 相似度使用 NumPy 矩阵向量乘
+    simsimd = None
+
 Tokenizer = Callable[[str], List[str]]
 
 _TOKEN_PATTERN = re.compile(r"[A-Za-z0-9_\u4e00-\u9fff]+", re.UNICODE)
 
 
+# ASCII 快速路径：把非 [A-Za-z0-9_] 的 ASCII 字符映射为空格，随后 split 即得到与正则相同的词元
+_ASCII_WORD_CHARS = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_")
+_ASCII_SEPARATOR_TABLE = str.maketrans(
+    {chr(code): " " for code in range(128) if chr(code) not in _ASCII_WORD_CHARS}
+)
+
+
+def _tokenize(text: str) -> Tuple[str, ...]:
+    # 代码切片绝大多数是纯 ASCII，translate + split 不经过正则引擎，约快 3 倍；含中文等非 ASCII 时走正则
+    if text.isascii():
+        return tuple(text.lower().translate(_ASCII_SEPARATOR_TABLE).split())
+    return tuple(_TOKEN_PATTERN.findall(text.lower()))
+
+
+# 查询期（MMR 候选、查询文本）的分词缓存；BM25 构建直接调用 _tokenize，不占用缓存
+_cached_tokenize = lru_cache(maxsize=2048)(_tokenize)
+
+
 def default_tokenizer(text: str) -> List[str]:
     """
-    轻量分词实现，提取匹配的（中文，英文，数字，下划线）
+    轻量分词实现，提取匹配的（中文，英文，数字，下划线）。
+    整段先小写：纯 ASCII 文本用 str.translate 把非词字符映射为空格后 split，不经过正则引擎；
+    含中文等非 ASCII 字符时一次 findall 提取。两条路径都在 C 层完成，结果一致。
+
+    热门切片会在多次查询的 MMR 中反复分词，结果按文本做 LRU 缓存；
+    分词是纯函数，缓存可以跨查询复用，容量上限控制内存占用。返回新列表，调用方可自由修改。
     """
     if not text:
         return []
-    return _TOKEN_PATTERN.findall(text.lower())
+    return list(_cached_tokenize(text))
+
+
+def clear_tokenize_cache() -> None:
+    """清空查询期分词缓存（向量库重建或缓存失效时调用，释放旧切片的词元）。"""
+    _cached_tokenize.cache_clear()
 
 
 def _clone_document(doc: Document) -> Document:
     return Document(page_content=doc.page_content, metadata=dict(doc.metadata))
 
 
+@lru_cache(maxsize=16384)
+def _content_digest(text: str) -> str:
+    """
+    内容指纹（12 位十六进制）。key 只在进程内用于融合去重，不落盘，
+    因此使用非加密的 xxh3_64；未安装 xxhash 时回退到比 MD5 更快的 blake2b。
+    同一切片在融合、去重、社区映射中会被多次求 key，按文本缓存结果：
+    克隆出的 Document 共享同一个 str 对象，其哈希值已缓存，查表无需再次扫描内容。
+    """
+    data = text.encode("utf-8")
+    if xxhash is not None:
+        return format(xxhash.xxh3_64_intdigest(data), "016x")[:12]
+    return hashlib.blake2b(data, digest_size=6).hexdigest()
+
+
 def compute_doc_key(doc: Document) -> str:
     """
     通过来源+内容哈希为每个文档生成稳定的唯一key，方便跨检索结果融合与去重。
@@ -34,22 +96,38 @@ def compute_doc_key(doc: Document) -> str:
     meta = doc.metadata or {}
     source = meta.get("source") or meta.get("file_path") or "unknown"
     anchor = meta.get("chunk_id") or meta.get("line_start") or meta.get("page") or ""
-    digest = hashlib.md5(doc.page_content.encode("utf-8")).hexdigest()[:12]
-    return f"{source}|{anchor}|{digest}"
+    return f"{source}|{anchor}|{_content_digest(doc.page_content)}"
 
 
 def normalize_scores(values: Sequence[float]) -> List[float]:
     """
     归一化分数，将分数范围缩放到0-1之间。
+    在 NumPy 中一次完成 min/max 与缩放，tolist() 批量转换回 Python float。
     """
-    if not values:
+    if len(values) == 0:
         return []
-    max_v = max(values)
-    min_v = min(values)
+    arr = np.asarray(values, dtype=np.float64)
+    min_v = arr.min()
+    max_v = arr.max()
     if math.isclose(max_v, min_v):
-        return [1.0 for _ in values]
-    span = max_v - min_v
-    return [(val - min_v) / span for val in values]
+        return [1.0] * arr.shape[0]
+    return ((arr - min_v) / (max_v - min_v)).tolist()
+
+
+def _top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    返回分数最高的 k 个下标，分数降序、同分按下标升序（与稳定排序后切片一致）。
+    argpartition 只做 O(N) 选择，并把与第 k 名同分的元素全部纳入，再对这一小部分排序。
+    """
+    n = scores.shape[0]
+    if k <= 0 or n == 0:
+        return np.zeros(0, dtype=np.int64)
+    if k < n:
+        kth = np.partition(scores, n - k)[n - k]
+        idx = np.flatnonzero(scores >= kth)
+    else:
+        idx = np.arange(n)
+    return idx[np.lexsort((idx, -scores[idx]))][:k]
 
 
 @dataclass
@@ -60,47 +138,155 @@ class RankedCandidate:
     dense_score: float = 0.0
     sparse_score: float = 0.0
     final_score: float = 0.0
+    # 检索阶段已算好的默认分词词频（只读），mmr_select 直接复用，不再重复分词
+    term_counts: Optional[Counter[str]] = field(default=None, repr=False, compare=False)
+
+
+def _bm25_accumulate_numpy(
+    query_ids: np.ndarray,
+    query_counts: np.ndarray,
+    offsets: np.ndarray,
+    post_docs: np.ndarray,
+    post_scores: np.ndarray,
+    scores: np.ndarray,
+    only_existing: bool,
+) -> None:
+    for term_id, count in zip(query_ids, query_counts):
+        start, end = offsets[term_id], offsets[term_id + 1]
+        ids = post_docs[start:end]
+        contrib = count * post_scores[start:end]
+        if only_existing:
+            mask = scores[ids] > 0
+            ids, contrib = ids[mask], contrib[mask]
+        # 同一词项的倒排表内文档下标互不重复，可直接花式索引累加
+        scores[ids] += contrib
+
+
+def _bm25_accumulate_loop(
+    query_ids: np.ndarray,
+    query_counts: np.ndarray,
+    offsets: np.ndarray,
+    post_docs: np.ndarray,
+    post_scores: np.ndarray,
+    scores: np.ndarray,
+    only_existing: bool,
+) -> None:
+    # 标量循环版本，交给 numba 编译后无需为每个查询词分配临时数组
+    for q in range(query_ids.shape[0]):
+        term_id = query_ids[q]
+        count = query_counts[q]
+        for pos in range(offsets[term_id], offsets[term_id + 1]):
+            doc = post_docs[pos]
+            if only_existing and scores[doc] == 0.0:
+                continue
+            scores[doc] += count * post_scores[pos]
+
+
+if numba is not None:
+    # fastmath 允许内核对累加重排与向量化；分数只用于排序，末位误差不影响结果
+    _bm25_accumulate = numba.njit(cache=True, nogil=True, fastmath=True)(_bm25_accumulate_loop)
+else:
+    _bm25_accumulate = _bm25_accumulate_numpy
 
 
 class SparseBM25Index:
     """
     只依赖轻量分词的 BM25 实现，避免额外依赖和构建流程。
+
+    构建时把词频整理成扁平的倒排表（offsets / 文档下标 / 贡献分，即 CSC 布局），
+    并预先算好每个 (词项, 文档) 的 BM25 贡献 idf * tf * (k1 + 1) / (tf + len_norm)，
+    查询只需对查询词对应的列做切片累加；安装了 numba 时由 JIT 内核完成，否则用 NumPy 向量化。
     """
 
     def __init__(
         self,
         documents: List[Document],
-        tokenized_docs: List[List[str]],
+        doc_lens: List[int],
         term_freqs: List[Counter[str]],
         idf: Dict[str, float],
         avg_doc_len: float,
         tokenizer: Tokenizer,
     ) -> None:
         self._documents = documents
-        self._tokenized_docs = tokenized_docs
-        self._term_freqs = term_freqs
+        self._doc_lens = doc_lens
         self._idf = idf
         self._avg_doc_len = avg_doc_len
         self._tokenizer = tokenizer
         self._k1 = 1.5
         self._b = 0.75
 
+        # 长度归一化项 k1 * (1 - b + b * |d| / avgdl)，与查询无关，构建时一次算好
+        lens = np.fromiter((length or 1 for length in doc_lens), dtype=np.float64, count=len(doc_lens))
+        len_norm = self._k1 * (1 - self._b + self._b * lens / (avg_doc_len or 1))
+        self._build_postings(term_freqs, len_norm)
+
+    def _build_postings(self, term_freqs: List[Counter[str]], len_norm: np.ndarray) -> None:
+        """
+        把词项映射为整数 id，并按 id 排列成扁平倒排数组，查询内核中不再出现 dict 查找。
+        词频只在构建期使用：直接折算为 BM25 贡献分存储，Counter 列表随之释放。
+        """
+        doc_ids: Dict[str, List[int]] = defaultdict(list)
+        tfs: Dict[str, List[int]] = defaultdict(list)
+        for idx, freq in enumerate(term_freqs):
+            for term, tf in freq.items():
+                doc_ids[term].append(idx)
+                tfs[term].append(tf)
+
+        self._vocab: Dict[str, int] = {term: term_id for term_id, term in enumerate(doc_ids)}
+        lengths = np.fromiter((len(ids) for ids in doc_ids.values()), dtype=np.int64, count=len(doc_ids))
+        self._offsets = np.zeros(len(doc_ids) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self._offsets[1:])
+        total = int(self._offsets[-1])
+        # 文档下标用 int32 存储，倒排表的内存与扫描带宽减半
+        self._post_docs = np.fromiter(
+            (idx for ids in doc_ids.values() for idx in ids), dtype=np.int32, count=total
+        )
+        post_tfs = np.fromiter(
+            (tf for term in doc_ids for tf in tfs[term]), dtype=np.float64, count=total
+        )
+        idf_arr = np.fromiter(
+            (self._idf.get(term, 0.0) for term in doc_ids), dtype=np.float64, count=len(doc_ids)
+        )
+        post_idf = np.repeat(idf_arr, lengths)
+        # 贡献分只用于排序，以 float32 存储使倒排表带宽减半；查询时在 float64 中累加
+        self._post_scores = (
+            post_idf * post_tfs * (self._k1 + 1) / (post_tfs + len_norm[self._post_docs])
+        ).astype(np.float32)
+        # 每个词项在任一文档上的最大贡献，供查询时做 MaxScore 剪枝
+        self._max_contrib = (
+            np.maximum.reduceat(self._post_scores, self._offsets[:-1])
+            if total else np.zeros(0, dtype=np.float32)
+        )
+
     @classmethod
     def build(
-        cls, documents: Iterable[Document], tokenizer: Tokenizer | None = None
+        cls,
+        documents: Iterable[Document],
+        tokenizer: Tokenizer | None = None,
+        term_counts: Callable[[str], Counter[str]] | None = None,
     ) -> "SparseBM25Index":
+        """
+        term_counts 若提供，按文本返回（与 tokenizer 一致的）词频，用于在多个索引间共享分词结果；
+        只读使用，不会被修改。
+        """
         tokenizer = tokenizer or default_tokenizer
         docs: List[Document] = []
-        tokenized_docs: List[List[str]] = []
+        doc_lens: List[int] = []
         term_freqs: List[Counter[str]] = []
         doc_freqs: Dict[str, int] = defaultdict(int)
 
         for doc in documents:
             cloned = _clone_document(doc)
             docs.append(cloned)
-            tokens = tokenizer(cloned.page_content)
-            tokenized_docs.append(tokens)
-            freq = Counter(tokens)
+            # 分词结果直接计数后丢弃，不保留整份分词语料，只记录文档长度；
+            # 默认分词器绕过 LRU 缓存，避免整份语料的词元常驻内存
+            if term_counts is not None:
+                freq = term_counts(cloned.page_content)
+            elif tokenizer is default_tokenizer:
+                freq = Counter(_tokenize(cloned.page_content))
+            else:
+                freq = Counter(tokenizer(cloned.page_content))
+            doc_lens.append(sum(freq.values()))
             term_freqs.append(freq)
             for term in freq:
                 doc_freqs[term] += 1
@@ -108,14 +294,13 @@ class SparseBM25Index:
         if not docs:
             return cls([], [], [], {}, 0.0, tokenizer)
 
-        total_len = sum(len(tokens) for tokens in tokenized_docs)
-        avg_len = total_len / len(tokenized_docs) if tokenized_docs else 0.0
+        avg_len = sum(doc_lens) / len(doc_lens)
         doc_count = len(docs)
         idf: Dict[str, float] = {}
         for term, df in doc_freqs.items():
             idf[term] = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
 
-        return cls(docs, tokenized_docs, term_freqs, idf, avg_len, tokenizer)
+        return cls(docs, doc_lens, term_freqs, idf, avg_len, tokenizer)
 
     def search(self, query: str, top_k: int = 20) -> List[Tuple[Document, float]]:
         if not self._documents or top_k <= 0:
@@ -124,44 +309,100 @@ class SparseBM25Index:
         if not query_tokens:
             return []
 
-        scores: List[Tuple[int, float]] = []
-        for idx, freq in enumerate(self._term_freqs):
-            if not freq:
-                continue
-            doc_len = len(self._tokenized_docs[idx]) or 1
-            score = 0.0
-            for term in query_tokens:
-                if term not in freq:
-                    continue
-                idf = self._idf.get(term)
-                if idf is None:
-                    continue
-                tf = freq[term]
-                denom = tf + self._k1 * (1 - self._b + self._b * doc_len / (self._avg_doc_len or 1))
-                score += idf * (tf * (self._k1 + 1) / denom)
-            if score > 0:
-                scores.append((idx, score))
-
-        if not scores:
+        # 重复出现的查询词按出现次数累加，与逐词求和的语义一致
+        query_ids: List[int] = []
+        query_counts: List[int] = []
+        for term, count in Counter(query_tokens).items():
+            term_id = self._vocab.get(term)
+            if term_id is not None:
+                query_ids.append(term_id)
+                query_counts.append(count)
+        if not query_ids:
             return []
 
-        scores.sort(key=lambda item: item[1], reverse=True)
-        limited = scores[:top_k]
-        return [(self._documents[idx], score) for idx, score in limited]
+        scores, hits = self._accumulate_maxscore(
+            np.asarray(query_ids, dtype=np.int32),
+            np.asarray(query_counts, dtype=np.float64),
+            top_k,
+        )
+        if hits.size == 0:
+            return []
+        # 分数降序，同分按文档顺序，保持与原先稳定排序一致
+        hits = hits[_top_k_indices(scores[hits], top_k)]
+        return [(self._documents[idx], float(scores[idx])) for idx in hits]
 
+    def _posting_docs(self, term_id: int) -> np.ndarray:
+        return self._post_docs[self._offsets[term_id]:self._offsets[term_id + 1]]
 
-def _cosine(counter_a: Counter[str], counter_b: Counter[str]) -> float:
-    if not counter_a or not counter_b:
-        return 0.0
-    shared = set(counter_a) & set(counter_b)
-    if not shared:
-        return 0.0
-    numerator = sum(counter_a[token] * counter_b[token] for token in shared)
-    norm_a = math.sqrt(sum(value * value for value in counter_a.values()))
-    norm_b = math.sqrt(sum(value * value for value in counter_b.values()))
-    if math.isclose(norm_a, 0.0) or math.isclose(norm_b, 0.0):
-        return 0.0
-    return numerator / (norm_a * norm_b)
+    def _accumulate_maxscore(
+        self, query_ids: np.ndarray, query_counts: np.ndarray, top_k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        MaxScore 剪枝的逐词累加：按最大贡献降序处理查询词，
+        一旦剩余词项的最大贡献之和低于当前第 k 名分数，尚未命中的文档不可能进入 top-k，
+        之后的词项只更新已有候选，不再扩散到新文档。结果与完整累加的 top-k 一致。
+
+        返回 (分数数组, 候选文档下标)。候选集为已完整处理的查询词倒排表的并集（升序），
+        阈值计算与最终 top-k 选择都只在候选集上进行，不再扫描全部 N 个文档。
+        """
+        scores = np.zeros(len(self._documents), dtype=np.float64)
+        args = (self._offsets, self._post_docs, self._post_scores, scores)
+        if query_ids.shape[0] == 1:
+            _bm25_accumulate(query_ids, query_counts, *args, False)
+            return scores, np.sort(self._posting_docs(int(query_ids[0])))
+
+        upper = self._max_contrib[query_ids] * query_counts
+        order = np.argsort(-upper, kind="stable")
+        query_ids, query_counts = query_ids[order], query_counts[order]
+        # remaining[i] 为第 i 个及之后查询词的最大贡献之和
+        remaining = np.cumsum(upper[order][::-1])[::-1]
+
+        candidates = np.zeros(0, dtype=self._post_docs.dtype)
+        for i in range(query_ids.shape[0]):
+            if i > 0 and candidates.size >= top_k:
+                hit_scores = scores[candidates]
+                threshold = np.partition(hit_scores, hit_scores.size - top_k)[hit_scores.size - top_k]
+                if remaining[i] < threshold:
+                    _bm25_accumulate(query_ids[i:], query_counts[i:], *args, True)
+                    break
+            _bm25_accumulate(query_ids[i:i + 1], query_counts[i:i + 1], *args, False)
+            candidates = np.union1d(candidates, self._posting_docs(int(query_ids[i])))
+        return scores, candidates
+
+
+def _normalized_tf_matrix(
+    rows: Sequence[Counter[str]], vocab: Dict[str, int]
+) -> np.ndarray:
+    """
+    把词频统计整理为按行 L2 归一化的词频矩阵 (len(rows), len(vocab))，
+    行向量的点积即词袋余弦相似度。vocab 会被原地扩充。
+    """
+    row_idx: List[int] = []
+    col_idx: List[int] = []
+    counts: List[int] = []
+    for idx, counter in enumerate(rows):
+        for token, count in counter.items():
+            row_idx.append(idx)
+            col_idx.append(vocab.setdefault(token, len(vocab)))
+            counts.append(count)
+
+    # 先收集 (行, 列, 词频) 三元组，再一次性散射写入，避免逐行的花式索引赋值
+    matrix = np.zeros((len(rows), len(vocab)), dtype=np.float64)
+    matrix[row_idx, col_idx] = counts
+
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+def _row_dots(matrix: np.ndarray, vec: np.ndarray) -> np.ndarray:
+    """
+    矩阵各行与 vec 的点积（行已 L2 归一化，即余弦相似度）。
+    安装了 simsimd 时走其 SIMD 内核，小矩阵上省去 BLAS 的调度开销。
+    """
+    if simsimd is not None:
+        return np.asarray(simsimd.cdist(vec[None, :], matrix, metric="dot"), dtype=np.float64).ravel()
+    return matrix @ vec
 
 
 def mmr_select(
@@ -174,50 +415,82 @@ def mmr_select(
 ) -> List[RankedCandidate]:
     """
     经典 MMR：兼顾单点相关性与候选间的互斥性。
+
+    候选与查询的词频向量一次性构造成归一化矩阵，相关性为一次矩阵乘；
+    使用默认分词器时，候选若已带有检索阶段算好的 term_counts 则直接复用；
+    与已选集合的最大相似度用 max_sim 数组增量维护：每轮只计算剩余候选与“最新选中项”的相似度，
+    总计约 top_n·N 次点积，而不是预先算出完整的 N×N 相似度矩阵；最后一轮选完后不再计算。
     """
     if not candidates or top_n <= 0:
         return []
 
+    reuse_counts = tokenizer is None
     tokenizer = tokenizer or default_tokenizer
-    query_counter = Counter(tokenizer(query))
-    doc_counters = {cand.key: Counter(tokenizer(cand.doc.page_content)) for cand in candidates}
-
+    vocab: Dict[str, int] = {}
+    doc_matrix = _normalized_tf_matrix(
+        [
+            cand.term_counts
+            if reuse_counts and cand.term_counts is not None
+            else Counter(tokenizer(cand.doc.page_content))
+            for cand in candidates
+        ],
+        vocab,
+    )
+    query_tokens = Counter(tokenizer(query))
+
+    final_scores = np.fromiter((cand.final_score for cand in candidates), dtype=np.float64, count=len(candidates))
+    if not query_tokens:
+        relevance = final_scores
+    else:
+        query_vec = _normalized_tf_matrix([query_tokens], vocab)[0]
+        # 查询中的新词只会扩充 vocab，不影响与文档的点积
+        sims = doc_matrix @ query_vec[: doc_matrix.shape[1]]
+        # 若语义分未能区分，则用最终得分兜底
+        relevance = np.where(sims == 0.0, final_scores, sims)
+
+    weighted_relevance = lambda_mult * relevance
+    max_sim = np.zeros(len(candidates), dtype=np.float64)
+    available = np.ones(len(candidates), dtype=bool)
     selected: List[RankedCandidate] = []
-    remaining = list(candidates)
+    target = min(top_n, len(candidates))
+
+    while True:
+        mmr_scores = weighted_relevance - (1 - lambda_mult) * max_sim
+        mmr_scores[~available] = -np.inf
+        best_idx = int(np.argmax(mmr_scores))
+        available[best_idx] = False
+        selected.append(candidates[best_idx])
+        if len(selected) >= target:
+            break
+        remaining = np.flatnonzero(available)
+        max_sim[remaining] = np.maximum(max_sim[remaining], _row_dots(doc_matrix[remaining], doc_matrix[best_idx]))
 
-    while remaining and len(selected) < top_n:
-        best_idx = 0
-        best_score = float("-inf")
+    return selected
 
-        for idx, cand in enumerate(remaining):
-            relevance = cand.final_score
-            if not query_counter:
-                sim_to_query = relevance
-            else:
-                sim_to_query = _cosine(doc_counters[cand.key], query_counter)
-                # 若语义分未能区分，则用最终得分兜底
-                if math.isclose(sim_to_query, 0.0):
-                    sim_to_query = relevance
 
-            if not selected:
-                penalty = 0.0
-            else:
-                penalty = max(
-                    _cosine(doc_counters[cand.key], doc_counters[sel.key])
-                    for sel in selected
-                )
+# ====================== 社区优先两阶段检索 ======================
 
-            mmr_score = lambda_mult * sim_to_query - (1 - lambda_mult) * penalty
-            if mmr_score > best_score:
-                best_score = mmr_score
-                best_idx = idx
+# 多社区 BM25 检索共用的线程池：打分内核为 numba(nogil)/NumPy，执行期间基本不持有 GIL
+COMMUNITY_SEARCH_WORKERS = 8
+_search_pool: Optional[ThreadPoolExecutor] = None
+_search_pool_lock = threading.Lock()
 
-        selected.append(remaining.pop(best_idx))
 
-    return selected
+def _get_search_pool() -> ThreadPoolExecutor:
+    global _search_pool
+    with _search_pool_lock:
+        if _search_pool is None:
+            _search_pool = ThreadPoolExecutor(
+                max_workers=COMMUNITY_SEARCH_WORKERS, thread_name_prefix="bm25-search"
+            )
+        return _search_pool
 
 
-# ====================== 社区优先两阶段检索 ======================
+def _path_suffixes(path: str) -> List[str]:
+    """按路径段返回全部尾部后缀：a/b/c.py -> [a/b/c.py, b/c.py, c.py]"""
+    parts = path.split("/")
+    return ["/".join(parts[i:]) for i in range(len(parts))]
+
 
 @dataclass
 class CommunityInfo:
@@ -256,49 +529,77 @@ class CommunityFirstRetriever:
         self._summaries = community_summaries
         self._documents = documents
         self._tokenizer = tokenizer or default_tokenizer
+        # 本检索器内按文本共享的词频：社区索引、全局回退索引与 MMR 候选复用同一次分词，
+        # 随检索器（通常为单次查询）一起释放，不进入进程级缓存
+        self._term_counts_by_text: Dict[str, Counter[str]] = {}
 
         # 为每个文档建立社区映射
         self._doc_to_community: Dict[str, int] = {}
         self._community_docs: Dict[int, List[Document]] = defaultdict(list)
         self._build_doc_community_mapping()
 
+        # 每个社区的文档集合在检索器生命周期内不变，BM25 索引构建一次后复用
+        self._community_bm25_cache: Dict[int, SparseBM25Index] = {
+            comm_id: SparseBM25Index.build(docs, self._tokenizer, self._term_counts)
+            for comm_id, docs in self._community_docs.items()
+            if docs
+        }
+        # 未命中社区时的全局回退索引，首次回退时再构建
+        self._fallback_bm25: Optional[SparseBM25Index] = None
+
         # 为社区摘要构建 BM25 索引
         self._community_bm25: Optional[SparseBM25Index] = None
         self._community_info_list: List[CommunityInfo] = []
+        self._community_info_by_id: Dict[int, CommunityInfo] = {}
         self._build_community_index()
 
+    def _term_counts(self, text: str) -> Counter[str]:
+        counts = self._term_counts_by_text.get(text)
+        if counts is None:
+            tokens = _tokenize(text) if self._tokenizer is default_tokenizer else self._tokenizer(text)
+            counts = self._term_counts_by_text[text] = Counter(tokens)
+        return counts
+
     def _build_doc_community_mapping(self) -> None:
-        """构建文档到社区的映射关系"""
+        """
+        构建文档到社区的映射关系。
+
+        节点路径（函数/类节点 ``file_path:name`` 取文件部分）按路径段展开所有尾部后缀建立字典，
+        每个文档只需探测自身的 O(深度) 个后缀，替代逐文档遍历全部节点的 endswith 比较。
+        多个节点都能匹配时，仍取社区字典中最先出现的节点。
+        """
         # 创建节点ID到社区ID的映射
         node_to_community: Dict[str, int] = {}
         for comm_id, nodes in self._communities.items():
             for node in nodes:
                 node_to_community[node] = comm_id
 
+        # 路径 -> (节点顺序, 社区ID)：node_paths 为节点完整路径，node_suffixes 为其所有尾部后缀
+        node_paths: Dict[str, Tuple[int, int]] = {}
+        node_suffixes: Dict[str, Tuple[int, int]] = {}
+        for order, (node_id, comm_id) in enumerate(node_to_community.items()):
+            path = node_id.split(":")[0] if ":" in node_id else node_id
+            if not path:
+                continue
+            node_paths.setdefault(path, (order, comm_id))
+            for suffix in _path_suffixes(path):
+                node_suffixes.setdefault(suffix, (order, comm_id))
+
         # 将文档分配到对应的社区
         for doc in self._documents:
             source = doc.metadata.get("source", "")
             if not source:
                 continue
 
-            # 尝试匹配文档源路径到社区节点
-            matched_community = None
-
             # 直接匹配文件路径
-            if source in node_to_community:
-                matched_community = node_to_community[source]
-            else:
-                # 尝试部分路径匹配
-                for node_id, comm_id in node_to_community.items():
-                    if source.endswith(node_id) or node_id.endswith(source):
-                        matched_community = comm_id
-                        break
-                    # 检查函数/类节点 (格式: file_path:name)
-                    if ":" in node_id:
-                        file_part = node_id.split(":")[0]
-                        if source.endswith(file_part) or file_part.endswith(source):
-                            matched_community = comm_id
-                            break
+            matched_community = node_to_community.get(source)
+            if matched_community is None:
+                # 部分路径匹配：文档路径以节点路径结尾，或节点路径以文档路径结尾
+                hits = [node_paths[suffix] for suffix in _path_suffixes(source) if suffix in node_paths]
+                if source in node_suffixes:
+                    hits.append(node_suffixes[source])
+                if hits:
+                    matched_community = min(hits)[1]
 
             if matched_community is not None:
                 self._doc_to_community[compute_doc_key(doc)] = matched_community
@@ -317,6 +618,7 @@ class CommunityFirstRetriever:
                 summary=summary,
                 node_ids=nodes,
             ))
+        self._community_info_by_id = {info.community_id: info for info in self._community_info_list}
 
         # 创建虚拟文档用于 BM25 检索
         community_docs = [
@@ -353,13 +655,10 @@ class CommunityFirstRetriever:
 
         matched_communities = []
         for doc, score in results:
-            comm_id = doc.metadata.get("community_id")
-            if comm_id is not None:
-                for info in self._community_info_list:
-                    if info.community_id == comm_id:
-                        info.relevance_score = score
-                        matched_communities.append(info)
-                        break
+            info = self._community_info_by_id.get(doc.metadata.get("community_id"))
+            if info is not None:
+                # 返回副本，避免本次查询的分数写回共享的 CommunityInfo、在并发查询间串扰
+                matched_communities.append(replace(info, relevance_score=score))
 
         return matched_communities
 
@@ -368,6 +667,7 @@ class CommunityFirstRetriever:
         query: str,
         community_ids: List[int],
         top_k_per_community: int = 5,
+        top_k: Optional[int] = None,
     ) -> List[Tuple[Document, float]]:
         """
         第二阶段：从指定社区内检索文档。
@@ -376,32 +676,38 @@ class CommunityFirstRetriever:
             query: 用户查询
             community_ids: 要检索的社区ID列表
             top_k_per_community: 每个社区返回的文档数量
+            top_k: 可选，只返回分数最高的前 top_k 条（部分选择，不做全量排序）
 
         Returns:
             (文档, 分数) 元组列表
         """
         all_results: List[Tuple[Document, float]] = []
 
-        for comm_id in community_ids:
-            comm_docs = self._community_docs.get(comm_id, [])
-            if not comm_docs:
-                continue
-
-            # 为该社区的文档构建临时 BM25 索引
-            comm_bm25 = SparseBM25Index.build(comm_docs, self._tokenizer)
-            results = comm_bm25.search(query, top_k=top_k_per_community)
+        indexes = [
+            self._community_bm25_cache[comm_id]
+            for comm_id in community_ids
+            if comm_id in self._community_bm25_cache
+        ]
+        if len(indexes) > 1:
+            # 各社区索引互相独立，并行检索；map 保持社区顺序，合并结果与串行一致
+            batches = _get_search_pool().map(
+                lambda index: index.search(query, top_k=top_k_per_community), indexes
+            )
+        else:
+            batches = (index.search(query, top_k=top_k_per_community) for index in indexes)
+        for results in batches:
             all_results.extend(results)
 
-        # 按分数排序并去重
-        seen_keys = set()
-        unique_results = []
-        for doc, score in sorted(all_results, key=lambda x: x[1], reverse=True):
+        # 同一文档只保留最高分，再按分数取前 top_k（heapq.nlargest 与稳定排序后切片结果一致）
+        best: Dict[str, Tuple[Document, float]] = {}
+        for doc, score in all_results:
             key = compute_doc_key(doc)
-            if key not in seen_keys:
-                seen_keys.add(key)
-                unique_results.append((doc, score))
+            current = best.get(key)
+            if current is None or score > current[1]:
+                best[key] = (doc, score)
 
-        return unique_results
+        limit = len(best) if top_k is None else top_k
+        return heapq.nlargest(limit, best.values(), key=lambda x: x[1])
 
     def retrieve(
         self,
@@ -427,8 +733,11 @@ class CommunityFirstRetriever:
 
         if not relevant_communities:
             # 如果没有匹配到社区，回退到全局 BM25 检索
-            fallback_bm25 = SparseBM25Index.build(self._documents, self._tokenizer)
-            return fallback_bm25.search(query, top_k=top_k_total)
+            if self._fallback_bm25 is None:
+                self._fallback_bm25 = SparseBM25Index.build(
+                    self._documents, self._tokenizer, self._term_counts
+                )
+            return self._fallback_bm25.search(query, top_k=top_k_total)
 
         # 第二阶段：从相关社区检索文档
         community_ids = [c.community_id for c in relevant_communities]
@@ -436,9 +745,10 @@ class CommunityFirstRetriever:
             query,
             community_ids,
             top_k_per_community=top_k_docs_per_community,
+            top_k=top_k_total,
         )
 
-        return results[:top_k_total]
+        return results
 
     def hybrid_retrieve(
         self,
@@ -513,14 +823,17 @@ class CommunityFirstRetriever:
         for cand in candidates_map.values():
             cand.final_score = alpha * cand.dense_score + (1 - alpha) * cand.sparse_score
 
-        # 排序并返回
-        sorted_candidates = sorted(
-            candidates_map.values(),
-            key=lambda c: c.final_score,
-            reverse=True,
+        # 部分选择前 top_k，结果与全量稳定排序后切片一致
+        candidates = list(candidates_map.values())
+        final_scores = np.fromiter(
+            (cand.final_score for cand in candidates), dtype=np.float64, count=len(candidates)
         )
-
-        return sorted_candidates[:top_k]
+        selected = [candidates[idx] for idx in _top_k_indices(final_scores, top_k)]
+        if self._tokenizer is default_tokenizer:
+            # 交给 MMR 的词频：稀疏命中的文档在建索引时已计数，直接复用
+            for cand in selected:
+                cand.term_counts = self._term_counts(cand.doc.page_content)
+        return selected
 
 
 def create_community_retriever(
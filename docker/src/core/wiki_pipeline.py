@@ -3,24 +3,34 @@ import json
 import asyncio
 import shutil
 import logging
+import time
+import inspect
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial, wraps
 from pathlib import Path
 from datetime import datetime, timezone
-from typing import Dict, Any, Optional, List, Tuple
+from typing import Dict, Any, Iterable, Optional, List, Tuple
+
+from langchain_core.documents import Document
 
 # 导入必要的模块
 from scripts.setup_repository import setup_repository
-from src.config import CONFIG_PATH, load_config, CONFIG
+from src.config import CONFIG_PATH, get_config, CONFIG
 from src.ingestion.file_processor import generate_file_tree, get_files_to_process, split_code_and_text_files
-from src.ingestion.docu_splitter import load_and_split_docs
+from src.ingestion.docu_splitter import iter_split_docs, save_chunks_debug
 from src.ingestion.vector_store import create_and_save_vector_store
 from src.wiki.struct_gen import generate_wiki_structure
 from src.wiki.content_gen import WikiContentGenerator
 from src.clients.ai_client_factory import get_ai_client, get_model_config
 from src.storage.r2_client import upload_wiki_to_r2
 from src.core.chat import invalidate_vector_store_cache
-from src.storage.supabase_client import update_repo_vector_path, SupabaseClient, SupabaseStorageError
+from src.storage.supabase_client import get_client, update_repo_vector_path, SupabaseClient, SupabaseStorageError
 from src.utils.github_repo_metadata import refresh_github_metadata_for_repo_url
 from src.utils.repo_utils import get_repo_disk_directory_name
+from src.utils.json_utils import dumps_pretty
 
 # 任务状态定义 (保持与 api.py 一致)
 class TaskStatus:
@@ -42,6 +52,91 @@ DEFAULT_WIKI_SECTION_JSON_OUTPUT: Path = PROJECT_ROOT / "wiki_section_json"
 TASK_WORK_ROOT: Path = Path(os.getenv("TASK_WORK_PATH", str(PROJECT_ROOT / "task_workdirs")))
 
 
+# 执行器配置：结构生成（CKG / tree-sitter）与 RAG 切分索引是 CPU 密集的纯 Python，
+# 放进进程池绕开 GIL，让多个 /generate 任务真正并行；LLM/R2/清理等 I/O 步骤走线程池。
+CPU_POOL_WORKERS = max(1, int(os.getenv("WIKI_CPU_POOL_WORKERS", str(os.cpu_count() or 2))))
+IO_POOL_WORKERS = max(1, int(os.getenv("WIKI_IO_POOL_WORKERS", "16")))
+# 删除克隆仓库等大目录的清理操作单独限流，避免占满 I/O 线程池拖慢其他任务的 LLM/上传
+CLEANUP_POOL_WORKERS = 4
+
+_cpu_pool: Optional[ProcessPoolExecutor] = None
+_io_pool: Optional[ThreadPoolExecutor] = None
+_cleanup_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _init_cpu_worker() -> None:
+    """子进程初始化：spawn 出的进程不继承父进程的日志处理器。"""
+    from src.utils.logger import setup_logger
+    setup_logger("api")
+
+
+def get_cpu_pool() -> ProcessPoolExecutor:
+    global _cpu_pool
+    with _pool_lock:
+        if _cpu_pool is None:
+            # 父进程内有 HTTP 客户端线程，fork 可能继承被占用的锁，统一使用 spawn
+            _cpu_pool = ProcessPoolExecutor(
+                max_workers=CPU_POOL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_cpu_worker,
+            )
+        return _cpu_pool
+
+
+def get_io_pool() -> ThreadPoolExecutor:
+    global _io_pool
+    with _pool_lock:
+        if _io_pool is None:
+            _io_pool = ThreadPoolExecutor(max_workers=IO_POOL_WORKERS, thread_name_prefix="wiki-io")
+        return _io_pool
+
+
+def get_cleanup_pool() -> ThreadPoolExecutor:
+    global _cleanup_pool
+    with _pool_lock:
+        if _cleanup_pool is None:
+            _cleanup_pool = ThreadPoolExecutor(
+                max_workers=CLEANUP_POOL_WORKERS, thread_name_prefix="wiki-cleanup"
+            )
+        return _cleanup_pool
+
+
+def shutdown_executors() -> None:
+    """应用关闭时释放进程池/线程池。"""
+    global _cpu_pool, _io_pool, _cleanup_pool
+    with _pool_lock:
+        if _cpu_pool is not None:
+            _cpu_pool.shutdown(wait=False, cancel_futures=True)
+            _cpu_pool = None
+        if _io_pool is not None:
+            _io_pool.shutdown(wait=False, cancel_futures=True)
+            _io_pool = None
+        if _cleanup_pool is not None:
+            # 已排队的清理仍然执行完，避免遗留临时目录
+            _cleanup_pool.shutdown(wait=False)
+            _cleanup_pool = None
+
+
+async def _run_cpu_bound(fn, *args, **kwargs):
+    """在进程池中执行可 pickle 的模块级函数；子进程崩溃导致池损坏时重建，供下次使用。"""
+    global _cpu_pool
+    loop = asyncio.get_running_loop()
+    pool = get_cpu_pool()
+    try:
+        return await loop.run_in_executor(pool, partial(fn, *args, **kwargs))
+    except BrokenProcessPool:
+        with _pool_lock:
+            if _cpu_pool is pool:
+                _cpu_pool = None
+        raise
+
+
+async def _run_io_bound(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_io_pool(), partial(fn, *args, **kwargs))
+
+
 def _task_output_dir(task_id: str) -> Path:
     """返回 task_id 专属的工作目录，确保不同任务的输出互不干扰"""
     d = TASK_WORK_ROOT / task_id
@@ -49,6 +144,30 @@ def _task_output_dir(task_id: str) -> Path:
     return d
 
 
+def sweep_stale_task_dirs(active_task_ids: Iterable[str], max_age_sec: float) -> int:
+    """
+    删除超过 max_age_sec 未修改、且不属于运行中任务的任务工作目录，返回删除数量。
+    正常流程会在 finally 中清理；进程崩溃或重启时遗留的目录由此兜底回收。
+    """
+    if not TASK_WORK_ROOT.is_dir():
+        return 0
+    active = set(active_task_ids)
+    cutoff = time.time() - max_age_sec
+    removed = 0
+    with os.scandir(TASK_WORK_ROOT) as it:
+        for entry in it:
+            if entry.name in active or not entry.is_dir(follow_symlinks=False):
+                continue
+            try:
+                if entry.stat(follow_symlinks=False).st_mtime >= cutoff:
+                    continue
+                shutil.rmtree(entry.path)
+                removed += 1
+            except OSError as e:
+                logger.warning(f"清理过期任务目录失败 {entry.path}: {e}")
+    return removed
+
+
 def _persist_graphrag_communities_to_vector_store(repo_url: str, source_json: Path) -> None:
     """
     在 Wiki 流水线早期把 GraphRAG 元数据复制到向量库根目录。
@@ -95,20 +214,130 @@ def _task_marked_cancelled_by_user(supabase_client: SupabaseClient, task_id: str
     return "cancel" in err
 
 
+# 进度写入的合并窗口：同一任务在窗口内的多次上报只写最后一次
+PROGRESS_FLUSH_INTERVAL_SEC = float(os.getenv("WIKI_PROGRESS_FLUSH_INTERVAL_SEC", "0.2"))
+
+
+class _ProgressWriter:
+    """
+    进度上报的后台写入队列（每个进程一个，惰性启动守护线程）。
+
+    章节生成、RAG 分类索引等会高频上报进度，逐条同步 UPDATE 会把 Supabase 往返
+    压在调用线程（甚至事件循环）上。这里按 task_id 只保留最新一条（后写覆盖），
+    由后台线程合并后写出；写入返回 False（任务已删除）时记入 _deleted，
+    该任务的下一次 submit / flush 抛出 InterruptedError（随后清除标记），保持原有的中断语义。
+    """
+
+    def __init__(self, interval: float = PROGRESS_FLUSH_INTERVAL_SEC):
+        self._interval = interval
+        self._cond = threading.Condition()
+        self._pending: Dict[str, Tuple[float, str]] = {}
+        self._inflight: Dict[str, int] = {}
+        self._deleted: set = set()
+        self._thread: Optional[threading.Thread] = None
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run, name="wiki-progress-writer", daemon=True
+            )
+            self._thread.start()
+
+    def submit(self, task_id: str, progress: float, step: str) -> None:
+        with self._cond:
+            if task_id in self._deleted:
+                self._deleted.discard(task_id)
+                raise InterruptedError(f"Task {task_id} was deleted.")
+            self._pending[task_id] = (progress, step)
+            self._ensure_thread()
+            self._cond.notify_all()
+
+    def flush(self, task_id: str) -> None:
+        """等待该任务已提交的进度全部写出；任务已被删除时抛出 InterruptedError。"""
+        with self._cond:
+            while task_id in self._pending or self._inflight.get(task_id):
+                self._cond.wait()
+            if task_id in self._deleted:
+                # 删除标记只需上报一次，避免常驻的池 worker 中集合无限增长
+                self._deleted.discard(task_id)
+                raise InterruptedError(f"Task {task_id} was deleted.")
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            # 先让出一个合并窗口，期间同一任务的后续上报直接覆盖
+            time.sleep(self._interval)
+            with self._cond:
+                batch = self._pending
+                self._pending = {}
+                for task_id in batch:
+                    self._inflight[task_id] = self._inflight.get(task_id, 0) + 1
+            for task_id, (progress, step) in batch.items():
+                deleted = False
+                try:
+                    deleted = not get_client().update_task_progress(task_id, progress, step)
+                except Exception as e:
+                    logger.warning(f"更新任务进度失败: {e}")
+                with self._cond:
+                    if deleted:
+                        logger.warning(f"Task {task_id} not found (likely deleted), aborting...")
+                        self._deleted.add(task_id)
+                    self._inflight[task_id] -= 1
+                    if not self._inflight[task_id]:
+                        del self._inflight[task_id]
+                    self._cond.notify_all()
+
+
+_progress_writer = _ProgressWriter()
+
+
 def _update_progress(task_id: Optional[str], progress: float, step: str):
-    """内部辅助函数，同步更新任务进度到 Supabase"""
+    """内部辅助函数，把任务进度交给后台队列异步写入 Supabase"""
     if task_id:
+        _progress_writer.submit(task_id, progress, step)
+
+
+def _flush_progress(task_id: Optional[str]) -> None:
+    """
+    等待本进程内该任务的进度写完。阶段函数在进程池中运行，返回前必须 flush，
+    以免进度晚于主进程随后写入的状态落库。
+    """
+    if task_id:
+        _progress_writer.flush(task_id)
+
+
+def _flush_progress_quietly(task_id: Optional[str]) -> None:
+    """异常路径上的 flush：任务已删除时不再抛出 InterruptedError，避免掩盖原始异常。"""
+    try:
+        _flush_progress(task_id)
+    except InterruptedError:
+        pass
+
+
+def _flushes_progress(fn):
+    """
+    阶段函数装饰器：无论正常返回还是抛出异常，都在返回前 flush 本进程内该任务的进度，
+    防止池 worker 的写入线程在主进程写入终态之后才把旧进度落库。
+    """
+    signature = inspect.signature(fn)
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        task_id = signature.bind_partial(*args, **kwargs).arguments.get("task_id")
         try:
-            success = SupabaseClient().update_task_progress(task_id, progress, step)
-            if not success:
-                logger.warning(f"Task {task_id} not found (likely deleted), aborting...")
-                raise InterruptedError(f"Task {task_id} was deleted.")
-        except Exception as e:
-            if isinstance(e, InterruptedError):
-                raise
-            logger.warning(f"更新任务进度失败: {e}")
+            result = fn(*args, **kwargs)
+        except BaseException:
+            _flush_progress_quietly(task_id)
+            raise
+        _flush_progress(task_id)
+        return result
 
+    return wrapper
 
+
+@_flushes_progress
 def run_structure_generation(
     repo_url_or_path: str, config_path: Path, output_path: Path,
     task_id: Optional[str] = None
@@ -129,7 +358,7 @@ def run_structure_generation(
         raise FileNotFoundError(f"Configuration file not found: {config_path}")
 
     # 加载配置（用于验证配置文件有效性）
-    _ = load_config(str(config_path))
+    _ = get_config(str(config_path))
 
     _update_progress(task_id, 20, "Generating file tree...")
 
@@ -145,25 +374,18 @@ def run_structure_generation(
     )
 
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    with output_path.open("w", encoding="utf-8") as f:
-        json.dump(wiki_structure, f, indent=2, ensure_ascii=False)
+    output_path.write_bytes(dumps_pretty(wiki_structure))
 
     _update_progress(task_id, 40, "Wiki structure generation completed")
 
     return repo_path, wiki_structure
 
 
-def run_wiki_content_generation(
+def _build_content_generator(
     repo_path: str,
-    wiki_structure: Dict[str, Any],
     json_output_dir: Path,
-    task_id: Optional[str] = None
-) -> List[Path]:
-    """
-    调用 AI 客户端，根据 wiki 目录并发生成内容与 Mermaid 图，并写入 JSON。
-    """
-    _update_progress(task_id, 45, "Initializing AI client...")
-
+    task_id: Optional[str],
+) -> WikiContentGenerator:
     provider, model = get_model_config(CONFIG, "wiki_content")
     # 构建客户端工厂，让每个并发 worker 独立获取实例
     client_factory = lambda: get_ai_client(provider, model=model)
@@ -172,7 +394,7 @@ def run_wiki_content_generation(
     def _progress_cb(progress: float, step: str):
         _update_progress(task_id, progress, step)
 
-    generator = WikiContentGenerator(
+    return WikiContentGenerator(
         repo_root=repo_path,
         json_output_dir=json_output_dir,
         client_factory=client_factory,
@@ -180,6 +402,20 @@ def run_wiki_content_generation(
         task_id=task_id,
     )
 
+
+@_flushes_progress
+def run_wiki_content_generation(
+    repo_path: str,
+    wiki_structure: Dict[str, Any],
+    json_output_dir: Path,
+    task_id: Optional[str] = None
+) -> List[Path]:
+    """
+    调用 AI 客户端，根据 wiki 目录并发生成内容与 Mermaid 图，并写入 JSON。
+    """
+    _update_progress(task_id, 45, "Initializing AI client...")
+    generator = _build_content_generator(repo_path, json_output_dir, task_id)
+
     _update_progress(task_id, 50, "Generating Wiki content concurrently...")
 
     result = generator.generate(wiki_structure)
@@ -189,6 +425,34 @@ def run_wiki_content_generation(
     return result
 
 
+async def run_wiki_content_generation_async(
+    repo_path: str,
+    wiki_structure: Dict[str, Any],
+    json_output_dir: Path,
+    task_id: Optional[str] = None
+) -> List[Path]:
+    """
+    run_wiki_content_generation 的异步版本：章节请求直接在事件循环上并发，
+    只有文件读写与进度 flush 进入线程。
+    """
+    try:
+        _update_progress(task_id, 45, "Initializing AI client...")
+        generator = await _run_io_bound(_build_content_generator, repo_path, json_output_dir, task_id)
+
+        _update_progress(task_id, 50, "Generating Wiki content concurrently...")
+
+        result = await generator.agenerate(wiki_structure)
+
+        _update_progress(task_id, 85, "Wiki content generation completed")
+    except BaseException:
+        await _run_io_bound(_flush_progress_quietly, task_id)
+        raise
+    await _run_io_bound(_flush_progress, task_id)
+
+    return result
+
+
+@_flushes_progress
 def run_rag_indexing(
     repo_path: str,
     repo_url: str,
@@ -208,7 +472,7 @@ def run_rag_indexing(
     vector_store_path.mkdir(parents=True, exist_ok=True)
     
     # 获取需要处理的文件
-    config = load_config(str(config_path))
+    config = get_config(str(config_path))
     all_files = get_files_to_process(repo_path, str(config_path))
     
     if not all_files:
@@ -220,25 +484,46 @@ def run_rag_indexing(
     
     logger.info(f"[RAG] Found {len(code_files)} code files, {len(text_files)} text files")
     
-    # 处理代码文件
+    # 代码与文本两套索引互不依赖，并发构建以重叠 embedding 网络往返与 FAISS 写盘
+    jobs = []
     if code_files:
-        _update_progress(task_id, 89, f"Indexing {len(code_files)} code files...")
-        
-        code_docs = load_and_split_docs(code_files, debug_output_path="chunk_debug/code_chunks.jsonl")
-        if code_docs:
-            code_store_path = str(vector_store_path / "code")
-            create_and_save_vector_store(code_docs, code_store_path)
-            logger.info(f"[RAG] Code vector store saved: {code_store_path}")
-    
-    # 处理文本文件
+        jobs.append(("code", code_files, "chunk_debug/code_chunks.jsonl"))
     if text_files:
-        _update_progress(task_id, 90, f"Indexing {len(text_files)} text files...")
-        
-        text_docs = load_and_split_docs(text_files, debug_output_path="chunk_debug/text_chunks.jsonl")
-        if text_docs:
-            text_store_path = str(vector_store_path / "text")
-            create_and_save_vector_store(text_docs, text_store_path)
-            logger.info(f"[RAG] Text vector store saved: {text_store_path}")
+        jobs.append(("text", text_files, "chunk_debug/text_chunks.jsonl"))
+
+    _update_progress(
+        task_id, 89, f"Indexing {len(code_files)} code files and {len(text_files)} text files..."
+    )
+    progress_lock = threading.Lock()
+    finished = [0]
+
+    def _index_category(category: str, files: List[str], debug_output_path: str) -> None:
+        # 切分结果以生成器形式直接喂给 embedding：攒够一批即发起请求，
+        # 后续文件的读取/解析在预读线程中与 embedding 网络往返重叠
+        docs: List[Document] = []
+
+        def _split_stream():
+            for doc in iter_split_docs(files):
+                docs.append(doc)
+                yield doc
+
+        store_path = str(vector_store_path / category)
+        create_and_save_vector_store(_split_stream(), store_path)
+        logger.info(f"[RAG] {category.capitalize()}: split {len(files)} files into {len(docs)} chunks")
+        if docs:
+            save_chunks_debug(docs, debug_output_path)
+            logger.info(f"[RAG] {category.capitalize()} vector store saved: {store_path}")
+        # 两个分支都可能上报进度，加锁保证数值单调递增
+        with progress_lock:
+            finished[0] += 1
+            progress = 89 + finished[0] * (2 / (len(jobs) + 1))
+            _update_progress(task_id, round(progress, 1), f"{category.capitalize()} index ready")
+
+    if jobs:
+        with ThreadPoolExecutor(max_workers=len(jobs), thread_name_prefix="rag-index") as pool:
+            futures = [pool.submit(_index_category, *job) for job in jobs]
+            for future in futures:
+                future.result()
     
     if communities_json_path:
         src = Path(communities_json_path).expanduser().resolve()
@@ -333,14 +618,40 @@ def _parse_task_result_blob(raw: Any) -> Dict[str, Any]:
     return {}
 
 
+def _invalidate_repo_vector_cache(url_link: str) -> None:
+    """
+    清掉本进程（API 进程）内该仓库的向量库、路径解析与语义答案缓存。
+    索引在进程池中重建，子进程里的失效调用到不了 API 进程，因此由父进程在重建前后各调用一次。
+    """
+    try:
+        vs_dir = VECTOR_STORE_ROOT / get_repo_disk_directory_name(url_link)
+        invalidate_vector_store_cache(str(vs_dir.resolve()))
+    except Exception:
+        logger.debug("invalidate_vector_store_cache 跳过或失败", exc_info=True)
+
+
+def _clone_and_index(url_link: str, config_path: Path) -> str:
+    """后台重试用：重新拉取仓库并构建索引（模块级函数，便于在进程池中执行）。"""
+    rp = setup_repository(url_link)
+    repo_dir = get_repo_disk_directory_name(url_link)
+    comm = (VECTOR_STORE_ROOT / repo_dir / "graphrag_communities.json").resolve()
+    comm_arg = str(comm) if comm.is_file() else None
+    return run_rag_indexing(
+        rp,
+        url_link,
+        config_path,
+        task_id=None,
+        communities_json_path=comm_arg,
+    )
+
+
 async def _background_retry_rag_indexing(task_id: str, url_link: str, config_path: Path) -> None:
     """
     Wiki 已成功上传后，若 RAG 失败则在后台多次重试索引；成功后合并写回 tasks.result 与 repositories。
     每次重试单独克隆到持久目录，不依赖已清理的任务临时目录。
     """
-    supabase_client = SupabaseClient()
+    supabase_client = get_client()
     delays_before_attempt_sec = [30, 120, 300]
-    loop = asyncio.get_event_loop()
     last_error: Optional[str] = None
 
     for attempt in range(1, len(delays_before_attempt_sec) + 1):
@@ -359,25 +670,12 @@ async def _background_retry_rag_indexing(task_id: str, url_link: str, config_pat
             return
 
         try:
-
-            def _clone_and_index() -> str:
-                rp = setup_repository(url_link)
-                repo_dir = get_repo_disk_directory_name(url_link)
-                comm = (VECTOR_STORE_ROOT / repo_dir / "graphrag_communities.json").resolve()
-                comm_arg = str(comm) if comm.is_file() else None
-                return run_rag_indexing(
-                    rp,
-                    url_link,
-                    config_path,
-                    task_id=None,
-                    communities_json_path=comm_arg,
-                )
-
-            vector_store_path = await loop.run_in_executor(None, _clone_and_index)
+            vector_store_path = await _run_cpu_bound(_clone_and_index, url_link, config_path)
         except Exception as e:
             last_error = str(e)
             logger.warning(f"[RAG 重试] task={task_id} 第 {attempt} 次失败: {e}")
             continue
+        _invalidate_repo_vector_cache(url_link)
 
         try:
             task_row = supabase_client.get_task(task_id)
@@ -398,9 +696,10 @@ async def _background_retry_rag_indexing(task_id: str, url_link: str, config_pat
         emb["ready_at"] = datetime.now(timezone.utc).isoformat()
         prev["embedding"] = emb
 
-        supabase_client.update_task_status(task_id, TaskStatus.COMPLETED, result=prev)
-
-        repo_row = supabase_client.get_repo_information(url_link)
+        _, repo_row = await asyncio.gather(
+            _run_io_bound(supabase_client.update_task_status, task_id, TaskStatus.COMPLETED, result=prev),
+            _run_io_bound(supabase_client.get_repo_information, url_link),
+        )
         desc = (repo_row or {}).get("description")
         supabase_client.update_repository_information(
             url_link,
@@ -477,7 +776,7 @@ async def execute_generation_task(task_id: str, url_link: str):
     repo_path: Optional[str] = None
     output_path: Optional[Path] = None
     json_output_dir: Optional[Path] = None
-    supabase_client = SupabaseClient()
+    supabase_client = get_client()
 
     try:
         # 更新状态为处理中
@@ -486,11 +785,7 @@ async def execute_generation_task(task_id: str, url_link: str):
             return
 
         # 全量重跑前清掉进程内 FAISS 缓存，避免同一路径上磁盘已重建但仍命中旧向量
-        try:
-            vs_dir = VECTOR_STORE_ROOT / get_repo_disk_directory_name(url_link)
-            invalidate_vector_store_cache(str(vs_dir.resolve()))
-        except Exception:
-            logger.debug("invalidate_vector_store_cache 跳过或失败", exc_info=True)
+        _invalidate_repo_vector_cache(url_link)
 
         # 构建任务级隔离路径
         config_path = CONFIG_PATH.expanduser().resolve()
@@ -500,50 +795,38 @@ async def execute_generation_task(task_id: str, url_link: str):
 
         
         # 1. 生成项目结构 (wiki_structure.json)
-        loop = asyncio.get_event_loop()
-        
-        repo_path, wiki_structure = await loop.run_in_executor(
-            None,
-            lambda: run_structure_generation(
-                repo_url_or_path=url_link,
-                config_path=config_path,
-                output_path=output_path,
-                task_id=task_id
-            )
+        repo_path, wiki_structure = await _run_cpu_bound(
+            run_structure_generation,
+            repo_url_or_path=url_link,
+            config_path=config_path,
+            output_path=output_path,
+            task_id=task_id,
         )
         await asyncio.sleep(0)
 
         graphrag_json_path = (output_path.parent / "graphrag_communities.json").resolve()
-        await loop.run_in_executor(
-            None,
-            lambda: _persist_graphrag_communities_to_vector_store(url_link, graphrag_json_path),
-        )
+        await _run_io_bound(_persist_graphrag_communities_to_vector_store, url_link, graphrag_json_path)
         await asyncio.sleep(0)
         
         # 2. 生成 Wiki 内容和对应的 JSON 详情
-        await loop.run_in_executor(
-            None,
-            lambda: run_wiki_content_generation(
-                repo_path=repo_path,
-                wiki_structure=wiki_structure,
-                json_output_dir=json_output_dir,
-                task_id=task_id
-            )
+        await run_wiki_content_generation_async(
+            repo_path=repo_path,
+            wiki_structure=wiki_structure,
+            json_output_dir=json_output_dir,
+            task_id=task_id,
         )
         await asyncio.sleep(0)
         
         # 3. 先上传 R2，避免仅因 RAG/embedding 失败导致 Wiki 成果未持久化
         _update_progress(task_id, 86, "Uploading to R2 storage...")
-        r2_structure_url, r2_content_urls, r2_graphrag_url = await loop.run_in_executor(
-            None,
-            lambda gp=graphrag_json_path: upload_wiki_to_r2(
-                repo_url=url_link,
-                wiki_structure=wiki_structure,
-                structure_local_path=output_path,
-                content_dir=json_output_dir,
-                task_id=task_id,
-                graphrag_local_path=gp if gp.is_file() else None,
-            )
+        r2_structure_url, r2_content_urls, r2_graphrag_url = await _run_io_bound(
+            upload_wiki_to_r2,
+            repo_url=url_link,
+            wiki_structure=wiki_structure,
+            structure_local_path=output_path,
+            content_dir=json_output_dir,
+            task_id=task_id,
+            graphrag_local_path=graphrag_json_path if graphrag_json_path.is_file() else None,
         )
         await asyncio.sleep(0)
         
@@ -551,18 +834,17 @@ async def execute_generation_task(task_id: str, url_link: str):
         vector_store_path: Optional[str] = None
         embedding_error: Optional[str] = None
         try:
-            vector_store_path = await loop.run_in_executor(
-                None,
-                lambda: run_rag_indexing(
-                    repo_path=repo_path,
-                    repo_url=url_link,
-                    config_path=config_path,
-                    task_id=task_id,
-                    communities_json_path=str(
-                        (output_path.parent / "graphrag_communities.json").resolve()
-                    ),
-                )
+            vector_store_path = await _run_cpu_bound(
+                run_rag_indexing,
+                repo_path=repo_path,
+                repo_url=url_link,
+                config_path=config_path,
+                task_id=task_id,
+                communities_json_path=str(
+                    (output_path.parent / "graphrag_communities.json").resolve()
+                ),
             )
+            _invalidate_repo_vector_cache(url_link)
         except Exception as rag_exc:
             embedding_error = str(rag_exc)
             logger.exception(
@@ -595,19 +877,22 @@ async def execute_generation_task(task_id: str, url_link: str):
             logger.info(f"任务 {task_id} 已被用户取消，跳过写入完成状态")
             return
 
-        supabase_client.update_task_status(task_id, TaskStatus.COMPLETED, result=result)
+        # 进度队列写完后再写终态，避免较早的进度覆盖 last_updated / current_step
+        await _run_io_bound(_flush_progress, task_id)
+
+        # 写入完成状态与生成仓库描述（LLM 调用）互不依赖，在 IO 线程池中并发执行
+        _, description = await asyncio.gather(
+            _run_io_bound(
+                supabase_client.update_task_status, task_id, TaskStatus.COMPLETED, result=result
+            ),
+            _run_io_bound(_generate_repo_description, repo_path, url_link),
+        )
 
         logger.info(
             "任务 %s Wiki 流程结束（embedding 成功=%s）",
             task_id,
             embedding_error is None,
         )
-
-        description = await loop.run_in_executor(
-            None,
-            lambda: _generate_repo_description(repo_path, url_link)
-        )
-        await asyncio.sleep(0)
         logger.info(f"生成仓库描述: {description}")
 
         success = supabase_client.update_repository_information(
@@ -638,14 +923,15 @@ async def execute_generation_task(task_id: str, url_link: str):
 
     except Exception as e:
         logger.exception(f"任务 {task_id} 执行过程中发生异常:")
+        await _run_io_bound(_flush_progress_quietly, task_id)
         if not _task_marked_cancelled_by_user(supabase_client, task_id):
             supabase_client.update_task_status(task_id, TaskStatus.FAILED, error=str(e))
 
     finally:
         # 无论成功还是失败，都清理本地文件以释放存储空间
         if output_path and json_output_dir:
-            await asyncio.get_event_loop().run_in_executor(
-                None,
-                lambda: cleanup_local_files(repo_path, output_path, json_output_dir)
+            await asyncio.get_running_loop().run_in_executor(
+                get_cleanup_pool(),
+                partial(cleanup_local_files, repo_path, output_path, json_output_dir),
             )
         logger.info(f"[任务 {task_id}] 本地临时文件清理完成")
@@ -1,11 +1,15 @@
+import multiprocessing
+import os
 import re
 import networkx as nx
+from concurrent.futures import ProcessPoolExecutor
 from tree_sitter import Parser, Node
-from typing import Dict, List, Optional, Set
+from typing import Dict, List, Optional, Set, Tuple
 from pathlib import Path
 import json
 
-from src.ingestion.ts_parser import TreeSitterParser
+from src.ingestion.ts_parser import TreeSitterParser, captured_nodes, compilable_patterns, make_query
+from src.utils.json_utils import dumps_pretty
 
 # Limit cross-file call fan-out to this many *distinct files* when the callee
 # is ambiguous (no import edge to guide resolution).  Same-file and imported-
@@ -15,6 +19,191 @@ _MAX_AMBIGUOUS_CROSS_FILE_TARGETS = 2
 # JS/TS language names as returned by EXTENSION_TO_LANGUAGE
 _JS_LANGS: Set[str] = {"javascript", "typescript"}
 
+# 源文件数达到该阈值时，读取与 tree-sitter 解析分发到进程池；小仓库不值得付出子进程启动开销
+_PARALLEL_PARSE_MIN_FILES = int(os.getenv("CODE_GRAPH_PARALLEL_MIN_FILES", "200"))
+_PARSE_WORKERS = max(1, int(os.getenv("CODE_GRAPH_PARSE_WORKERS", str(min(8, os.cpu_count() or 1)))))
+
+_DEFINITION_TYPES = frozenset({
+    "function_definition",
+    "class_definition",
+    "function_declaration",
+    "class_declaration",
+})
+_CALL_TYPES = frozenset({"call", "call_expression"})
+_CALLEE_TYPES = frozenset({"identifier", "attribute", "member_expression"})
+
+# 单个文件的解析结果（可 pickle，在子进程中产出）：
+#   (rel_path, lang_name, 定义 [(name, "class"|"function")], 调用 [(调用方上下文, 被调名)], 导入 [(相对层级, 模块)])
+ParsedFile = Tuple[str, str, List[Tuple[str, str]], List[Tuple[str, str]], List[Tuple[int, str]]]
+
+# 子进程内复用的 tree-sitter 解析器
+_worker_ts_parser: Optional[TreeSitterParser] = None
+
+
+def _node_text(src: bytes, node: Node) -> str:
+    return src[node.start_byte : node.end_byte].decode("utf8", errors="replace")
+
+
+# 语言 -> (定义查询, 调用查询)；None 表示该语言/绑定版本不支持 Query API，回退到递归遍历
+_query_cache: Dict[str, Optional[Tuple[object, object]]] = {}
+
+
+def _get_queries(lang_name: str, parser: Parser) -> Optional[Tuple[object, object]]:
+    if lang_name in _query_cache:
+        return _query_cache[lang_name]
+    queries = None
+    language = getattr(parser, "language", None)
+    if language is not None:
+        try:
+            def_patterns = compilable_patterns(
+                language,
+                [f"({t} name: (identifier)) @definition" for t in sorted(_DEFINITION_TYPES)],
+            )
+            call_patterns = compilable_patterns(
+                language,
+                [
+                    f"({t} function: ({c}) @callee)"
+                    for t in sorted(_CALL_TYPES)
+                    for c in sorted(_CALLEE_TYPES)
+                ],
+            )
+            queries = (
+                make_query(language, "\n".join(def_patterns)) if def_patterns else None,
+                make_query(language, "\n".join(call_patterns)) if call_patterns else None,
+            )
+        except Exception:
+            queries = None
+    _query_cache[lang_name] = queries
+    return queries
+
+
+def _scan_source(
+    src: bytes, rel_path: str, lang_name: str, parser: Parser
+) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
+    """
+    收集类/函数定义与调用点。
+    调用点记录其所在的调用方上下文（最近一层的类/函数节点 ID，顶层为文件本身）。
+
+    优先使用 tree-sitter Query API，在 C 层一次匹配出全部定义与调用，
+    再按字节区间扫描确定每个调用所在的定义；不支持 Query 时回退到逐节点递归遍历。
+    """
+    tree = parser.parse(src)
+    queries = _get_queries(lang_name, parser)
+    if queries is None:
+        return _scan_source_recursive(src, tree.root_node, rel_path)
+
+    def_query, call_query = queries
+    definitions: List[Tuple[str, str]] = []
+    # (起始字节, 结束字节, 节点ID)
+    def_spans: List[Tuple[int, int, str]] = []
+    for node in captured_nodes(def_query, tree.root_node):
+        name_node = node.child_by_field_name("name")
+        name = _node_text(src, name_node) if name_node is not None else ""
+        if name:
+            definitions.append((name, "class" if "class" in node.type else "function"))
+            def_spans.append((node.start_byte, node.end_byte, f"{rel_path}:{name}"))
+
+    calls: List[Tuple[str, str]] = []
+    stack: List[Tuple[int, int, str]] = []
+    next_def = 0
+    for callee in captured_nodes(call_query, tree.root_node):
+        pos = callee.start_byte
+        while next_def < len(def_spans) and def_spans[next_def][0] <= pos:
+            span = def_spans[next_def]
+            while stack and stack[-1][1] <= span[0]:
+                stack.pop()
+            stack.append(span)
+            next_def += 1
+        while stack and stack[-1][1] <= pos:
+            stack.pop()
+        call_name = _node_text(src, callee).split(".")[-1]
+        if call_name:
+            calls.append((stack[-1][2] if stack else rel_path, call_name))
+    return definitions, calls
+
+
+def _scan_source_recursive(
+    src: bytes, root: Node, rel_path: str
+) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
+    definitions: List[Tuple[str, str]] = []
+    calls: List[Tuple[str, str]] = []
+
+    def traverse(node: Node, context: str) -> None:
+        if node.type in _DEFINITION_TYPES:
+            for child in node.children:
+                if child.type == "identifier":
+                    name = _node_text(src, child)
+                    if name:
+                        definitions.append((name, "class" if "class" in node.type else "function"))
+                        context = f"{rel_path}:{name}"
+                    break
+
+        if node.type in _CALL_TYPES:
+            for child in node.children:
+                if child.type in _CALLEE_TYPES:
+                    call_name = _node_text(src, child).split(".")[-1]
+                    if call_name:
+                        calls.append((context, call_name))
+                    break
+
+        for child in node.children:
+            traverse(child, context)
+
+    traverse(root, rel_path)
+    return definitions, calls
+
+
+def _scan_imports(code: str, lang_name: str) -> List[Tuple[int, str]]:
+    """
+    提取文件级 import/require 语句中的模块名，解析交给主进程（需要全仓库路径集合）。
+
+    Python: from [.]module import x  |  import module   -> (相对层级, 模块)
+    JS/TS:  import X from './y'  |  import './y'  |  require('./y')   -> (0, 路径)
+    """
+    specs: List[Tuple[int, str]] = []
+    if lang_name == "python":
+        # from [.]module import x
+        for m in re.finditer(r"from\s+(\.*)(\w[\w.]*)\s+import", code):
+            specs.append((len(m.group(1)), m.group(2)))
+        # from . import x  (dot-only relative, treat module = x)
+        for m in re.finditer(r"from\s+(\.+)\s+import\s+(\w+)", code):
+            specs.append((len(m.group(1)), m.group(2)))
+        # import module
+        for m in re.finditer(r"^import\s+(\w[\w.]*)", code, re.MULTILINE):
+            specs.append((0, m.group(1)))
+
+    elif lang_name in _JS_LANGS:
+        patterns = [
+            r"""import\s+[\s\S]*?\bfrom\s+['"]([^'"]+)['"]""",
+            r"""import\s+['"]([^'"]+)['"]""",
+            r"""require\s*\(\s*['"]([^'"]+)['"]\s*\)""",
+        ]
+        for pat in patterns:
+            for m in re.finditer(pat, code):
+                specs.append((0, m.group(1)))
+    return specs
+
+
+def _parse_source_file(
+    task: Tuple[str, str, str], ts_parser: Optional[TreeSitterParser] = None
+) -> Optional[ParsedFile]:
+    """
+    读取并解析单个源文件；作为进程池任务时使用子进程内缓存的解析器。
+    文件按字节读取一次直接交给 tree-sitter，只为 import 正则解码一次文本，不再做 str -> bytes 的往返编码。
+    """
+    global _worker_ts_parser
+    file_path, rel_path, lang_name = task
+    src = CodeGraphBuilder._read_file(file_path)
+    if src is None:
+        return None
+    if ts_parser is None:
+        if _worker_ts_parser is None:
+            _worker_ts_parser = TreeSitterParser()
+        ts_parser = _worker_ts_parser
+    definitions, calls = _scan_source(src, rel_path, lang_name, ts_parser.get_parser(lang_name))
+    imports = _scan_imports(src.decode("utf-8", errors="replace"), lang_name)
+    return rel_path, lang_name, definitions, calls, imports
+
 
 class CodeGraphBuilder:
     """
@@ -37,6 +226,8 @@ class CodeGraphBuilder:
         self.graph = nx.DiGraph()
         self.ts_parser = TreeSitterParser()
         self._all_rel_paths: Set[str] = set()
+        # 名称 -> 同名类/函数节点 ID（按首次加入图的顺序，dict 充当有序集合），供调用解析 O(1) 查找
+        self._nodes_by_name: Dict[str, Dict[str, None]] = {}
         self.current_context: str = ""
 
     def get_parser(self, language_name: str) -> Parser:
@@ -47,7 +238,12 @@ class CodeGraphBuilder:
     # ------------------------------------------------------------------
 
     def build_graph(self, repo_root: str, file_paths: List[str]):
-        """构建完整的代码库图谱。两阶段：先提取节点，再提取边。"""
+        """
+        构建完整的代码库图谱。
+
+        每个文件只读取、解析一次（文件较多时在进程池中并行），
+        再在主进程中分两阶段合并：先添加全部节点，再添加边。
+        """
         repo_root_path = Path(repo_root)
 
         # Pre-compute the set of all relative paths so import resolution can
@@ -61,34 +257,43 @@ class CodeGraphBuilder:
             except ValueError:
                 pass
 
-        # Phase 1: nodes
+        tasks: List[Tuple[str, str, str]] = []
         for file_path in file_paths:
-            rel_path = str(Path(file_path).relative_to(repo_root_path)).replace("\\", "/")
-            lang_name = self.EXTENSION_TO_LANGUAGE.get(Path(file_path).suffix.lower())
+            path = Path(file_path)
+            # 先按扩展名过滤，不支持的文件不再计算相对路径
+            lang_name = self.EXTENSION_TO_LANGUAGE.get(path.suffix.lower())
             if not lang_name:
                 continue
-            content = self._read_file(file_path)
-            if content is None:
-                continue
-            self._extract_nodes(content, rel_path, lang_name)
+            rel_path = str(path.relative_to(repo_root_path)).replace("\\", "/")
+            tasks.append((file_path, rel_path, lang_name))
+
+        parsed = [result for result in self._parse_files(tasks) if result is not None]
+
+        # Phase 1: nodes
+        self._nodes_by_name = {}
+        for rel_path, _, definitions, _, _ in parsed:
+            self._add_nodes(rel_path, definitions)
 
         # Phase 2: edges (import first, then call — call resolution uses import edges)
-        for file_path in file_paths:
-            rel_path = str(Path(file_path).relative_to(repo_root_path)).replace("\\", "/")
-            lang_name = self.EXTENSION_TO_LANGUAGE.get(Path(file_path).suffix.lower())
-            if not lang_name:
-                continue
-            content = self._read_file(file_path)
-            if content is None:
-                continue
-            self._extract_edges(content, rel_path, lang_name)
+        for rel_path, lang_name, _, calls, imports in parsed:
+            self._add_edges(rel_path, lang_name, calls, imports)
 
         return self.graph
 
+    def _parse_files(self, tasks: List[Tuple[str, str, str]]) -> List[Optional[ParsedFile]]:
+        """解析全部源文件；结果顺序与 tasks 一致，保证图的构建顺序确定。"""
+        if len(tasks) < _PARALLEL_PARSE_MIN_FILES or _PARSE_WORKERS <= 1:
+            return [_parse_source_file(task, self.ts_parser) for task in tasks]
+        # tree-sitter 的 Tree/Node 无法 pickle，子进程只返回提取好的定义、调用与导入
+        with ProcessPoolExecutor(
+            max_workers=_PARSE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as pool:
+            return list(pool.map(_parse_source_file, tasks, chunksize=32))
+
     def save_graph(self, output_path: str) -> None:
         data = nx.node_link_data(self.graph)
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        Path(output_path).write_bytes(dumps_pretty(data))
 
     def load_graph(self, input_path: str) -> None:
         with open(input_path, "r", encoding="utf-8") as f:
@@ -99,40 +304,20 @@ class CodeGraphBuilder:
     # Node extraction
     # ------------------------------------------------------------------
 
-    def _extract_nodes(self, code: str, rel_path: str, lang_name: str) -> None:
+    def _add_nodes(self, rel_path: str, definitions: List[Tuple[str, str]]) -> None:
         """添加文件、类、函数节点及 contains 边。"""
         self.graph.add_node(rel_path, type="file", label=rel_path)
-
-        parser = self.get_parser(lang_name)
-        tree = parser.parse(bytes(code, "utf8"))
-
-        def traverse(node: Node) -> None:
-            if node.type in (
-                "function_definition",
-                "class_definition",
-                "function_declaration",
-                "class_declaration",
-            ):
-                name: Optional[str] = None
-                for child in node.children:
-                    if child.type == "identifier":
-                        name = code[child.start_byte : child.end_byte]
-                        break
-                if name:
-                    node_id = f"{rel_path}:{name}"
-                    self.graph.add_node(
-                        node_id,
-                        type="class" if "class" in node.type else "function",
-                        name=name,
-                        file=rel_path,
-                        label=name,
-                    )
-                    self.graph.add_edge(rel_path, node_id, type="contains")
-
-            for child in node.children:
-                traverse(child)
-
-        traverse(tree.root_node)
+        for name, kind in definitions:
+            node_id = f"{rel_path}:{name}"
+            self.graph.add_node(
+                node_id,
+                type=kind,
+                name=name,
+                file=rel_path,
+                label=name,
+            )
+            self.graph.add_edge(rel_path, node_id, type="contains")
+            self._nodes_by_name.setdefault(name, {})[node_id] = None
 
     # ------------------------------------------------------------------
     # Import resolution
@@ -176,12 +361,9 @@ class CodeGraphBuilder:
             return candidate
         return None
 
-    def _extract_import_edges(self, code: str, rel_path: str, lang_name: str) -> None:
+    def _add_import_edges(self, rel_path: str, lang_name: str, imports: List[Tuple[int, str]]) -> None:
         """
-        提取文件级 import/require 语句，添加 imports 边。
-
-        Python: from [.]module import x  |  import module
-        JS/TS:  import X from './y'  |  import './y'  |  require('./y')
+        解析 _scan_imports 提取的模块名，添加 imports 边。
 
         只解析相对导入（Python 相对导入 + JS 以 '.' 开头的 import），
         项目内的包级导入（Python 绝对路径）也会尝试解析。
@@ -191,39 +373,13 @@ class CodeGraphBuilder:
             base_dir = ""
 
         targets: List[str] = []
-
-        if lang_name == "python":
-            # from [.]module import x
-            for m in re.finditer(r"from\s+(\.*)(\w[\w.]*)\s+import", code):
-                dots = len(m.group(1))
-                mod = m.group(2)
+        for dots, mod in imports:
+            if lang_name == "python":
                 t = self._resolve_python_module(mod, base_dir, dots)
-                if t:
-                    targets.append(t)
-            # from . import x  (dot-only relative, treat module = x)
-            for m in re.finditer(r"from\s+(\.+)\s+import\s+(\w+)", code):
-                dots = len(m.group(1))
-                mod = m.group(2)
-                t = self._resolve_python_module(mod, base_dir, dots)
-                if t:
-                    targets.append(t)
-            # import module
-            for m in re.finditer(r"^import\s+(\w[\w.]*)", code, re.MULTILINE):
-                t = self._resolve_python_module(m.group(1), base_dir, 0)
-                if t:
-                    targets.append(t)
-
-        elif lang_name in _JS_LANGS:
-            patterns = [
-                r"""import\s+[\s\S]*?\bfrom\s+['"]([^'"]+)['"]""",
-                r"""import\s+['"]([^'"]+)['"]""",
-                r"""require\s*\(\s*['"]([^'"]+)['"]\s*\)""",
-            ]
-            for pat in patterns:
-                for m in re.finditer(pat, code):
-                    t = self._resolve_js_module(m.group(1), base_dir)
-                    if t:
-                        targets.append(t)
+            else:
+                t = self._resolve_js_module(mod, base_dir)
+            if t:
+                targets.append(t)
 
         for target in targets:
             if target != rel_path and target in self._all_rel_paths:
@@ -286,9 +442,15 @@ class CodeGraphBuilder:
     # Edge extraction (orchestrates import + call)
     # ------------------------------------------------------------------
 
-    def _extract_edges(self, code: str, rel_path: str, lang_name: str) -> None:
-        """提取 import 和 call 边。import 先提取，call 解析借助已知 import 信息。"""
-        self._extract_import_edges(code, rel_path, lang_name)
+    def _add_edges(
+        self,
+        rel_path: str,
+        lang_name: str,
+        calls: List[Tuple[str, str]],
+        imports: List[Tuple[int, str]],
+    ) -> None:
+        """添加 import 和 call 边。import 先添加，call 解析借助已知 import 信息。"""
+        self._add_import_edges(rel_path, lang_name, imports)
 
         # Build the set of files this file explicitly imports — used to guide
         # call resolution toward high-confidence cross-file targets.
@@ -298,62 +460,28 @@ class CodeGraphBuilder:
             if d.get("type") == "imports"
         }
 
-        parser = self.get_parser(lang_name)
-        tree = parser.parse(bytes(code, "utf8"))
-
-        self.current_context = rel_path
         cur_dir = str(Path(rel_path).parent)
-
-        def traverse(node: Node) -> None:
-            old_context = self.current_context
-
-            if node.type in (
-                "function_definition",
-                "class_definition",
-                "function_declaration",
-                "class_declaration",
-            ):
-                name: Optional[str] = None
-                for child in node.children:
-                    if child.type == "identifier":
-                        name = code[child.start_byte : child.end_byte]
-                        break
-                if name:
-                    self.current_context = f"{rel_path}:{name}"
-
-            if node.type in ("call", "call_expression"):
-                call_name: Optional[str] = None
-                for child in node.children:
-                    if child.type in ("identifier", "attribute", "member_expression"):
-                        full_call = code[child.start_byte : child.end_byte]
-                        call_name = full_call.split(".")[-1]
-                        break
-                if call_name:
-                    potential_targets = [
-                        n
-                        for n, d in self.graph.nodes(data=True)
-                        if d.get("type") == "function" and d.get("name") == call_name
-                    ]
-                    if potential_targets:
-                        self._add_call_edges(
-                            rel_path, cur_dir, imported_files, potential_targets
-                        )
-
-            for child in node.children:
-                traverse(child)
-
-            self.current_context = old_context
-
-        traverse(tree.root_node)
+        for context, call_name in calls:
+            # 同名节点可能先后被登记为类和函数，以图中最终的 type 为准
+            potential_targets = [
+                n
+                for n in self._nodes_by_name.get(call_name, ())
+                if self.graph.nodes[n].get("type") == "function"
+            ]
+            if potential_targets:
+                self.current_context = context
+                self._add_call_edges(
+                    rel_path, cur_dir, imported_files, potential_targets
+                )
+        self.current_context = rel_path
 
     # ------------------------------------------------------------------
     # Helpers
     # ------------------------------------------------------------------
 
     @staticmethod
-    def _read_file(path: str) -> Optional[str]:
+    def _read_file(path: str) -> Optional[bytes]:
         try:
-            with open(path, "r", encoding="utf-8", errors="replace") as f:
-                return f.read()
+            return Path(path).read_bytes()
         except OSError:
             return None
@@ -1,8 +1,7 @@
-import json
 import logging
 from collections import defaultdict
 from pathlib import Path
-from typing import Any, DefaultDict, Dict, List, Optional, Set, Tuple
+from typing import Any, DefaultDict, Dict, List, Mapping, Optional, Set, Tuple
 
 import igraph as ig
 import leidenalg
@@ -10,6 +9,7 @@ import networkx as nx
 
 from src.clients.ai_client_factory import get_ai_client, get_model_config
 from src.config import CONFIG
+from src.utils.json_utils import dumps_pretty
 
 logger = logging.getLogger("app.ingestion.community_engine")
 
@@ -25,9 +25,9 @@ class CommunityEngine:
         self.community_summaries = {}
 
     @staticmethod
-    def _community_detection_config() -> Dict[str, Any]:
+    def _community_detection_config() -> Mapping[str, Any]:
         raw = CONFIG.get("community_detection") or {}
-        if not isinstance(raw, dict):
+        if not isinstance(raw, Mapping):
             return {}
         return raw
 
@@ -363,6 +363,8 @@ class CommunityEngine:
         provider, model = get_model_config(CONFIG, "community_summary")
         client = get_ai_client(provider, model=model)
 
+        pending_ids: List[int] = []
+        pending_batch: List[List[Dict[str, str]]] = []
         for comm_id, nodes in self.communities.items():
             node_details = []
             for node in nodes:
@@ -389,12 +391,17 @@ Entity list:
 
 Return only the summary text, in English."""
 
-            try:
-                summary = client.chat([{"role": "user", "content": prompt}])
-                self.community_summaries[comm_id] = summary
-            except Exception as e:
-                logger.error(f"Error generating summary for community {comm_id}: {e}")
+            pending_ids.append(comm_id)
+            pending_batch.append([{"role": "user", "content": prompt}])
+
+        # 各社区摘要互相独立，批量并发请求
+        results = client.chat_many(pending_batch)
+        for comm_id, summary in zip(pending_ids, results):
+            if isinstance(summary, Exception):
+                logger.error(f"Error generating summary for community {comm_id}: {summary}")
                 self.community_summaries[comm_id] = "Unable to generate summary."
+            else:
+                self.community_summaries[comm_id] = summary
 
         return self.community_summaries
 
@@ -409,5 +416,4 @@ Return only the summary text, in English."""
             "communities": self.communities,
             "summaries": self.community_summaries,
         }
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(results, f, ensure_ascii=False, indent=2)
+        Path(output_path).write_bytes(dumps_pretty(results))
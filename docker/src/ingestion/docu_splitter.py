@@ -1,10 +1,11 @@
 import re
 import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import Optional
-from langchain_community.document_loaders import TextLoader
+from typing import Iterator, Optional, Tuple, Union
 from langchain_core.documents import Document
-from src.ingestion.ts_parser import TreeSitterParser
+from src.ingestion.ts_parser import SUPPORTED_EXTENSIONS, CodeChunk, TreeSitterParser
 
 
 # ---------------------------------------------------------------------------
@@ -363,41 +364,79 @@ def _normalize_code_chunks(raw_docs: list[Document]) -> list[Document]:
     return result
 
 
+# ---------------------------------------------------------------------------
+# 文件预读
+# ---------------------------------------------------------------------------
+
+# 每个窗口内并发预读的文件数与读线程数；窗口限制了同时驻留内存的文件内容
+PREFETCH_WINDOW = 512
+PREFETCH_WORKERS = 16
+
+
+def _read_utf8(file_path: str) -> Union[str, Exception]:
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            return f.read()
+    except Exception as e:
+        return e
+
+
+def _load_file(
+    file_path: str, ts_parser: Optional[TreeSitterParser] = None
+) -> Union[str, list[CodeChunk], Exception]:
+    """
+    读取文件；给定 ts_parser 时代码文件直接在读线程内完成 AST 切片，返回 CodeChunk 列表。
+    Parser.parse 在 C 层执行并释放 GIL，多个读线程的解析可以真正并行。
+    """
+    extension = Path(file_path).suffix.lower()
+    if ts_parser is None or extension not in SUPPORTED_EXTENSIONS:
+        return _read_utf8(file_path)
+    try:
+        # 按字节读取直接交给 tree-sitter，只解码被切出的片段
+        return ts_parser.parse_code(Path(file_path).read_bytes(), extension)
+    except Exception as e:
+        return e
+
+
+def _prefetch_files(
+    file_paths: list[str], ts_parser: Optional[TreeSitterParser] = None
+) -> Iterator[Tuple[str, Union[str, list[CodeChunk], Exception]]]:
+    """
+    按原顺序产出 (路径, 内容/代码切片或异常)。
+    文件读取与代码文件的 Tree-sitter 解析在线程池中批量并发，与主线程的切分逻辑重叠，
+    大量小文件时不再逐个串行等待 open/read/parse。
+    """
+    if not file_paths:
+        return
+    workers = min(PREFETCH_WORKERS, len(file_paths))
+    load = partial(_load_file, ts_parser=ts_parser)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="doc-read") as pool:
+        for start in range(0, len(file_paths), PREFETCH_WINDOW):
+            window = file_paths[start:start + PREFETCH_WINDOW]
+            yield from zip(window, pool.map(load, window))
+
+
 # ---------------------------------------------------------------------------
 # 主入口
 # ---------------------------------------------------------------------------
 
-def load_and_split_docs(
-    file_paths: list[str],
-    debug_output_path: Optional[str] = None,
-) -> list[Document]:
+def iter_split_docs(file_paths: list[str]) -> Iterator[Document]:
     """
-    加载文件内容并切分为文本块。
+    按文件顺序逐个产出切分后的文本块，供下游（如 embedding）边切分边消费。
 
     - 代码文件：Tree-sitter AST 感知切片
     - 文本/Markdown 文件：SemanticDocumentSplitter 语义感知切片
-
-    Args:
-        file_paths: 要处理的文件路径列表。
-        debug_output_path: 若提供，将所有 chunk 保存到该 JSONL 文件（含摘要），
-                           便于人工检查 chunk 内容和效果。
-                           示例: "chunk_debug/chunks.jsonl"
     """
-    docs: list[Document] = []
     ts_parser = TreeSitterParser()
     semantic_splitter = SemanticDocumentSplitter()
 
-    for file_path in file_paths:
+    for file_path, content in _prefetch_files(file_paths, ts_parser):
         try:
-            path_obj = Path(file_path)
-            extension = path_obj.suffix.lower()
+            if isinstance(content, Exception):
+                raise content
 
-            if extension in TreeSitterParser.EXTENSION_TO_LANGUAGE:
-                # 代码文件：AST 感知切片
-                with open(file_path, "r", encoding="utf-8") as f:
-                    content = f.read()
-
-                chunks = ts_parser.parse_code(content, extension)
+            if isinstance(content, list):
+                # 代码文件：AST 感知切片（已在读线程中解析）
                 raw_code_docs = [
                     Document(
                         page_content=chunk.content,
@@ -410,19 +449,12 @@ def load_and_split_docs(
                             "name": chunk.name,
                         },
                     )
-                    for chunk in chunks
+                    for chunk in content
                 ]
-                docs.extend(_normalize_code_chunks(raw_code_docs))
+                file_docs = _normalize_code_chunks(raw_code_docs)
             else:
                 # 文本文件：语义感知切片
-                loader = TextLoader(file_path, encoding="utf-8")
-                raw_docs = loader.load()   # 不切分，拿原始内容
-                for raw_doc in raw_docs:
-                    split = semantic_splitter.split_text(
-                        raw_doc.page_content,
-                        {**raw_doc.metadata, "source": file_path},
-                    )
-                    docs.extend(split)
+                file_docs = semantic_splitter.split_text(content, {"source": file_path})
 
         except Exception as e:
             import traceback
@@ -430,6 +462,24 @@ def load_and_split_docs(
             print(f"Skipping file {file_path} due to error: {e} ({error_details})")
             continue
 
+        yield from file_docs
+
+
+def load_and_split_docs(
+    file_paths: list[str],
+    debug_output_path: Optional[str] = None,
+) -> list[Document]:
+    """
+    加载文件内容并切分为文本块（iter_split_docs 的列表版本）。
+
+    Args:
+        file_paths: 要处理的文件路径列表。
+        debug_output_path: 若提供，将所有 chunk 保存到该 JSONL 文件（含摘要），
+                           便于人工检查 chunk 内容和效果。
+                           示例: "chunk_debug/chunks.jsonl"
+    """
+    docs = list(iter_split_docs(file_paths))
+
     print(f"Split content into {len(docs)} document chunks.")
 
     if debug_output_path:
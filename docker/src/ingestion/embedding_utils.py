@@ -15,16 +15,20 @@ OpenAI-compatible APIs（非官方 api.openai.com 的网关，如 OpenRouter、
 官方 OpenAI ``https://api.openai.com/v1`` 仍走默认请求参数（与历史行为一致）。
 """
 import os
+import threading
 import time
 import logging
-from typing import List, Any
+from typing import Dict, List, Any
 from urllib.parse import urlparse
 
+import httpx
 from openai import OpenAI
 from langchain_core.embeddings import Embeddings
-from dotenv import load_dotenv
 
-load_dotenv()
+from src.clients.openrouter_client import POOL_LIMITS, REQUEST_TIMEOUT, _HTTP2_AVAILABLE
+from src.utils.env import load_env
+
+load_env()
 
 logger = logging.getLogger("app.ingestion.embedding_utils")
 
@@ -97,10 +101,14 @@ class OpenRouterEmbeddings(Embeddings):
                 "HTTP-Referer": "https://github.com/FAN-Tianrui-FYP",
                 "X-Title": "FYP Wiki Generator",
             },
+            # 与聊天客户端共用连接池参数：长 keep-alive，避免批次间重复 TLS 握手
+            http_client=httpx.Client(
+                http2=_HTTP2_AVAILABLE, limits=POOL_LIMITS, timeout=REQUEST_TIMEOUT
+            ),
         )
 
-    # 每次实际发送给 OpenRouter API 的最大文本条数（降低以缓解 504/无响应问题）
-    INNER_BATCH_SIZE = 20
+    # 每次实际发送给 OpenRouter API 的最大文本条数（默认较低以缓解 504/无响应问题，可按网关能力调大）
+    INNER_BATCH_SIZE = int(os.getenv("OPENROUTER_EMBED_BATCH_SIZE", "20"))
     # 两次 API 请求之间的冷却时间（秒）
     INNER_BATCH_SLEEP_SEC = 1.0
 
@@ -211,12 +219,22 @@ class OpenRouterEmbeddings(Embeddings):
         return response.data[0].embedding
 
 
+# 按 API key 复用嵌入客户端，各向量库共享同一 HTTP 连接池
+_embeddings_instances: Dict[str, "OpenRouterEmbeddings"] = {}
+_embeddings_lock = threading.Lock()
+
+
 def get_openrouter_embeddings() -> Embeddings:
     api_key = os.getenv("OPENROUTER_API_KEY")
     if not api_key:
         raise ValueError("未检测到 OPENROUTER_API_KEY，请设置环境变量。")
-    return OpenRouterEmbeddings(
-        model=OPENROUTER_EMBEDDING_MODEL,
-        api_key=api_key,
-        base_url=OPENROUTER_API_BASE,
-    )
+    with _embeddings_lock:
+        embeddings = _embeddings_instances.get(api_key)
+        if embeddings is None:
+            embeddings = OpenRouterEmbeddings(
+                model=OPENROUTER_EMBEDDING_MODEL,
+                api_key=api_key,
+                base_url=OPENROUTER_API_BASE,
+            )
+            _embeddings_instances[api_key] = embeddings
+        return embeddings
@@ -2,7 +2,7 @@ import os
 import json
 import fnmatch
 from pathlib import Path
-from src.config import CONFIG, load_config
+from src.config import CONFIG, get_config
 
 # TODO: 只处理中文，英文，符号，数字，其他语言的内容直接忽略
 
@@ -167,8 +167,9 @@ def split_code_and_text_files(file_paths: list[str], config: dict) -> tuple[list
     text_files: list[str] = []
 
     for path in file_paths:
-        suffix = Path(path).suffix.lower().lstrip(".")
-        filename = Path(path).name.lower()
+        path_obj = Path(path)
+        suffix = path_obj.suffix.lower().lstrip(".")
+        filename = path_obj.name.lower()
 
         if suffix in code_exts or filename in SPECIAL_CODE_FILENAMES:
             code_files.append(path)
@@ -189,7 +190,7 @@ def generate_file_tree(repo_path: str, config_path: str) -> str:
     为相关文件生成一个文本格式的目录树。
     """
     print("Generating file tree...")
-    config = load_config(config_path)
+    config = get_config(config_path)
     # 我们只关心筛选后的文件
     relevant_files = find_relevant_files(repo_path, config)
     
@@ -232,5 +233,5 @@ def get_files_to_process(repo_path: str, config_path: str) -> list[str]:
     Returns:
         需要处理的文件路径列表（绝对路径）
     """
-    config = load_config(config_path)
+    config = get_config(config_path)
     return find_relevant_files(repo_path, config)
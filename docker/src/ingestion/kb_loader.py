@@ -1,11 +1,30 @@
 import logging
+import math
+import os
+import weakref
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
 from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
 from pathlib import Path
 
 from src.ingestion.embedding_utils import get_openrouter_embeddings
 
 logger = logging.getLogger("app.ingestion.kb_loader")
 
+# GPU 加速：auto（有 GPU 且向量数达到阈值时启用）/ on / off
+FAISS_USE_GPU: str = os.getenv("FAISS_USE_GPU", "auto").strip().lower()
+GPU_MIN_VECTORS = 10000
+
+# 进程内共享的 GPU 资源，需在索引生命周期内保持引用
+_gpu_resources = None
+
+# 量化索引的 FP32 原始向量（与 vector_store.EXACT_VECTORS_FILENAME 对应），按 store 弱引用挂载
+EXACT_VECTORS_FILENAME = "vectors.npy"
+RERANK_OVERFETCH = 4
+_exact_vectors: "weakref.WeakKeyDictionary[FAISS, np.ndarray]" = weakref.WeakKeyDictionary()
+
 def _ensure_vector_store_exists(db_path: str) -> None:
     if not db_path:
         raise ValueError("Vector store path is empty.")
@@ -23,6 +42,85 @@ def _ensure_vector_store_exists(db_path: str) -> None:
         )
 
 
+def _default_nprobe(ntotal: int, nlist: int) -> int:
+    """IVF 探测桶数：约 sqrt(N)/4，且不超过 nlist"""
+    return min(nlist, max(1, int(math.sqrt(ntotal) / 4)))
+
+
+def _tune_index(db: FAISS) -> None:
+    """
+    加载后的索引调优：IVF 索引设置 nprobe；大索引在有 GPU 时迁移到 GPU 做暴力检索。
+    任一步失败都保持原 CPU 索引不变。
+    """
+    global _gpu_resources
+    import faiss
+
+    index = db.index
+    try:
+        ivf = faiss.try_extract_index_ivf(index)
+    except Exception:
+        ivf = None
+    if ivf is not None:
+        ivf.nprobe = _default_nprobe(index.ntotal, ivf.nlist)
+        logger.info(f"IVF index detected: nlist={ivf.nlist}, nprobe={ivf.nprobe}")
+
+    if FAISS_USE_GPU == "off":
+        return
+    if FAISS_USE_GPU == "auto" and index.ntotal < GPU_MIN_VECTORS:
+        return
+    num_gpus = faiss.get_num_gpus() if hasattr(faiss, "get_num_gpus") else 0
+    if num_gpus <= 0:
+        return
+
+    try:
+        if _gpu_resources is None:
+            _gpu_resources = faiss.StandardGpuResources()
+        db.index = faiss.index_cpu_to_gpu(_gpu_resources, 0, index)
+        logger.info(f"Moved FAISS index ({index.ntotal} vectors) to GPU 0")
+    except Exception as e:
+        logger.warning(f"Failed to move FAISS index to GPU, staying on CPU: {e}")
+
+
+def search_with_exact_rerank(
+    db: FAISS, embedding: Sequence[float], k: int
+) -> Optional[List[Tuple[Document, float]]]:
+    """
+    量化索引的检索：先在压缩索引上过采样 k * RERANK_OVERFETCH 个候选，
+    再用 FP32 原始向量计算精确距离重排。返回与 similarity_search_with_score_by_vector
+    相同口径的 (文档, 距离/内积) 列表；store 未量化时返回 None。
+    """
+    import faiss
+
+    exact = _exact_vectors.get(db)
+    if exact is None or k <= 0:
+        return None
+
+    query = np.asarray([embedding], dtype=np.float32)
+    if getattr(db, "_normalize_L2", False):
+        faiss.normalize_L2(query)
+    _, ids = db.index.search(query, k * RERANK_OVERFETCH)
+    candidate_ids = ids[0][ids[0] >= 0]
+    if candidate_ids.size == 0:
+        return []
+
+    candidate_vecs = np.asarray(exact[candidate_ids], dtype=np.float32)
+    if db.index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        scores = candidate_vecs @ query[0]
+        order = np.argsort(-scores, kind="stable")[:k]
+    else:
+        diff = candidate_vecs - query[0]
+        scores = np.einsum("ij,ij->i", diff, diff)
+        order = np.argsort(scores, kind="stable")[:k]
+
+    results: List[Tuple[Document, float]] = []
+    for pos in order:
+        doc_id = db.index_to_docstore_id[int(candidate_ids[pos])]
+        doc = db.docstore.search(doc_id)
+        if isinstance(doc, Document):
+            results.append((doc, float(scores[pos])))
+    return results
+
+
 def load_knowledge_base(db_path: str) -> FAISS:
     """
     从本地加载 FAISS 向量数据库和嵌入模型。
@@ -35,6 +133,12 @@ def load_knowledge_base(db_path: str) -> FAISS:
     embeddings = get_openrouter_embeddings()
 
     db = FAISS.load_local(db_path, embeddings, allow_dangerous_deserialization=True)
+    exact_path = Path(db_path) / EXACT_VECTORS_FILENAME
+    if exact_path.exists():
+        # mmap 读取，避免把 FP32 原始向量整体读入内存
+        _exact_vectors[db] = np.load(exact_path, mmap_mode="r")
+        logger.info(f"Quantized index detected, FP32 rerank vectors mapped from {exact_path}")
+    _tune_index(db)
 
     logger.info("Knowledge base loaded successfully.")
     return db
@@ -1,6 +1,7 @@
+import threading
 import tree_sitter
 from tree_sitter import Parser, Node
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional, Union
 from pathlib import Path
 
 # 尝试导入更现代且兼容 tree-sitter 0.22+ 的语言包
@@ -17,7 +18,107 @@ try:
 except ImportError:
     HAS_TS_LANGS = False
 
+# 已加载的语言（dlopen + 符号解析）在进程内只做一次，由所有 TreeSitterParser 实例共享
+_LANGUAGES: Dict[str, Any] = {}
+_LANGUAGE_LOCK = threading.Lock()
+
+
+def _load_language(language_name: str):
+    lang = None
+
+    # 优先使用 tree-sitter-language-pack (兼容性更好)
+    if HAS_TSLP:
+        try:
+            lang = tslp.get_language(language_name)
+        except Exception:
+            pass
+
+    # 如果失败，尝试使用 tree-sitter-languages
+    if lang is None and HAS_TS_LANGS:
+        try:
+            lang = tree_sitter_languages.get_language(language_name)
+        except Exception:
+            # 如果 tree-sitter-languages 报错 "__init__() takes exactly 1 argument (2 given)"
+            # 这是因为它与新版 tree-sitter 0.22+ 不兼容
+            pass
+
+    if lang is None:
+        raise ValueError(f"Could not load tree-sitter language: {language_name}")
+    return lang
+
+
+def get_language(language_name: str):
+    """返回进程内共享的 tree-sitter Language，首次请求时加载。"""
+    lang = _LANGUAGES.get(language_name)
+    if lang is not None:
+        return lang
+    with _LANGUAGE_LOCK:
+        lang = _LANGUAGES.get(language_name)
+        if lang is None:
+            lang = _load_language(language_name)
+            _LANGUAGES[language_name] = lang
+        return lang
+
+
+def _decode(data: bytes) -> str:
+    return data.decode("utf-8", errors="replace")
+
+
+def make_query(language, source: str):
+    """兼容 tree-sitter 0.25+ 的 Query(language, source) 与旧版的 language.query(source)。"""
+    try:
+        from tree_sitter import Query
+        return Query(language, source)
+    except Exception:
+        return language.query(source)
+
+
+def compilable_patterns(language, patterns: List[str]) -> List[str]:
+    """逐条试编译，去掉当前语法中不存在的节点类型/字段对应的模式。"""
+    valid = []
+    for pattern in patterns:
+        try:
+            make_query(language, pattern)
+        except Exception:
+            continue
+        valid.append(pattern)
+    return valid
+
+
+def captured_nodes(query, root: Node) -> List[Node]:
+    """执行查询并按源码位置返回被捕获的节点（兼容 QueryCursor / 旧版 captures 的返回形态）。"""
+    if query is None:
+        return []
+    try:
+        from tree_sitter import QueryCursor
+        captures = QueryCursor(query).captures(root)
+    except ImportError:
+        captures = query.captures(root)
+    if isinstance(captures, dict):
+        nodes = [node for group in captures.values() for node in group]
+    else:
+        nodes = [node for node, _ in captures]
+    nodes.sort(key=lambda n: n.start_byte)
+    return nodes
+
+
+# 不同语言中作为独立切片的节点类型
+_CHUNK_NODE_TYPES: Dict[str, frozenset] = {
+    "python": frozenset({"function_definition", "class_definition"}),
+    "javascript": frozenset({"function_declaration", "class_declaration", "method_definition", "arrow_function"}),
+    "typescript": frozenset({"function_declaration", "class_declaration", "method_definition", "interface_declaration", "type_alias_declaration"}),
+    "tsx": frozenset({"function_declaration", "class_declaration", "method_definition", "interface_declaration", "type_alias_declaration"}),
+}
+_DEFAULT_CHUNK_NODE_TYPES = frozenset({"function_definition", "class_definition"})
+
+# 语言 -> 切片节点查询；None 表示不支持 Query API（或无可用模式），回退到显式栈遍历
+_chunk_query_cache: Dict[str, Any] = {}
+
+
 class CodeChunk:
+    # 每个函数/类定义一个实例，大仓库中数量很多；__slots__ 去掉实例 __dict__
+    __slots__ = ("content", "start_line", "end_line", "node_type", "name")
+
     def __init__(self, content: str, start_line: int, end_line: int, node_type: str, name: Optional[str] = None):
         self.content = content
         self.start_line = start_line
@@ -46,30 +147,16 @@ class TreeSitterParser:
     }
 
     def __init__(self):
-        self.parsers = {}
+        # Parser 对象有内部状态，不能被多个线程同时使用；每个线程各持一份，Language 在进程内共享
+        self._local = threading.local()
 
     def get_parser(self, language_name: str) -> Parser:
-        if language_name not in self.parsers:
-            lang = None
-            
-            # 优先使用 tree-sitter-language-pack (兼容性更好)
-            if HAS_TSLP:
-                try:
-                    lang = tslp.get_language(language_name)
-                except Exception:
-                    pass
-            
-            # 如果失败，尝试使用 tree-sitter-languages
-            if lang is None and HAS_TS_LANGS:
-                try:
-                    lang = tree_sitter_languages.get_language(language_name)
-                except Exception:
-                    # 如果 tree-sitter-languages 报错 "__init__() takes exactly 1 argument (2 given)"
-                    # 这是因为它与新版 tree-sitter 0.22+ 不兼容
-                    pass
-            
-            if lang is None:
-                raise ValueError(f"Could not load tree-sitter language: {language_name}")
+        parsers = getattr(self._local, "parsers", None)
+        if parsers is None:
+            parsers = self._local.parsers = {}
+        parser = parsers.get(language_name)
+        if parser is None:
+            lang = get_language(language_name)
 
             # 兼容 tree-sitter 0.22+ 和旧版本
             try:
@@ -79,71 +166,100 @@ class TreeSitterParser:
                 # 旧版 API
                 parser = Parser()
                 parser.set_language(lang)
-                
-            self.parsers[language_name] = parser
-            
-        return self.parsers[language_name]
 
-    def parse_code(self, code: str, extension: str) -> List[CodeChunk]:
+            parsers[language_name] = parser
+
+        return parser
+
+    def parse_code(self, code: Union[str, bytes], extension: str) -> List[CodeChunk]:
+        """
+        code 可以是 str 或 UTF-8 bytes；传入 bytes 时直接交给 tree-sitter，省去整文件的解码与再编码。
+        节点的 start_byte/end_byte 是字节偏移，切片统一在 bytes 上进行后再解码，非 ASCII 源码也能切准。
+        """
         language_name = self.EXTENSION_TO_LANGUAGE.get(extension.lower())
         if not language_name:
             return []
 
+        src = code if isinstance(code, bytes) else code.encode("utf-8")
         parser = self.get_parser(language_name)
-        tree = parser.parse(bytes(code, "utf8"))
+        tree = parser.parse(src)
         
-        chunks = []
-        self._extract_chunks(tree.root_node, code, chunks, language_name)
+        chunks = list(self._extract_chunks(self._chunk_nodes(tree.root_node, language_name, parser), src))
         
         # 如果没有提取到任何块（例如文件太简单），则返回整个文件作为一个块
         if not chunks:
             chunks.append(CodeChunk(
-                content=code,
+                content=code if isinstance(code, str) else _decode(src),
                 start_line=1,
-                end_line=len(code.splitlines()),
+                end_line=src.count(b"\n") + (0 if not src or src.endswith(b"\n") else 1),
                 node_type="file"
             ))
             
         return chunks
 
-    def _extract_chunks(self, node: Node, code: str, chunks: List[CodeChunk], language_name: str):
+    def _chunk_query(self, language_name: str, parser: Parser):
+        if language_name in _chunk_query_cache:
+            return _chunk_query_cache[language_name]
+        query = None
+        language = getattr(parser, "language", None)
+        if language is not None:
+            try:
+                patterns = compilable_patterns(
+                    language,
+                    [f"({t}) @chunk" for t in sorted(_CHUNK_NODE_TYPES.get(language_name, _DEFAULT_CHUNK_NODE_TYPES))],
+                )
+                query = make_query(language, "\n".join(patterns)) if patterns else None
+            except Exception:
+                query = None
+        _chunk_query_cache[language_name] = query
+        return query
+
+    def _chunk_nodes(self, root: Node, language_name: str, parser: Parser) -> List[Node]:
         """
-        递归提取有意义的代码块（函数、类等）。
+        按源码顺序返回最外层的切片节点（命中节点内部不再细分）。
+        优先用 Query API 在 C 层一次匹配；不可用时用显式栈前序遍历，避免深层语法树触发递归上限。
         """
-        # 定义不同语言中有意义的节点类型
-        interesting_types = {
-            "python": ["function_definition", "class_definition"],
-            "javascript": ["function_declaration", "class_declaration", "method_definition", "arrow_function"],
-            "typescript": ["function_declaration", "class_declaration", "method_definition", "interface_declaration", "type_alias_declaration"],
-            "tsx": ["function_declaration", "class_declaration", "method_definition", "interface_declaration", "type_alias_declaration"],
-        }
-        
-        types = interesting_types.get(language_name, ["function_definition", "class_definition"])
-        
-        if node.type in types:
-            start_byte = node.start_byte
-            end_byte = node.end_byte
-            content = code[start_byte:end_byte]
-            
-            # 提取名称（如果存在）
-            name = None
-            for child in node.children:
-                if child.type == "identifier":
-                    name = code[child.start_byte:child.end_byte]
-                    break
-            
-            chunks.append(CodeChunk(
-                content=content,
+        query = self._chunk_query(language_name, parser)
+        if query is not None:
+            outermost: List[Node] = []
+            last_end = -1
+            for node in sorted(captured_nodes(query, root), key=lambda n: (n.start_byte, -n.end_byte)):
+                if node.start_byte < last_end:
+                    continue
+                outermost.append(node)
+                last_end = node.end_byte
+            return outermost
+
+        types = _CHUNK_NODE_TYPES.get(language_name, _DEFAULT_CHUNK_NODE_TYPES)
+        found: List[Node] = []
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if node.type in types:
+                found.append(node)
+                continue
+            stack.extend(reversed(node.children))
+        return found
+
+    def _extract_chunks(self, nodes: List[Node], src: bytes) -> Iterator[CodeChunk]:
+        """
+        把切片节点逐个转换为 CodeChunk。
+        对于类，我们可能还想继续细分其内部的方法，但为了避免碎片化，
+        这里的策略是：如果是一个大单元，我们就作为一个整体。目前只提取顶层定义。
+        """
+        for node in nodes:
+            # 通过 name 字段直接取名称节点；arrow_function 等匿名节点没有该字段，名称为 None
+            name_node = node.child_by_field_name("name")
+            name = _decode(src[name_node.start_byte:name_node.end_byte]) if name_node is not None else None
+
+            yield CodeChunk(
+                content=_decode(src[node.start_byte:node.end_byte]),
                 start_line=node.start_point[0] + 1,
                 end_line=node.end_point[0] + 1,
                 node_type=node.type,
                 name=name
-            ))
-            
-            # 对于类，我们可能还想继续递归处理其内部的方法，但为了避免碎片化，
-            # 这里的策略是：如果是一个大单元，我们就作为一个整体，或者可以根据长度决定是否细分。
-            # 目前先提取顶层定义。
-            return
+            )
+
 
-        for child in node.children:
-            self._extract_chunks(child, code, chunks, language_name)
+# 支持 AST 切片的扩展名集合，供遍历文件时提前过滤
+SUPPORTED_EXTENSIONS = frozenset(TreeSitterParser.EXTENSION_TO_LANGUAGE)
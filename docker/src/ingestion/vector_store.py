@@ -1,6 +1,12 @@
+import hashlib
 import logging
 import math
+import os
 import time
+from itertools import chain, islice
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
 from langchain_community.vectorstores import FAISS
 from langchain_core.documents import Document
 
@@ -8,69 +14,205 @@ from src.ingestion.embedding_utils import get_openrouter_embeddings
 
 logger = logging.getLogger("app.ingestion.vector_store")
 
-# 外层 FAISS 批次大小（每批送入 FAISS），降低以减轻 OpenRouter 压力
-EMBEDDING_BATCH_SIZE = 50
+# 每次调用 embed_documents 的文本条数；底层客户端再按 OpenRouterEmbeddings.INNER_BATCH_SIZE 拆分请求
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+
+
+# 向量数达到该阈值时，把精确 Flat 索引转换为 IVF 倒排索引（nlist ≈ sqrt(N)）
+IVF_MIN_VECTORS = int(os.getenv("FAISS_IVF_MIN_VECTORS", "100000"))
+
+# 向量量化：none / sq8（int8 标量量化）/ pq（乘积量化，nbits=8）
+INDEX_QUANTIZATION: str = os.getenv("FAISS_INDEX_QUANTIZATION", "none").strip().lower()
+QUANTIZE_MIN_VECTORS = int(os.getenv("FAISS_QUANTIZE_MIN_VECTORS", "20000"))
+
+# 量化后保留的 FP32 原始向量，供检索时过采样重排
+EXACT_VECTORS_FILENAME = "vectors.npy"
+
+
+def _pq_subquantizers(dim: int) -> int:
+    """选择能整除维度的最大子空间数（32/16/8）"""
+    for m in (32, 16, 8):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def _optimize_index(db: FAISS) -> Optional[np.ndarray]:
+    """
+    大语料下 Flat 暴力检索受内存带宽限制：
+    - 向量数达到 IVF_MIN_VECTORS 时转换为 IVF，只扫描少量倒排桶；
+    - 开启 INDEX_QUANTIZATION 且达到 QUANTIZE_MIN_VECTORS 时改用 SQ8/PQ 编码，减少每次扫描的字节数。
+    向量顺序与 index_to_docstore_id 保持一致，无需改动 docstore。
+    索引被量化时返回 FP32 原始向量（需另存用于重排），否则返回 None。
+    """
+    import faiss
+
+    index = db.index
+    ntotal = index.ntotal
+    if not isinstance(index, faiss.IndexFlat):
+        return None
+
+    use_ivf = ntotal >= IVF_MIN_VECTORS
+    quantization = INDEX_QUANTIZATION if ntotal >= QUANTIZE_MIN_VECTORS else "none"
+    if quantization not in ("sq8", "pq"):
+        quantization = "none"
+    if not use_ivf and quantization == "none":
+        return None
+
+    dim = index.d
+    metric = index.metric_type
+    nlist = max(1, int(math.sqrt(ntotal)))
+    logger.info(
+        "Optimizing flat index: ntotal=%d, ivf=%s (nlist=%d), quantization=%s",
+        ntotal, use_ivf, nlist, quantization,
+    )
+    t0 = time.monotonic()
+    vectors = index.reconstruct_n(0, ntotal)
+
+    if use_ivf:
+        quantizer = faiss.IndexFlat(dim, metric)
+        if quantization == "sq8":
+            optimized = faiss.IndexIVFScalarQuantizer(
+                quantizer, dim, nlist, faiss.ScalarQuantizer.QT_8bit, metric
+            )
+        elif quantization == "pq":
+            optimized = faiss.IndexIVFPQ(quantizer, dim, nlist, _pq_subquantizers(dim), 8, metric)
+        else:
+            optimized = faiss.IndexIVFFlat(quantizer, dim, nlist, metric)
+        optimized.nprobe = max(1, int(math.sqrt(ntotal) / 4))
+    elif quantization == "sq8":
+        optimized = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, metric)
+    else:
+        optimized = faiss.IndexPQ(dim, _pq_subquantizers(dim), 8, metric)
+
+    optimized.train(vectors)
+    optimized.add(vectors)
+    db.index = optimized
+    logger.info("Optimized index built in %.2fs", time.monotonic() - t0)
 
-# 两次外层批次之间的等待时间（秒），避免瞬间并发过高
-INTER_BATCH_SLEEP_SEC = 2.0
+    return vectors if quantization != "none" else None
 
 
-def _batch_iter(documents: list[Document], batch_size: int):
-    for start in range(0, len(documents), batch_size):
-        yield documents[start:start + batch_size]
+def _contextual_text(doc: Document) -> str:
+    """
+    生成用于 embedding 的文本：在切片前加上文件路径与所属章节/符号，
+    让孤立的代码片段或段落也带上结构上下文，提升召回。
+    仅影响向量本身，docstore 中仍保存原始切片内容。
+    """
+    meta = doc.metadata
+    section = meta.get("breadcrumb") or meta.get("section_heading")
+    if not section and meta.get("name"):
+        section = f"{meta.get('node_type', '')} {meta['name']}".strip()
+    header = f"# File: {meta.get('source', '')}\n"
+    if section:
+        header += f"# Section: {section}\n"
+    return f"{header}\n{doc.page_content}"
+
+
+def _dedupe_documents(docs: Iterable[Document], stats: Optional[list[int]] = None) -> Iterator[Document]:
+    """
+    去除完全重复的切片（保留首次出现），边迭代边产出。
+    去重键为带文件/章节前缀的上下文文本（即实际送去 embedding 的文本）：同一文件内重复的切片被合并，
+    不同文件中内容相同的切片各自保留，来源元数据与引用不会丢失。
+    stats 若提供，迭代结束后为 [输入条数, 保留条数]。
+    """
+    seen: set[bytes] = set()
+    total = kept = 0
+    for doc in docs:
+        total += 1
+        key = hashlib.blake2b(_contextual_text(doc).encode("utf-8"), digest_size=16).digest()
+        if key in seen:
+            continue
+        seen.add(key)
+        kept += 1
+        yield doc
+    if stats is not None:
+        stats[:] = [total, kept]
+
+
+def _batch_iter(documents: Iterable[Document], batch_size: int) -> Iterator[list[Document]]:
+    it = iter(documents)
+    while True:
+        batch = list(islice(it, batch_size))
+        if not batch:
+            return
+        yield batch
 
 
-def create_and_save_vector_store(docs: list[Document], db_path: str):
+def create_and_save_vector_store(
+    docs: Iterable[Document],
+    db_path: str,
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+):
     """
     使用文档块创建 FAISS 向量数据库并保存到本地。
+
+    docs 可以是列表或生成器：每攒够 batch_size 个（去重后的）切片就调用一次 embed_documents
+    （输入为带文件/章节前缀的上下文文本），上游切分与 embedding 网络往返交替进行；
+    全部向量就绪后再通过 FAISS.from_embeddings 一次性建库，避免逐批 add_documents 的重复开销。
     """
-    if not docs:
+    batch_size = max(1, batch_size)
+    dedup_stats: list[int] = []
+    batches = _batch_iter(_dedupe_documents(docs, dedup_stats), batch_size)
+    first_batch = next(batches, None)
+    if first_batch is None:
         logger.warning("No documents to process. Skipping vector store creation.")
         return
 
     logger.info("Initializing embeddings model (OpenRouter)...")
     embeddings = get_openrouter_embeddings()
+    logger.info("Creating vector store: batch_size=%d", batch_size)
 
-    total_docs = len(docs)
-    total_batches = math.ceil(total_docs / EMBEDDING_BATCH_SIZE)
-    logger.info(
-        "Creating vector store: total_docs=%d, outer_batch_size=%d, total_outer_batches=%d",
-        total_docs, EMBEDDING_BATCH_SIZE, total_batches,
-    )
-    db = None
-
-    for batch_index, batch_docs in enumerate(_batch_iter(docs, EMBEDDING_BATCH_SIZE), start=1):
+    kept_docs: list[Document] = []
+    texts: list[str] = []
+    vectors: list[list[float]] = []
+    for batch_index, batch_docs in enumerate(chain([first_batch], batches), start=1):
         logger.info(
-            ">>> Outer batch %d/%d | docs_in_batch=%d | total_embedded_so_far=%d",
-            batch_index, total_batches, len(batch_docs), (batch_index - 1) * EMBEDDING_BATCH_SIZE,
+            ">>> Embedding batch %d | docs_in_batch=%d | total_embedded_so_far=%d",
+            batch_index, len(batch_docs), len(vectors),
         )
+        batch_texts = [d.page_content for d in batch_docs]
         t0 = time.monotonic()
         try:
-            if db is None:
-                db = FAISS.from_documents(batch_docs, embeddings)
-            else:
-                db.add_documents(batch_docs)
-            elapsed = time.monotonic() - t0
-            logger.info(
-                "<<< Outer batch %d/%d completed in %.2fs",
-                batch_index, total_batches, elapsed,
-            )
+            batch_vectors = embeddings.embed_documents([_contextual_text(d) for d in batch_docs])
         except Exception as e:
-            elapsed = time.monotonic() - t0
             logger.error(
-                "!!! Outer batch %d/%d FAILED after %.2fs: %s",
-                batch_index, total_batches, elapsed, e,
+                "!!! Embedding batch %d FAILED after %.2fs: %s",
+                batch_index, time.monotonic() - t0, e,
             )
             raise
+        if len(batch_vectors) != len(batch_texts):
+            raise ValueError(
+                f"Embedding count mismatch in batch {batch_index}: "
+                f"expected {len(batch_texts)}, got {len(batch_vectors)}"
+            )
+        kept_docs.extend(batch_docs)
+        texts.extend(batch_texts)
+        vectors.extend(batch_vectors)
+        logger.info(
+            "<<< Embedding batch %d completed in %.2fs",
+            batch_index, time.monotonic() - t0,
+        )
 
-        if batch_index < total_batches:
-            logger.debug("Sleeping %.1fs before next outer batch...", INTER_BATCH_SLEEP_SEC)
-            time.sleep(INTER_BATCH_SLEEP_SEC)
+    logger.info("[RAG] dedup: %d -> %d chunks", dedup_stats[0], dedup_stats[1])
 
-    if db is None:
-        logger.warning("No documents were processed. Skipping save step.")
-        return
+    ids = [getattr(d, "id", None) for d in kept_docs]
+    db = FAISS.from_embeddings(
+        list(zip(texts, vectors)),
+        embeddings,
+        metadatas=[d.metadata for d in kept_docs],
+        ids=ids if all(ids) else None,
+    )
+
+    exact_vectors = _optimize_index(db)
 
     logger.info("Saving vector store to: %s", db_path)
     db.save_local(db_path)
+    exact_path = os.path.join(db_path, EXACT_VECTORS_FILENAME)
+    if exact_vectors is not None:
+        np.save(exact_path, exact_vectors)
+        logger.info("Saved FP32 vectors for reranking: %s", exact_path)
+    elif os.path.exists(exact_path):
+        # 重建为未量化索引时清理旧的旁路文件，避免与新索引错位
+        os.remove(exact_path)
     logger.info("Vector store created and saved successfully.")
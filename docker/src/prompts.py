@@ -1,8 +1,29 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Dict, List, Any
-import json
+from dataclasses import dataclass, field
+from functools import lru_cache
+from string import Formatter
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Dict, List, Any, Mapping, Optional, Tuple
+
+if TYPE_CHECKING:
+    from langchain_core.prompts import ChatPromptTemplate
+
+# langchain_core.prompts / messages 在首次构建模板时才导入：
+# 只用 format_messages 或常量的模块（struct_gen、rag_tool、agent.prompts 等）不必承担其导入开销
+_ChatPromptTemplate = None
+_SystemMessage = None
+_HumanMessage = None
+
+
+def _load_langchain_prompts() -> None:
+    global _ChatPromptTemplate, _SystemMessage, _HumanMessage
+    if _ChatPromptTemplate is None:
+        from langchain_core.messages import HumanMessage, SystemMessage
+        from langchain_core.prompts import ChatPromptTemplate
+
+        _SystemMessage, _HumanMessage = SystemMessage, HumanMessage
+        _ChatPromptTemplate = ChatPromptTemplate
 
 # All LLM-facing product outputs (RAG, wiki, HyDE, structure) are fixed to English.
 OUTPUT_LANGUAGE_EN = """
@@ -11,19 +32,78 @@ OUTPUT_LANGUAGE_EN = """
 - If the user writes in another language, **still respond in English**; keep code identifiers and string literals exactly as in the source.
 """
 
+# 预解析后的模板：(字面量, 占位符名) 序列，最后一段的占位符名为 None
+TemplateParts = Tuple[Tuple[str, Optional[str]], ...]
+
+
+def _compile_template(template: str) -> Optional[TemplateParts]:
+    """
+    用 string.Formatter 预先解析模板，拆成字面量与占位符片段（{{ }} 转义已还原）。
+    含格式说明、转换符、属性/下标访问或位置参数的占位符返回 None，由 str.format 处理。
+    """
+
+    parts = []
+    for literal, field_name, format_spec, conversion in Formatter().parse(template):
+        if field_name is not None and (
+            not field_name.isidentifier() or format_spec or conversion
+        ):
+            return None
+        parts.append((literal, field_name))
+    return tuple(parts)
+
+
+def _literal_text(parts: Optional[TemplateParts]) -> Optional[str]:
+    """模板不含任何占位符时返回其（已还原转义的）文本，否则返回 None。"""
+
+    if parts is None or any(field_name is not None for _, field_name in parts):
+        return None
+    return "".join(literal for literal, _ in parts)
+
+
+def _render_template(template: str, parts: Optional[TemplateParts], kwargs: Dict[str, Any]) -> str:
+    """按预解析片段拼接模板，结果与 template.format(**kwargs) 一致。"""
+
+    if parts is None:
+        return template.format(**kwargs)
+    return "".join(
+        literal if field_name is None else literal + format(kwargs[field_name])
+        for literal, field_name in parts
+    )
+
+
 @dataclass(frozen=True)
 class PromptDefinition:
 
     name: str
     system: str
     human: str
-
-    def build(self):
-        from langchain_core.prompts import ChatPromptTemplate
-        return ChatPromptTemplate.from_messages(
+    # 去除首尾空白后的模板文本，构造时计算一次，避免每次格式化都重新扫描整段字符串
+    system_stripped: str = field(init=False, repr=False, compare=False)
+    human_stripped: str = field(init=False, repr=False, compare=False)
+    # 预解析的模板片段，format_messages 只做拼接，不再逐次解析占位符
+    system_parts: Optional[TemplateParts] = field(init=False, repr=False, compare=False)
+    human_parts: Optional[TemplateParts] = field(init=False, repr=False, compare=False)
+    # 无占位符时为渲染后的常量文本（否则为 None），格式化与构建模板时直接复用
+    system_literal: Optional[str] = field(init=False, repr=False, compare=False)
+    human_literal: Optional[str] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "system_stripped", self.system.strip())
+        object.__setattr__(self, "human_stripped", self.human.strip())
+        object.__setattr__(self, "system_parts", _compile_template(self.system_stripped))
+        object.__setattr__(self, "human_parts", _compile_template(self.human_stripped))
+        object.__setattr__(self, "system_literal", _literal_text(self.system_parts))
+        object.__setattr__(self, "human_literal", _literal_text(self.human_parts))
+
+    def build(self) -> ChatPromptTemplate:
+        _load_langchain_prompts()
+        # 无占位符的部分直接作为具体消息传入，LangChain 不再为其解析 f-string 模板
+        system_text = self.system_literal
+        human_text = self.human_literal
+        return _ChatPromptTemplate.from_messages(
             [
-                ("system", self.system.strip()),
-                ("human", self.human.strip()),
+                _SystemMessage(content=system_text) if system_text is not None else ("system", self.system_stripped),
+                _HumanMessage(content=human_text) if human_text is not None else ("human", self.human_stripped),
             ]
         )
 
@@ -32,13 +112,16 @@ class PromptDefinition:
         格式化提示词为模型调用的消息列表。
         """
 
-        # TODO 保存在本地，用于测试文件路径错误的问题（已修复）
-        with open("structure_prompt.json", "w", encoding="utf-8") as f:
-            json.dump(kwargs, f, indent=2, ensure_ascii=False)
+        system_text = self.system_literal
+        if system_text is None:
+            system_text = _render_template(self.system_stripped, self.system_parts, kwargs)
+        human_text = self.human_literal
+        if human_text is None:
+            human_text = _render_template(self.human_stripped, self.human_parts, kwargs)
 
         return [
-            {"role": "system", "content": self.system.strip().format(**kwargs)},
-            {"role": "user", "content": self.human.strip().format(**kwargs)},
+            {"role": "system", "content": system_text},
+            {"role": "user", "content": human_text},
         ]
 
 
@@ -324,13 +407,32 @@ Return only the JSON string, with no extra commentary.
 """,
 )
 
-PROMPT_REGISTRY: Dict[str, PromptDefinition] = {
+@lru_cache(maxsize=None)
+def _build_cached(definition: PromptDefinition) -> ChatPromptTemplate:
+    """
+    每个 PromptDefinition 只构建一次 ChatPromptTemplate（frozen dataclass 可直接作为缓存键）。
+    返回的模板为共享对象，调用方只应调用 format_messages / invoke 等只读方法。
+    """
+
+    return definition.build()
+
+
+# 只读注册表：运行期不允许增删提示词，缓存的模板与名称一一对应
+PROMPT_REGISTRY: Mapping[str, PromptDefinition] = MappingProxyType({
     STRUCTURE_PROMPT.name: STRUCTURE_PROMPT,
     RAG_CHAT_PROMPT.name: RAG_CHAT_PROMPT,
     WIKI_SECTION_PROMPT.name: WIKI_SECTION_PROMPT,
     HYDE_PROMPT.name: HYDE_PROMPT,
     RAG_CHAT_WITH_HISTORY_PROMPT.name: RAG_CHAT_WITH_HISTORY_PROMPT,
-}
+})
+
+
+def get_prompt(name: str) -> ChatPromptTemplate:
+    """
+    按名称获取提示词模板（首次访问时构建并缓存）；名称不存在时抛出 KeyError。
+    """
+
+    return _build_cached(PROMPT_REGISTRY[name])
 
 
 def get_structure_prompt() -> ChatPromptTemplate:
@@ -338,7 +440,7 @@ def get_structure_prompt() -> ChatPromptTemplate:
     获取多层级 wiki 目录生成提示词。
     """
 
-    return STRUCTURE_PROMPT.build()
+    return get_prompt(STRUCTURE_PROMPT.name)
 
 
 def get_rag_chat_prompt() -> ChatPromptTemplate:
@@ -346,7 +448,7 @@ def get_rag_chat_prompt() -> ChatPromptTemplate:
     获取用于 RAG 问答的提示词模板。
     """
 
-    return RAG_CHAT_PROMPT.build()
+    return get_prompt(RAG_CHAT_PROMPT.name)
 
 
 def get_wiki_section_prompt() -> ChatPromptTemplate:
@@ -354,7 +456,7 @@ def get_wiki_section_prompt() -> ChatPromptTemplate:
     获取用于 wiki 章节内容生成的提示词模板。
     """
 
-    return WIKI_SECTION_PROMPT.build()
+    return get_prompt(WIKI_SECTION_PROMPT.name)
 
 
 def get_hyde_prompt() -> ChatPromptTemplate:
@@ -362,7 +464,7 @@ def get_hyde_prompt() -> ChatPromptTemplate:
     获取用于 HyDE 假设文档生成的提示词模板。
     """
 
-    return HYDE_PROMPT.build()
+    return get_prompt(HYDE_PROMPT.name)
 
 
 def get_rag_chat_with_history_prompt() -> ChatPromptTemplate:
@@ -370,7 +472,7 @@ def get_rag_chat_with_history_prompt() -> ChatPromptTemplate:
     获取用于带对话历史的 RAG 问答的提示词模板。
     """
 
-    return RAG_CHAT_WITH_HISTORY_PROMPT.build()
+    return get_prompt(RAG_CHAT_WITH_HISTORY_PROMPT.name)
 
 
 __all__ = [
@@ -382,6 +484,7 @@ __all__ = [
     "HYDE_PROMPT",
     "RAG_CHAT_WITH_HISTORY_PROMPT",
     "PROMPT_REGISTRY",
+    "get_prompt",
     "get_structure_prompt",
     "get_rag_chat_prompt",
     "get_wiki_section_prompt",
@@ -2,6 +2,7 @@
 
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 from typing import Optional, List, Tuple
@@ -11,9 +12,12 @@ import boto3
 from botocore.exceptions import ClientError, BotoCoreError
 from botocore.config import Config
 
-import dotenv
+from src.utils.env import load_env
 
-dotenv.load_dotenv()
+load_env()
+
+# Maximum number of concurrent PUTs when uploading a directory
+UPLOAD_CONCURRENCY = int(os.getenv("R2_UPLOAD_CONCURRENCY", "32"))
 
 
 class R2Client:
@@ -61,6 +65,8 @@ class R2Client:
             config=Config(
                 signature_version="s3v4",
                 retries={"max_attempts": 3, "mode": "standard"},
+                # Allow one pooled connection per concurrent upload worker
+                max_pool_connections=max(10, UPLOAD_CONCURRENCY),
             ),
         )
 
@@ -136,11 +142,12 @@ class R2Client:
 
         for attempt in range(max_retries):
             try:
+                # Stream the file handle instead of buffering the whole file in memory
                 with open(local_path, "rb") as f:
                     self.s3_client.put_object(
                         Bucket=self.bucket_name,
                         Key=r2_key,
-                        Body=f.read(),
+                        Body=f,
                         ContentType=content_type,
                     )
                 print(f"[INFO] Successfully uploaded: {r2_key}")
@@ -274,14 +281,22 @@ class R2Client:
             print(f"[WARN] Directory not found: {local_dir}")
             return results
 
+        jobs = []
         for file_path in local_dir.glob(pattern):
             if file_path.is_file():
                 # Preserve filename in R2 path
                 filename = file_path.name
                 r2_key = f"{r2_base_path}/{filename}" if r2_base_path else filename
-                success = self.upload_file(file_path, r2_key)
-                results.append((r2_key, success))
+                jobs.append((file_path, r2_key))
+        if not jobs:
+            return results
+
+        # boto3 clients are thread-safe; issue the PUTs concurrently over the shared pool
+        workers = max(1, min(UPLOAD_CONCURRENCY, len(jobs)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            successes = list(executor.map(lambda job: self.upload_file(*job), jobs))
 
+        results.extend((r2_key, success) for (_, r2_key), success in zip(jobs, successes))
         return results
 
 
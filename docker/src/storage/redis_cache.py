@@ -0,0 +1,289 @@
+"""
+Redis 热缓存（可选）。
+
+设置 ``REDIS_URL`` 且安装了 ``redis`` 包时启用；否则所有操作均为空操作，
+调用方照常回退到 Supabase。Supabase 仍是唯一真实来源，Redis 只用于：
+
+- 让多个 API worker 共享任务状态，把 /task/{id} 轮询降为一次 HGETALL；
+- 缓存仓库 → 向量库路径映射及短期问答结果，减少 /chat 的数据库往返。
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson 缺失时退回标准库
+    orjson = None
+    import json
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - redis 为可选依赖
+    redis = None
+
+logger = logging.getLogger("app.storage.redis_cache")
+
+REDIS_URL = os.getenv("REDIS_URL", "").strip()
+
+TASK_KEY_PREFIX = "task:"
+# 进行中的任务：写入整行或更新 status 时设置该 TTL（进度更新不续期），worker 崩溃后的残留记录最终会过期
+TASK_ACTIVE_TTL_SEC = 3600
+# 终态（completed/cached/failed）保留一天，之后轮询回落到 Supabase
+TASK_FINAL_TTL_SEC = 86400
+TERMINAL_TASK_STATUSES = frozenset({"completed", "cached", "failed"})
+# 删除任务时留下的墓碑：覆盖 get_task「读 Supabase → 回填 Redis」之间的窗口，
+# 防止删除前读到的旧行在删除后被回填
+TASK_TOMBSTONE_PREFIX = "task:deleted:"
+TASK_TOMBSTONE_TTL_SEC = 60
+
+# 键存在时才写入字段；ARGV[1] 为 TTL（0 表示不改动过期时间），其余为 field/value 交替排列。
+# 判断与写入在同一脚本内原子完成，避免与 delete 交错后重建出残缺的任务 hash。
+_UPDATE_IF_EXISTS_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HSET', KEYS[1], unpack(ARGV, 2))
+local ttl = tonumber(ARGV[1])
+if ttl > 0 then
+    redis.call('EXPIRE', KEYS[1], ttl)
+end
+return 1
+"""
+
+# 写入整行；KEYS[2] 为墓碑，存在时说明任务已被删除，拒绝回填。ARGV[1] 为 TTL，其余为 field/value。
+_PUT_UNLESS_DELETED_LUA = """
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    return 0
+end
+redis.call('HSET', KEYS[1], unpack(ARGV, 2))
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[1]))
+return 1
+"""
+
+_redis_client = None
+_redis_lock = threading.Lock()
+_redis_disabled = False
+
+
+def get_redis_client():
+    """返回进程内共享的 Redis 客户端；未配置或连接失败时返回 None。"""
+    global _redis_client, _redis_disabled
+    if _redis_client is not None or _redis_disabled:
+        return _redis_client
+    with _redis_lock:
+        if _redis_client is not None or _redis_disabled:
+            return _redis_client
+        if not REDIS_URL or redis is None:
+            _redis_disabled = True
+            return None
+        try:
+            client = redis.Redis.from_url(REDIS_URL, decode_responses=False)
+            client.ping()
+        except Exception as e:
+            logger.warning("Redis 不可用，任务状态将直接读取 Supabase: %s", e)
+            _redis_disabled = True
+            return None
+        _redis_client = client
+        logger.info("已连接 Redis 热缓存")
+        return _redis_client
+
+
+def dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+
+def loads(raw: Any) -> Any:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _format_timestamp(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
+
+
+class TaskCache:
+    """
+    任务记录的 Redis 镜像：每个任务一个 hash ``task:{task_id}``，字段值统一 JSON 编码，
+    ``result`` 作为单个字段整体序列化。所有方法在 Redis 不可用时静默降级。
+    """
+
+    def __init__(self) -> None:
+        self._update_script = None
+        self._put_script = None
+
+    def _key(self, task_id: str) -> str:
+        return f"{TASK_KEY_PREFIX}{task_id}"
+
+    def _tombstone_key(self, task_id: str) -> str:
+        return f"{TASK_TOMBSTONE_PREFIX}{task_id}"
+
+    def _ttl_for(self, status: Optional[str]) -> int:
+        if status in TERMINAL_TASK_STATUSES:
+            return TASK_FINAL_TTL_SEC
+        return TASK_ACTIVE_TTL_SEC
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        client = get_redis_client()
+        if client is None:
+            return None
+        try:
+            raw = client.hgetall(self._key(task_id))
+        except Exception as e:
+            logger.debug("Redis HGETALL 失败: %s", e)
+            return None
+        if not raw:
+            return None
+        try:
+            row = {k.decode("utf-8"): loads(v) for k, v in raw.items()}
+        except Exception:
+            return None
+        # 写入时只存 epoch 秒，读取时才格式化为与 Supabase 一致的 ISO-8601 字符串
+        last_updated = row.get("last_updated")
+        if isinstance(last_updated, (int, float)):
+            row["last_updated"] = _format_timestamp(last_updated)
+        return row
+
+    def put(self, row: Dict[str, Any]) -> None:
+        """
+        写入完整任务行（通常来自 Supabase 的读结果或新建记录）。
+        任务刚被删除（墓碑仍在）时不写入，避免删除前读到的行被回填后继续对外可见。
+        """
+        task_id = row.get("task_id")
+        client = get_redis_client()
+        if client is None or not task_id:
+            return
+        args: List[Any] = [self._ttl_for(row.get("status"))]
+        for field_name, value in row.items():
+            args.extend((field_name, dumps(value)))
+        try:
+            if self._put_script is None:
+                self._put_script = client.register_script(_PUT_UNLESS_DELETED_LUA)
+            self._put_script(
+                keys=[self._key(task_id), self._tombstone_key(task_id)], args=args, client=client
+            )
+        except Exception as e:
+            logger.debug("Redis 写入任务失败: %s", e)
+
+    def update(self, task_id: str, fields: Dict[str, Any]) -> None:
+        """
+        局部更新已缓存的任务。键不存在时不写入，避免产生缺字段的残缺记录；
+        下一次读取会从 Supabase 回填完整行。只有写入 status 时才按新状态重设 TTL，
+        进度更新不会把终态记录的过期时间改回进行中的 TTL。
+        """
+        client = get_redis_client()
+        if client is None or not task_id:
+            return
+        mapping = {k: dumps(v) for k, v in fields.items()}
+        mapping["last_updated"] = dumps(time.time())
+        ttl = self._ttl_for(fields["status"]) if "status" in fields else 0
+        args: List[Any] = [ttl]
+        for field_name, value in mapping.items():
+            args.extend((field_name, value))
+        try:
+            if self._update_script is None:
+                self._update_script = client.register_script(_UPDATE_IF_EXISTS_LUA)
+            self._update_script(keys=[self._key(task_id)], args=args, client=client)
+        except Exception as e:
+            logger.debug("Redis 更新任务失败: %s", e)
+
+    def delete(self, task_ids: Iterable[str]) -> None:
+        client = get_redis_client()
+        ids = [t for t in task_ids if t]
+        if client is None or not ids:
+            return
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.delete(*[self._key(t) for t in ids])
+            for task_id in ids:
+                pipe.set(self._tombstone_key(task_id), b"1", ex=TASK_TOMBSTONE_TTL_SEC)
+            pipe.execute()
+        except Exception as e:
+            logger.debug("Redis 删除任务失败: %s", e)
+
+
+task_cache = TaskCache()
+
+
+REPO_VECTOR_PATH_TTL_SEC = 3600
+CHAT_ANSWER_TTL_SEC = 300
+
+
+def _sha256(*parts: str) -> str:
+    h = hashlib.sha256()
+    for part in parts:
+        h.update((part or "").encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class RepoVectorPathCache:
+    """``repo:vs:{sha256(repo_url)}`` → 向量库路径，省去 /chat 每次查询 repositories 表。"""
+
+    def _key(self, repo_url: str) -> str:
+        return f"repo:vs:{_sha256(repo_url)}"
+
+    def get(self, repo_url: str) -> Optional[str]:
+        client = get_redis_client()
+        if client is None or not repo_url:
+            return None
+        try:
+            raw = client.get(self._key(repo_url))
+        except Exception as e:
+            logger.debug("Redis GET 向量库路径失败: %s", e)
+            return None
+        return raw.decode("utf-8") if raw else None
+
+    def set(self, repo_url: str, vector_store_path: str) -> None:
+        client = get_redis_client()
+        if client is None or not repo_url or not vector_store_path:
+            return
+        try:
+            client.set(self._key(repo_url), vector_store_path, ex=REPO_VECTOR_PATH_TTL_SEC)
+        except Exception as e:
+            logger.debug("Redis SET 向量库路径失败: %s", e)
+
+
+class ChatAnswerCache:
+    """
+    无对话历史的问答结果短期缓存：``chat:ans:{sha256(repo_url, question, page_ctx)}``。
+    TTL 较短，索引重建后最多在 TTL 内返回旧答案。
+    """
+
+    def _key(self, repo_url: str, question: str, page_context: Optional[str]) -> str:
+        return f"chat:ans:{_sha256(repo_url, question, page_context or '')}"
+
+    def get(self, repo_url: str, question: str, page_context: Optional[str]) -> Optional[Dict[str, Any]]:
+        client = get_redis_client()
+        if client is None:
+            return None
+        try:
+            raw = client.get(self._key(repo_url, question, page_context))
+            return loads(raw) if raw else None
+        except Exception as e:
+            logger.debug("Redis 读取答案缓存失败: %s", e)
+            return None
+
+    def set(self, repo_url: str, question: str, page_context: Optional[str], answer: Dict[str, Any]) -> None:
+        client = get_redis_client()
+        if client is None:
+            return
+        try:
+            client.set(
+                self._key(repo_url, question, page_context),
+                dumps(answer),
+                ex=CHAT_ANSWER_TTL_SEC,
+            )
+        except Exception as e:
+            logger.debug("Redis 写入答案缓存失败: %s", e)
+
+
+repo_vector_path_cache = RepoVectorPathCache()
+chat_answer_cache = ChatAnswerCache()
@@ -1,15 +1,56 @@
+import importlib.util
+import logging
 import os
-from typing import Dict, List, Optional
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
 from urllib.parse import urlsplit
 from supabase import create_client, Client
-import dotenv
 
+from src.storage.redis_cache import repo_vector_path_cache, task_cache
+from src.utils.env import load_env
 from src.utils.wiki_cache_policy import (
     WIKI_GENERATION_CACHE_MAX_AGE_DAYS,
     wiki_generation_cache_is_stale,
 )
 
-dotenv.load_dotenv()
+load_env()
+
+logger = logging.getLogger("app.storage.supabase_client")
+
+POSTGREST_TIMEOUT_SEC = int(os.getenv("SUPABASE_POSTGREST_TIMEOUT", "10"))
+# chat_messages 返回给前端的列；metadata（来源、轨迹等）体积较大，可按需省略
+CHAT_MESSAGE_BASE_COLUMNS = "id,chat_id,role,content,created_at"
+CHAT_MESSAGE_COLUMNS = CHAT_MESSAGE_BASE_COLUMNS + ",metadata"
+# get_repo_information 进程内缓存时长；本进程写 repositories 时立即失效，其他 worker 的写入最多延迟该时长可见
+REPO_INFO_CACHE_TTL_SEC = float(os.getenv("SUPABASE_REPO_INFO_CACHE_TTL", "30"))
+
+
+def _client_options():
+    """
+    构造共享连接池的 ClientOptions：PostgREST 请求复用同一个 httpx.Client
+    （keep-alive 连接池，安装了 h2 时启用 HTTP/2 多路复用），省去每次请求的 TCP/TLS 握手。
+    旧版 supabase-py 不支持 httpx_client 参数时只设置超时。
+    """
+    try:
+        from supabase.lib.client_options import SyncClientOptions as ClientOptions
+    except ImportError:
+        from supabase.lib.client_options import ClientOptions
+
+    import httpx
+
+    # 传入 transport 时 httpx.Client 会忽略自身的 http2/limits 参数，因此都配置在 transport 上
+    transport = httpx.HTTPTransport(
+        http2=importlib.util.find_spec("h2") is not None,
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=40),
+        retries=3,
+    )
+    http_client = httpx.Client(transport=transport, timeout=POSTGREST_TIMEOUT_SEC)
+    try:
+        return ClientOptions(postgrest_client_timeout=POSTGREST_TIMEOUT_SEC, httpx_client=http_client)
+    except TypeError:
+        http_client.close()
+    return ClientOptions(postgrest_client_timeout=POSTGREST_TIMEOUT_SEC)
 
 
 class SupabaseStorageError(Exception):
@@ -26,10 +67,13 @@ class SupabaseClient:
         self.key = supabase_key or os.getenv("SUPABASE_KEY")
 
         if not self.url or not self.key:
-            print("[Supabase] Warning: SUPABASE_URL or SUPABASE_KEY not set.")
+            logger.warning("SUPABASE_URL or SUPABASE_KEY not set.")
             self.client = None
         else:
-            self.client = create_client(self.url, self.key)
+            self.client = create_client(self.url, self.key, options=_client_options())
+
+        self._repo_info_cache: Dict[str, Tuple[float, dict]] = {}
+        self._repo_info_lock = threading.Lock()
 
     def _normalize_repo_url(self, repo_url: str) -> str:
         """
@@ -88,23 +132,27 @@ class SupabaseClient:
         Update or insert the vector_store_path for a repository in Supabase using upsert.
         """
         if not self.client:
-            print("[Supabase] Client not initialized. Skipping update.")
+            logger.debug("Client not initialized. Skipping update.")
             return False
 
         repo_url = self._normalize_repo_url(repo_url)
         try:
-            # Use upsert to either update an existing record or insert a new one
-            # The 'repo_url' is the primary key, so upsert will use it to match
-            self.client.table("repositories").upsert({
-                "repo_url": repo_url,
-                "vector_store_path": vector_store_path,
-                "last_updated": "now()"
-            }).execute()
+            # 单条 upsert 完成「存在则更新、否则插入」，无需先 SELECT；冲突目标显式指定为 repo_url
+            self.client.table("repositories").upsert(
+                {
+                    "repo_url": repo_url,
+                    "vector_store_path": vector_store_path,
+                    "last_updated": "now()"
+                },
+                on_conflict="repo_url",
+            ).execute()
             
-            print(f"[Supabase] Upserted repository record (vector path) for {repo_url}")
+            self._invalidate_repo_information(repo_url)
+            logger.info("Upserted repository record (vector path) for %s", repo_url)
+            repo_vector_path_cache.set(repo_url, vector_store_path)
             return True
         except Exception as e:
-            print(f"[Supabase] Error updating repository (upsert): {e}")
+            logger.error("Error updating repository (upsert): %s", e)
             return False
 
     def create_task(self, user_id: str, task_id: str, repo_url: str):
@@ -112,12 +160,12 @@ class SupabaseClient:
         Create a new task in Supabase.
         """
         if not self.client:
-            print("[Supabase] Client not initialized. Skipping create task.")
+            logger.debug("Client not initialized. Skipping create task.")
             return False
 
         repo_url = self._normalize_repo_url(repo_url)
         try:
-            self.client.table("tasks").insert({
+            response = self.client.table("tasks").insert({
                 "user_id": user_id,
                 "task_id": task_id,
                 "repo_url": repo_url,
@@ -127,10 +175,12 @@ class SupabaseClient:
                 "created_at": "now()",
                 "last_updated": "now()"
             }).execute()
-            print(f"[Supabase] Created new task record for {task_id}")
+            logger.info("Created new task record for %s", task_id)
+            if response.data:
+                task_cache.put(response.data[0])
             return True
         except Exception as e:
-            print(f"[Supabase] Error creating task: {e}")
+            logger.error("Error creating task: %s", e)
             return False
 
     def update_task_progress(self, task_id: str, progress: float, current_step: str):
@@ -149,10 +199,11 @@ class SupabaseClient:
             # If no data returned, it means no rows were updated (task likely deleted)
             if not response.data:
                 return False
-                
+
+            task_cache.update(task_id, {"progress": progress, "current_step": current_step})
             return True
         except Exception as e:
-            print(f"[Supabase] Error updating task progress: {e}")
+            logger.error("Error updating task progress: %s", e)
             return False
 
     def update_task_status(self, task_id: str, status: str, result: Optional[dict] = None, error: Optional[str] = None):
@@ -178,9 +229,10 @@ class SupabaseClient:
             if not response.data:
                 return False
 
+            task_cache.update(task_id, {k: v for k, v in update_data.items() if k != "last_updated"})
             return True
         except Exception as e:
-            print(f"[Supabase] Error updating task status: {e}")
+            logger.error("Error updating task status: %s", e)
             return False
 
     def delete_task(self, task_id: str, user_id: str):
@@ -191,52 +243,62 @@ class SupabaseClient:
         if not self.client:
             return False
         try:
-            task = (
+            # DELETE 默认返回被删除的行：无行即任务不存在或不属于该用户，无需先 SELECT
+            deleted = (
                 self.client.table("tasks")
-                .select("task_id, user_id, status")
+                .delete()
                 .eq("task_id", task_id)
                 .eq("user_id", user_id)
-                .limit(1)
                 .execute()
             )
-            if not task.data or len(task.data) == 0:
+            if not deleted.data:
                 return False
 
-            self.client.table("tasks").delete().eq("task_id", task_id).eq("user_id", user_id).execute()
+            task_cache.delete([task_id])
             return True
         except Exception as e:
-            print(f"[Supabase] Error deleting task: {e}")
+            logger.error("Error deleting task: %s", e)
             return False
 
     def get_task(self, task_id: str):
         """
         Get a task from Supabase.
         成功且无行时返回 None；客户端未配置或查询异常时抛出 SupabaseStorageError。
+        配置了 Redis 时优先读取热缓存，未命中再查询 Supabase 并回填。
         """
+        cached = task_cache.get(task_id)
+        if cached is not None:
+            return cached
+
         if not self.client:
             raise SupabaseStorageError("Supabase client is not configured")
 
         try:
             response = self.client.table("tasks").select("*").eq("task_id", task_id).execute()
             if response.data:
+                task_cache.put(response.data[0])
                 return response.data[0]
             return None
         except Exception as e:
             raise SupabaseStorageError(f"Failed to fetch task: {e}") from e
 
-    def get_all_tasks(self, user_id: str):
+    def get_all_tasks(self, user_id: str, limit: Optional[int] = None, offset: int = 0):
         """
         Get all tasks from Supabase.
+        传入 limit 时按创建时间倒序分页返回 [offset, offset + limit) 区间。
         """
         if not self.client:
-            print("[Supabase] Client not initialized. Skipping get all tasks.")
+            logger.debug("Client not initialized. Skipping get all tasks.")
             return None
 
         try:
-            response = self.client.table("tasks").select("*").eq("user_id", user_id).execute()
+            query = self.client.table("tasks").select("*").eq("user_id", user_id)
+            if limit is not None:
+                query = query.order("created_at", desc=True).range(offset, offset + limit - 1)
+            response = query.execute()
             return response.data
         except Exception as e:
-            print(f"[Supabase] Error getting all tasks: {e}")
+            logger.error("Error getting all tasks: %s", e)
             return None
 
     def get_all_available_repos(self) -> List[dict]:
@@ -253,10 +315,13 @@ class SupabaseClient:
         except Exception as e:
             raise SupabaseStorageError(f"Failed to fetch repositories: {e}") from e
 
-    def get_repositories_for_urls(self, repo_urls: List[str]) -> Dict[str, Optional[dict]]:
+    def get_repositories_for_urls(
+        self, repo_urls: List[str], columns: str = "*"
+    ) -> Dict[str, Optional[dict]]:
         """
         批量拉取 repositories 行，key 为调用方传入 URL 经 normalize 后的字符串。
         缺失时回退到 get_repo_information（含模糊匹配），避免 N+1 全走模糊查询。
+        columns 限定批量查询返回的列（须包含 repo_url）；回退路径返回完整行。
         """
         if not self.client:
             return {}
@@ -274,7 +339,7 @@ class SupabaseClient:
         try:
             resp = (
                 self.client.table("repositories")
-                .select("*")
+                .select(columns)
                 .in_("repo_url", ordered_unique)
                 .execute()
             )
@@ -283,7 +348,7 @@ class SupabaseClient:
                 if rk:
                     by_key[rk] = row
         except Exception as e:
-            print(f"[Supabase] Error batch-fetch repositories: {e}")
+            logger.error("Error batch-fetch repositories: %s", e)
 
         for k in ordered_unique:
             if k in by_key:
@@ -294,15 +359,32 @@ class SupabaseClient:
 
         return {k: by_key.get(k) for k in ordered_unique}
 
+    def _invalidate_repo_information(self, repo_url: str) -> None:
+        with self._repo_info_lock:
+            self._repo_info_cache.pop(repo_url, None)
+
     def get_repo_information(self, repo_url: str):
         """
         Get a repo information from Supabase.
+        Rows found are cached in-process for REPO_INFO_CACHE_TTL_SEC; misses are not cached.
         """
         if not self.client:
-            print("[Supabase] Client not initialized. Skipping get repo information.")
+            logger.debug("Client not initialized. Skipping get repo information.")
             return None
         
         repo_url = self._normalize_repo_url(repo_url)
+        with self._repo_info_lock:
+            cached = self._repo_info_cache.get(repo_url)
+        if cached is not None and time.monotonic() - cached[0] < REPO_INFO_CACHE_TTL_SEC:
+            return dict(cached[1])
+
+        row = self._fetch_repo_information(repo_url)
+        if row:
+            with self._repo_info_lock:
+                self._repo_info_cache[repo_url] = (time.monotonic(), dict(row))
+        return row
+
+    def _fetch_repo_information(self, repo_url: str):
         try:
             response = self.client.table("repositories").select("*").eq("repo_url", repo_url).execute()
             if response.data:
@@ -324,7 +406,7 @@ class SupabaseClient:
 
             return None
         except Exception as e:
-            print(f"[Supabase] Error getting repo information: {e}")
+            logger.error("Error getting repo information: %s", e)
             return None
 
     def _repository_wiki_cache_ttl_fresh_db(
@@ -358,13 +440,19 @@ class SupabaseClient:
                 return bool(row0)
             return bool(data)
         except Exception as e:
-            print(
-                "[Supabase] repository_wiki_cache_ttl_fresh RPC 不可用或未执行 "
-                f"supabase_migrations 中的 SQL，回退为仅基于表字段 last_updated + 应用 UTC：{e}"
+            logger.warning(
+                "repository_wiki_cache_ttl_fresh RPC 不可用或未执行 "
+                "supabase_migrations 中的 SQL，回退为仅基于表字段 last_updated + 应用 UTC：%s",
+                e,
             )
             return not wiki_generation_cache_is_stale(repo_info, max_age_days)
 
-    def build_cached_task_result(self, repo_url: str, max_cache_age_days: Optional[int] = None):
+    def build_cached_task_result(
+        self,
+        repo_url: str,
+        max_cache_age_days: Optional[int] = None,
+        repo_info: Optional[dict] = None,
+    ):
         """
         Build task result payload from repositories table for cache hit.
         Returns None when required wiki artifacts are missing.
@@ -372,8 +460,10 @@ class SupabaseClient:
         max_cache_age_days: 传入时（如 WIKI_GENERATION_CACHE_MAX_AGE_DAYS），按 `repositories.last_updated`
         判断；优先在数据库内与 `now() UTC` 比较（rpc），未部署则回退应用时钟。
         None 表示不校验时效（如工作台列表仍展示「有产物但偏旧」的仓库）。
+        repo_info: 调用方已批量取到的 repositories 行，传入时不再单独查询。
         """
-        repo_info = self.get_repo_information(repo_url)
+        if repo_info is None:
+            repo_info = self.get_repo_information(repo_url)
         if not repo_info:
             return None
 
@@ -388,10 +478,11 @@ class SupabaseClient:
         if max_cache_age_days is not None and not self._repository_wiki_cache_ttl_fresh_db(
             db_key, max_cache_age_days, repo_info
         ):
-            print(
-                f"[Supabase] Wiki cache stale for {repo_url!r} "
-                f"(repositories.last_updated vs DB now, TTL {max_cache_age_days}d), "
-                "skip short-circuit — full regeneration."
+            logger.info(
+                "Wiki cache stale for %r (repositories.last_updated vs DB now, TTL %dd), "
+                "skip short-circuit — full regeneration.",
+                repo_url,
+                max_cache_age_days,
             )
             return None
 
@@ -432,11 +523,13 @@ class SupabaseClient:
             if not prev or (created and created > (prev.get("created_at") or "")):
                 per_repo[norm] = {"task_id": task_id, "created_at": created}
 
+        # 一次 in_ 查询取回全部仓库行，避免逐仓库往返
+        rows = self.get_repositories_for_urls(list(per_repo))
         result: List[dict] = []
         for norm, meta in per_repo.items():
-            if not self.build_cached_task_result(norm):
+            row = rows.get(norm)
+            if not row or not self.build_cached_task_result(norm, repo_info=row):
                 continue
-            row = self.get_repo_information(norm) or {}
             result.append({
                 "repo_url": norm,
                 "task_id": meta["task_id"],
@@ -472,7 +565,7 @@ class SupabaseClient:
                 return response.data[0]
             return None
         except Exception as e:
-            print(f"[Supabase] Error creating chat history: {e}")
+            logger.error("Error creating chat history: %s", e)
             return None
 
     def get_user_chat_history(self, user_id: str):
@@ -494,29 +587,52 @@ class SupabaseClient:
                 for row in (response.data or [])
             ]
         except Exception as e:
-            print(f"[Supabase] Error getting user chat history: {e}")
+            logger.error("Error getting user chat history: %s", e)
             return []
 
-    def get_chat_messages(self, chat_id: str):
+    def get_chat_messages(
+        self,
+        chat_id: str,
+        since: Optional[str] = None,
+        limit: Optional[int] = None,
+        include_metadata: bool = True,
+    ):
         """
-        Get all messages for a specific chat session.
+        Get messages for a specific chat session, oldest first.
+        since: created_at cursor (exclusive) for keyset pagination — pass the last
+        message's created_at to fetch only newer messages without scanning earlier rows.
+        include_metadata=False skips the metadata JSONB (sources, trajectory...).
         """
         if not self.client:
             return []
+        columns = CHAT_MESSAGE_COLUMNS if include_metadata else CHAT_MESSAGE_BASE_COLUMNS
         try:
-            response = self.client.table("chat_messages")\
-                .select("*")\
-                .eq("chat_id", chat_id)\
-                .order("created_at", desc=False)\
-                .execute()
+            query = self.client.table("chat_messages")\
+                .select(columns)\
+                .eq("chat_id", chat_id)
+            if since:
+                query = query.gt("created_at", since)
+            query = query.order("created_at", desc=False)
+            if limit is not None:
+                query = query.limit(limit)
+            response = query.execute()
             return response.data
         except Exception as e:
-            print(f"[Supabase] Error getting chat messages: {e}")
+            logger.error("Error getting chat messages: %s", e)
             return []
 
-    def add_chat_message(self, chat_id: str, role: str, content: str, metadata: Optional[dict] = None):
+    def add_chat_message(
+        self,
+        chat_id: str,
+        role: str,
+        content: str,
+        metadata: Optional[dict] = None,
+        touch_history: bool = True,
+    ):
         """
         Add a message to a chat session.
+        touch_history=False skips the chat_history.updated_at round-trip, e.g. when the
+        session row was created in the same request and is already current.
         """
         if not self.client:
             return None
@@ -531,15 +647,16 @@ class SupabaseClient:
             response = self.client.table("chat_messages").insert(data).execute()
             
             # Update chat_history updated_at
-            self.client.table("chat_history").update({
-                "updated_at": "now()"
-            }).eq("id", chat_id).execute()
+            if touch_history:
+                self.client.table("chat_history").update({
+                    "updated_at": "now()"
+                }).eq("id", chat_id).execute()
             
             if response.data:
                 return response.data[0]
             return None
         except Exception as e:
-            print(f"[Supabase] Error adding chat message: {e}")
+            logger.error("Error adding chat message: %s", e)
             return None
 
     def delete_chat_history(self, chat_id: str, user_id: str) -> bool:
@@ -568,7 +685,7 @@ class SupabaseClient:
             self.client.table("chat_history").delete().eq("id", chat_id).execute()
             return True
         except Exception as e:
-            print(f"[Supabase] Error deleting chat history: {e}")
+            logger.error("Error deleting chat history: %s", e)
             return False
 
     def update_repository_information(
@@ -602,11 +719,14 @@ class SupabaseClient:
             if description is not None:
                 data["description"] = description
 
-            self.client.table("repositories").upsert(data).execute()
-            print(f"[Supabase] Upserted repository information for {repo_url}")
+            self.client.table("repositories").upsert(data, on_conflict="repo_url").execute()
+            self._invalidate_repo_information(repo_url)
+            logger.info("Upserted repository information for %s", repo_url)
+            if vector_store_path is not None:
+                repo_vector_path_cache.set(repo_url, vector_store_path)
             return True
         except Exception as e:
-            print(f"[Supabase] Error updating repository information (upsert): {e}")
+            logger.error("Error updating repository information (upsert): %s", e)
             return False
 
     def update_github_public_metadata(
@@ -634,10 +754,11 @@ class SupabaseClient:
                 data["github_short_description"] = github_short_description
             if stargazers_count is not None:
                 data["stargazers_count"] = stargazers_count
-            self.client.table("repositories").upsert(data).execute()
+            self.client.table("repositories").upsert(data, on_conflict="repo_url").execute()
+            self._invalidate_repo_information(repo_url)
             return True
         except Exception as e:
-            print(f"[Supabase] Error updating GitHub public metadata: {e}")
+            logger.error("Error updating GitHub public metadata: %s", e)
             return False
 
     # ============ Profile Related Methods ============
@@ -654,7 +775,7 @@ class SupabaseClient:
                 return response.data[0]
             return None
         except Exception as e:
-            print(f"[Supabase] Error getting profile: {e}")
+            logger.error("Error getting profile: %s", e)
             return None
 
     def upsert_profile_preferences(self, user_id: str, theme: Optional[str] = None) -> bool:
@@ -675,15 +796,32 @@ class SupabaseClient:
             self.client.table("profiles").upsert(data).execute()
             return True
         except Exception as e:
-            print(f"[Supabase] Error upserting profile preferences: {e}")
+            logger.error("Error upserting profile preferences: %s", e)
             return False
 
 
+_CLIENT: Optional[SupabaseClient] = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def get_client() -> SupabaseClient:
+    """
+    返回进程内共享的 SupabaseClient。
+    create_client 会初始化 GoTrue/PostgREST 子客户端并建立新连接，按请求构造的开销远大于查询本身。
+    """
+    global _CLIENT
+    if _CLIENT is not None:
+        return _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            _CLIENT = SupabaseClient()
+        return _CLIENT
+
+
 def update_repo_vector_path(repo_url: str, vector_store_path: str):
     """
     Helper function to update repository vector path in Supabase.
     """
-    client = SupabaseClient()
-    return client.update_repository_vector_path(repo_url, vector_store_path)
+    return get_client().update_repository_vector_path(repo_url, vector_store_path)
 
 
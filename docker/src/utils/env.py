@@ -0,0 +1,17 @@
+import os
+
+import dotenv
+
+# 已加载标记放在环境变量里：spawn 出的子进程继承父进程环境（含 .env 中的值），导入时无需再查找、解析文件
+_DOTENV_LOADED_FLAG = "_DOTENV_LOADED"
+
+
+def load_env() -> None:
+    """
+    加载 .env 到环境变量（不覆盖已有值），每个进程树只执行一次。
+    从本模块所在目录向上查找 .env，与各模块原先在 src/ 下直接调用 load_dotenv() 的查找范围一致。
+    """
+    if os.environ.get(_DOTENV_LOADED_FLAG):
+        return
+    dotenv.load_dotenv()
+    os.environ[_DOTENV_LOADED_FLAG] = "1"
@@ -13,10 +13,17 @@ from urllib.error import HTTPError, URLError
 from urllib.parse import urlsplit
 from urllib.request import Request, urlopen
 
+from src.utils.wiki_cache_policy import parse_supabase_timestamp
+
 logger = logging.getLogger(__name__)
 
 GITHUB_METADATA_TTL_SEC = 86400  # 24h
 
+# /repos/github-metadata 只用到这些列，批量查询时不必 select("*") 拉回整行（含 r2_content_urls 等大字段）
+GITHUB_METADATA_ROW_COLUMNS = (
+    "repo_url,description,github_short_description,stargazers_count,github_metadata_updated_at"
+)
+
 
 def coerce_stargazers_int(value: Any) -> Optional[int]:
     """Supabase/JSON 可能返回 float；统一为 int 供 API 与前端使用。"""
@@ -75,26 +82,10 @@ def fetch_github_repo_public_metadata(owner: str, name: str) -> Optional[Dict[st
         return None
 
 
-def _parse_ts(value: Any) -> Optional[datetime]:
-    if value is None:
-        return None
-    if isinstance(value, datetime):
-        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
-    text = str(value).strip()
-    if not text:
-        return None
-    try:
-        if text.endswith("Z"):
-            text = text[:-1] + "+00:00"
-        return datetime.fromisoformat(text)
-    except ValueError:
-        return None
-
-
 def github_metadata_is_stale(row: Optional[Dict[str, Any]]) -> bool:
     if not row:
         return True
-    updated = _parse_ts(row.get("github_metadata_updated_at"))
+    updated = parse_supabase_timestamp(row.get("github_metadata_updated_at"))
     if updated is None:
         return True
     age_sec = (datetime.now(timezone.utc) - updated).total_seconds()
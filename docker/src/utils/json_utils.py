@@ -0,0 +1,17 @@
+import json
+from typing import Any
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # 未安装时回退到标准库 json
+    orjson = None
+
+
+def dumps_pretty(obj: Any) -> bytes:
+    """
+    序列化为带 2 空格缩进的 UTF-8 JSON 字节串，用于写入调试/持久化 JSON 文件。
+    优先使用 orjson（C 扩展，比标准库缩进输出快数倍）；非字符串键与标准库一样转为字符串。
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
@@ -30,6 +30,6 @@ def get_repo_hash(repo_url: str) -> str:
     clean_url = repo_url.rstrip('/').replace('.git', '').lower()
     # 提取仓库名称
     repo_name = get_repo_name(clean_url)
-    # 生成短哈希
-    url_hash = hashlib.md5(clean_url.encode()).hexdigest()[:8]
+    # 生成短哈希（blake2b 直接输出 4 字节 = 8 位十六进制，无需截断）
+    url_hash = hashlib.blake2b(clean_url.encode(), digest_size=4).hexdigest()
     return f"{repo_name}_{url_hash}"
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import re
 import logging
@@ -17,10 +18,14 @@ from src.clients.ai_client_base import BaseAIClient
 from src.clients.ai_client_factory import get_ai_client, get_model_config
 from src.config import CONFIG, get_wiki_content_concurrency
 from src.prompts import get_wiki_section_prompt
+from src.utils.json_utils import dumps_pretty
 
 # 初始化日志
 logger = logging.getLogger("app.wiki.content_gen")
 
+# 单个章节 LLM 输出的 token 上限
+SECTION_MAX_TOKENS = 1800
+
 @dataclass(slots=True)
 class WikiSection:
     """
@@ -64,7 +69,7 @@ class WikiContentGenerator:
         self.json_output_dir = Path(json_output_dir).expanduser().resolve()
         self.json_output_dir.mkdir(parents=True, exist_ok=True)
 
-        # 客户端工厂：并发时每个 worker 独立创建实例
+        # 客户端工厂：并发时每个 worker 通过工厂获取实例（get_ai_client 按配置复用同一客户端）
         if client_factory is not None:
             self._client_factory = client_factory
         elif client is not None:
@@ -177,6 +182,69 @@ class WikiContentGenerator:
         )
         return generated_files
 
+    async def agenerate(self, structure: Dict[str, Any]) -> List[Path]:
+        """
+        generate 的异步版本：所有章节共享同一客户端的连接池，
+        由信号量限制同时在途的 LLM 请求数，无需为每个章节占用一个线程。
+        """
+        toc = structure.get("toc") or []
+        sections = list(self._flatten_sections(toc))
+        total = len(sections)
+        if total == 0:
+            logger.info(f"[task={self.task_id}] 无章节需要生成")
+            return []
+
+        filename_map = self._build_filename_map(sections)
+        concurrency = min(self.max_concurrency, total)
+        logger.info(
+            f"[task={self.task_id}] 开始异步并发生成 wiki 正文: "
+            f"总章节数={total}, 并发上限={concurrency}"
+        )
+
+        semaphore = asyncio.Semaphore(concurrency)
+        counters = {"completed": 0, "failed": 0}
+
+        async def _worker(section: WikiSection) -> Optional[Path]:
+            async with semaphore:
+                t0 = time.monotonic()
+                try:
+                    file_path = await self._agenerate_section(
+                        structure, section, filename_override=filename_map.get(section.id),
+                    )
+                    counters["completed"] += 1
+                    completed_now = counters["completed"]
+                    logger.info(
+                        f"[task={self.task_id}] 章节完成: section_id={section.id!r}, "
+                        f"耗时={time.monotonic() - t0:.1f}s, "
+                        f"文件={file_path.name if file_path else 'N/A'}, "
+                        f"完成={completed_now}/{total}"
+                    )
+                    if self.progress_callback:
+                        progress = 50.0 + (completed_now / total) * 35.0
+                        await asyncio.to_thread(
+                            self.progress_callback,
+                            progress,
+                            f"Generating Wiki content ({completed_now}/{total})...",
+                        )
+                    return file_path
+                except Exception as exc:
+                    counters["failed"] += 1
+                    logger.warning(
+                        f"[task={self.task_id}] 章节失败: section_id={section.id!r}, "
+                        f"耗时={time.monotonic() - t0:.1f}s, 异常={exc!r}, "
+                        f"累计失败={counters['failed']}"
+                    )
+                    return None
+
+        results = await asyncio.gather(*(_worker(sec) for sec in sections))
+        generated_files = [p for p in results if p]
+
+        logger.info(
+            f"[task={self.task_id}] 正文生成完毕: "
+            f"成功={len(generated_files)}, 失败={counters['failed']}, 总数={total}"
+        )
+        return generated_files
+
     def _generate_section(
         self,
         structure: Dict[str, Any],
@@ -189,26 +257,39 @@ class WikiContentGenerator:
         为单个章节构建上下文、调用 LLM，并将结果写入 JSON。
         """
         used_client = client or self.client
+        messages = self._section_messages(structure, section)
+        raw_response = used_client.chat(messages, max_tokens=SECTION_MAX_TOKENS)
+        parsed = self._parse_llm_response(raw_response)
+        return self._write_section_json(section, parsed, filename_override=filename_override)
+
+    async def _agenerate_section(
+        self,
+        structure: Dict[str, Any],
+        section: WikiSection,
+        *,
+        filename_override: str | None = None,
+    ) -> Path | None:
+        """_generate_section 的异步版本：读文件/写 JSON 放入线程，等待 LLM 时不占线程。"""
+        messages = await asyncio.to_thread(self._section_messages, structure, section)
+        raw_response = await self.client.achat(messages, max_tokens=SECTION_MAX_TOKENS)
+        parsed = self._parse_llm_response(raw_response)
+        return await asyncio.to_thread(
+            self._write_section_json, section, parsed, filename_override=filename_override
+        )
+
+    def _section_messages(self, structure: Dict[str, Any], section: WikiSection) -> List[Dict[str, str]]:
         context = self._collect_file_context(section.files)
         if not context:
             context = "未能找到关联文件，请基于章节标题进行合理推断。"
 
-        doc_title = structure.get("title", "Wiki")
-        doc_description = structure.get("description", "")
-        breadcrumb = section.display_path()
-
-        messages = self._build_messages(
-            doc_title=doc_title,
-            doc_description=doc_description,
-            breadcrumb=breadcrumb,
+        return self._build_messages(
+            doc_title=structure.get("title", "Wiki"),
+            doc_description=structure.get("description", ""),
+            breadcrumb=section.display_path(),
             section_id=section.id,
             context=context,
         )
 
-        raw_response = used_client.chat(messages, max_tokens=1800)
-        parsed = self._parse_llm_response(raw_response)
-        return self._write_section_json(section, parsed, filename_override=filename_override)
-
     def _collect_file_context(self, files: Iterable[str]) -> str:
         """
         读取文件内容片段，并结合图谱提取依赖关系。
@@ -311,9 +392,7 @@ class WikiContentGenerator:
 
         filename = (filename_override or self._safe_filename(section.id)) + ".json"
         target_path = self.json_output_dir / filename
-        target_path.write_text(
-            json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8"
-        )
+        target_path.write_bytes(dumps_pretty(payload))
         logger.info(f"已写入章节 JSON：{section.id} -> {target_path}")
         return target_path
 
@@ -9,7 +9,7 @@ from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, Optional
 
-import dotenv
+from src.utils.env import load_env
 from src.config import PROJECT_ROOT, CONFIG
 from src.clients.ai_client_factory import get_ai_client, get_model_config
 from src.prompts import get_structure_prompt, STRUCTURE_PROMPT
@@ -20,7 +20,7 @@ from src.ingestion.file_processor import get_files_to_process
 # 初始化日志
 logger = logging.getLogger("app.wiki.struct_gen")
 
-dotenv.load_dotenv()
+load_env()
 
 REPO_MAPPER_DIR = PROJECT_ROOT / "RepoMapper"
 